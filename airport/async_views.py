@@ -0,0 +1,124 @@
+"""Native async versions of the busiest flight read endpoints.
+
+DRF views are synchronous, so under ASGI each request holds a worker
+thread for its whole lifetime, including time spent trickling the
+response to a slow client. These views await the async ORM instead and
+return the same bodies as their ``FlightViewSet`` counterparts.
+"""
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from airport.filters import filter_flights
+from airport.models import Flight
+from airport.pagination import FlightCursorPagination
+from airport.renderers import ORJSONRenderer
+from airport.rows import AFLIGHT_RETRIEVE_ROW, FLIGHT_LIST_ROW, acrew_names
+from airport.views import FlightViewSet, seat_map_encoding, seat_map_response
+from user.authentication import CachedJWTAuthentication
+
+renderer = ORJSONRenderer()
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        renderer.render(data), status=status, content_type=renderer.media_type
+    )
+
+
+def _error_response(exc):
+    if isinstance(exc.detail, (list, dict)):
+        data = exc.detail
+    else:
+        data = {"detail": exc.detail}
+    response = json_response(data, status=exc.status_code)
+    if getattr(exc, "auth_header", None):
+        response["WWW-Authenticate"] = exc.auth_header
+    return response
+
+
+def async_api_view(query_budget):
+    """Read-only, JWT-authenticated async view answering like DRF would.
+
+    The view receives a DRF ``Request`` (for ``query_params``) and returns
+    either data to render as JSON or a ready ``HttpResponse``.
+    """
+    return partial(_async_api_view, query_budget=query_budget)
+
+
+def _async_api_view(view, query_budget):
+    authenticator = CachedJWTAuthentication()
+    authenticate = sync_to_async(authenticator.authenticate)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request = Request(request)
+        try:
+            if request.method not in ("GET", "HEAD"):
+                raise exceptions.MethodNotAllowed(request.method)
+
+            user_auth = await authenticate(request)
+            if user_auth is None or not user_auth[0].is_authenticated:
+                exc = exceptions.NotAuthenticated()
+                exc.auth_header = authenticator.authenticate_header(request)
+                raise exc
+
+            data = await view(request, *args, **kwargs)
+        except exceptions.AuthenticationFailed as exc:
+            exc.auth_header = authenticator.authenticate_header(request)
+            return _error_response(exc)
+        except Http404 as exc:
+            return _error_response(exceptions.NotFound(*exc.args))
+        except exceptions.APIException as exc:
+            return _error_response(exc)
+
+        if isinstance(data, HttpResponse):
+            return data
+        return json_response(data)
+
+    wrapper.query_budgets = {"get": query_budget}
+    return wrapper
+
+
+# user, ?count=true, page
+@async_api_view(query_budget=3)
+async def flight_list(request):
+    queryset = filter_flights(
+        FlightViewSet.queryset.with_availability(), request.query_params
+    ).values(*FLIGHT_LIST_ROW.columns)
+
+    paginator = FlightCursorPagination()
+    page = await paginator.apaginate_queryset(queryset, request)
+    return paginator.get_paginated_response(FLIGHT_LIST_ROW.map(page)).data
+
+
+@async_api_view(query_budget=3)
+async def flight_detail(request, pk):
+    row = await (
+        FlightViewSet.queryset.with_availability()
+        .filter(pk=pk)
+        .values(*AFLIGHT_RETRIEVE_ROW.columns)
+        .afirst()
+    )
+    if row is None:
+        raise Http404("No Flight matches the given query.")
+    row["members"] = await acrew_names(pk)
+    return AFLIGHT_RETRIEVE_ROW(row)
+
+
+@async_api_view(query_budget=2)
+async def flight_seatmap(request, pk):
+    encoding = seat_map_encoding(request)
+    try:
+        flight = await Flight.objects.select_related("airplane").only(
+            "seat_map",
+            "seats_version",
+            "airplane__rows",
+            "airplane__seats_in_row",
+        ).aget(pk=pk)
+    except Flight.DoesNotExist:
+        raise Http404("No Flight matches the given query.")
+    return seat_map_response(request, flight, encoding, json_response)
@@ -0,0 +1,139 @@
+"""Availability calendar of a route: ``routes/<id>/calendar/``.
+
+A day's entry counts the route's flights departing that day (in the current
+time zone), the earliest departure, and the free seats over all of them and
+on the emptiest one. Free seats are capacity minus ``Flight.seats_taken``,
+which bookings keep current, so a month is one grouped aggregate over
+Flight and Airplane without reading tickets.
+
+Months are cached per route. ``airport.occupancy`` drops them whenever it
+records a change to the route days they cover (bookings, flights saved or
+deleted, airplanes resized, schedule imports), now and again once the
+change commits.
+"""
+import uuid
+from datetime import date, datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from airport.models import Flight
+
+# Also bounds how long a month computed while a booking was committing can
+# stay stale.
+CALENDAR_TIMEOUT = 10 * 60
+_GENERATION_KEY = "airport:calendar:generation"
+
+
+def _month(day):
+    return date(day.year, day.month, 1)
+
+
+def _next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def months_between(first_day, last_day):
+    """The first days of the months from ``first_day`` to ``last_day``."""
+    months = [_month(first_day)]
+    while months[-1] < _month(last_day):
+        months.append(_next_month(months[-1]))
+    return months
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _generation():
+    generation = cache.get(_GENERATION_KEY)
+    if generation is None:
+        # Lost from the cache: start a generation no month was stored under.
+        cache.add(_GENERATION_KEY, uuid.uuid4().hex, timeout=None)
+        generation = cache.get(_GENERATION_KEY)
+    return generation
+
+
+def _month_key(generation, route_id, month):
+    return f"airport:calendar:{generation}:{route_id}:{month:%Y-%m}"
+
+
+def touch_calendars(route_days=None):
+    """Drop the cached months of ``(route id, day)`` pairs, or of every route
+    if None."""
+    if route_days is not None:
+        route_days = set(route_days)
+
+    def touch():
+        if route_days is None:
+            # A fresh token, as a counter restarted after eviction could
+            # bring back months cached under its earlier values.
+            cache.set(_GENERATION_KEY, uuid.uuid4().hex, timeout=None)
+            return
+        generation = _generation()
+        cache.delete_many({
+            _month_key(generation, route_id, _month(day)) for route_id, day in route_days
+        })
+
+    touch()
+    transaction.on_commit(touch)
+
+
+def _aggregate(route_id, first_month, end_month):
+    free_seats = F("airplane__rows") * F("airplane__seats_in_row") - F("seats_taken")
+    return (
+        Flight.objects.filter(
+            route_id=route_id,
+            departure_time__gte=_day_start(first_month),
+            departure_time__lt=_day_start(end_month),
+        )
+        .annotate(day=TruncDate("departure_time"))
+        .values("day")
+        .annotate(
+            flight_count=Count("id"),
+            first_departure=Min("departure_time"),
+            free_seats=Sum(free_seats),
+            max_free_seats=Max(free_seats),
+        )
+        .order_by("day")
+    )
+
+
+def route_calendar(route_id, start, end):
+    """One entry per day from ``start`` to ``end`` inclusive; the months not
+    cached are computed together in one query."""
+    months = months_between(start, end)
+    generation = _generation()
+    keys = {month: _month_key(generation, route_id, month) for month in months}
+    cached = cache.get_many(keys.values())
+    days = {}
+    for month in months:
+        days.update(cached.get(keys[month], {}))
+
+    missing = [month for month in months if keys[month] not in cached]
+    if missing:
+        computed = {month: {} for month in missing}
+        for row in _aggregate(route_id, missing[0], _next_month(missing[-1])):
+            month = _month(row["day"])
+            if month in computed:
+                computed[month][row["day"]] = {
+                    "flights": row["flight_count"],
+                    "first_departure": row["first_departure"],
+                    "free_seats": row["free_seats"],
+                    "max_free_seats": row["max_free_seats"],
+                }
+        cache.set_many(
+            {keys[month]: entries for month, entries in computed.items()},
+            timeout=CALENDAR_TIMEOUT,
+        )
+        for entries in computed.values():
+            days.update(entries)
+
+    empty = {"flights": 0, "first_departure": None, "free_seats": 0, "max_free_seats": 0}
+    return [
+        {"day": day, **days.get(day, empty)}
+        for day in (start + timedelta(days=offset) for offset in range((end - start).days + 1))
+    ]
@@ -0,0 +1,286 @@
+import json
+import math
+import threading
+import time
+import urllib.error
+import urllib.request
+from itertools import count, pairwise
+
+from django.db import connection, connections
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from airport.bookings import process_bookings
+from airport.models import BookingRequest
+
+SCENARIOS = (
+    "token",
+    "flights-list",
+    "flights-retrieve",
+    "routes-list",
+    "orders-create",
+    "orders-queued",
+    "orders-list",
+)
+ORDER_SCENARIOS = ("orders-create", "orders-queued")
+
+
+class ClientDriver:
+    """Sends requests through Django's test client, in this process."""
+
+    counts_queries = True
+    in_process = True
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, token=None, headers=None):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = Client(
+                raise_request_exception=False, SERVER_NAME="localhost"
+            )
+        headers = dict(headers or {})
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        with CaptureQueriesContext(connection) as queries:
+            response = client.generic(
+                method,
+                path,
+                json.dumps(body) if body is not None else "",
+                content_type="application/json",
+                headers=headers,
+            )
+        return response.status_code, response.content, len(queries)
+
+
+class HttpDriver:
+    """Sends requests to a running server; queries cannot be counted."""
+
+    counts_queries = False
+    in_process = False
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def request(self, method, path, body=None, token=None, headers=None):
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(body).encode() if body is not None else None,
+            headers=headers,
+            method=method,
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read(), None
+        except urllib.error.HTTPError as error:
+            return error.code, error.read(), None
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of already sorted ``values``."""
+    index = max(0, math.ceil(fraction * len(values)) - 1)
+    return values[index]
+
+
+class Benchmark:
+    """Drives the API's main routes through ``driver`` and measures them."""
+
+    def __init__(self, driver, email, password, concurrency=4, requests=200, warmup=10):
+        self.driver = driver
+        self.credentials = {"email": email, "password": password}
+        self.concurrency = concurrency
+        self.requests = requests
+        self.warmup = warmup
+
+    def _call(self, method, path, body=None, token=None):
+        status, content, _ = self.driver.request(method, path, body, token)
+        if not 200 <= status < 300:
+            raise ValueError(f"{method} {path} returned {status}: {content[:200]!r}")
+        return json.loads(content)
+
+    def prepare(self, scenarios):
+        """Log in and collect the flight ids and free seats the scenarios use."""
+        self.token = self._call(
+            "POST", reverse("user:token_obtain_pair"), self.credentials
+        )["access"]
+        self.flight_ids = [
+            flight["id"] for flight in self._call(
+                "GET",
+                reverse("airport:flights-list") + "?page_size=100",
+                token=self.token,
+            )["results"]
+        ]
+        if not self.flight_ids:
+            raise ValueError("There are no flights to benchmark")
+
+        self.free_seats = []
+        ordering = [scenario for scenario in scenarios if scenario in ORDER_SCENARIOS]
+        if ordering:
+            needed = (self.requests + self.warmup) * len(ordering)
+            for flight_id in self.flight_ids:
+                seat_map = self._call(
+                    "GET",
+                    reverse("airport:flights-seatmap", args=[flight_id]),
+                    token=self.token,
+                )
+                taken = {(seat["row"], seat["seat"]) for seat in seat_map["taken_seats"]}
+                self.free_seats += [
+                    (flight_id, row, seat)
+                    for row in range(1, seat_map["rows"] + 1)
+                    for seat in range(1, seat_map["seats_in_row"] + 1)
+                    if (row, seat) not in taken
+                ][:needed - len(self.free_seats)]
+                if len(self.free_seats) == needed:
+                    break
+            else:
+                raise ValueError(f"Not enough free seats for {', '.join(ordering)}")
+        self._free_seats = iter(self.free_seats)
+
+    def build_request(self, scenario, number):
+        """``(method, path, body, token, headers)`` of request ``number`` of a
+        scenario."""
+        if scenario == "token":
+            return "POST", reverse("user:token_obtain_pair"), self.credentials, None, None
+        if scenario == "flights-list":
+            return "GET", reverse("airport:flights-list"), None, self.token, None
+        if scenario == "flights-retrieve":
+            flight_id = self.flight_ids[number % len(self.flight_ids)]
+            path = reverse("airport:flights-detail", args=[flight_id])
+            return "GET", path, None, self.token, None
+        if scenario == "routes-list":
+            return "GET", reverse("airport:routes-list"), None, self.token, None
+        if scenario in ORDER_SCENARIOS:
+            flight_id, row, seat = next(self._free_seats)
+            body = {"tickets": [{"flight": flight_id, "row": row, "seat": seat}]}
+            headers = {"Prefer": "respond-async"} if scenario == "orders-queued" else None
+            return "POST", reverse("airport:orders-list"), body, self.token, headers
+        if scenario == "orders-list":
+            return "GET", reverse("airport:orders-list"), None, self.token, None
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+    def _worker(self, scenario, total, counter, results):
+        while (number := next(counter)) < total:
+            method, path, body, token, headers = self.build_request(scenario, number)
+            started = time.perf_counter()
+            status, _, queries = self.driver.request(method, path, body, token, headers)
+            results.append((time.perf_counter() - started, status, queries))
+
+    def _in_threads(self, function):
+        if self.concurrency == 1:
+            function()
+            return
+
+        def target():
+            try:
+                function()
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=target) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _run(self, scenario, total):
+        counter, results = count(), []
+        self._in_threads(lambda: self._worker(scenario, total, counter, results))
+        return results
+
+    def drain_queue(self, after_id=0):
+        """Book the queued orders with ``concurrency`` workers and measure
+        those after ``after_id``: booking throughput, time from enqueue to
+        booking, and the share booked no earlier than the one queued
+        before them (1.0 is first come, first served)."""
+        started = time.perf_counter()
+        self._in_threads(process_bookings)
+        elapsed = time.perf_counter() - started
+
+        rows = list(
+            BookingRequest.objects.filter(pk__gt=after_id)
+            .order_by("pk")
+            .values_list("status", "created_at", "processed_at")
+        )
+        if not rows:
+            return None
+        waits = sorted(
+            (processed_at - created_at).total_seconds() * 1000
+            for _, created_at, processed_at in rows
+        )
+        processed = [processed_at for _, _, processed_at in rows]
+        in_order = sum(later >= earlier for earlier, later in pairwise(processed))
+        return {
+            "booked": len(rows),
+            "confirmed": sum(status == BookingRequest.CONFIRMED for status, _, _ in rows),
+            "throughput": round(len(rows) / elapsed, 1),
+            "wait_ms": {
+                "p50": round(percentile(waits, 0.50), 2),
+                "p95": round(percentile(waits, 0.95), 2),
+                "max": round(waits[-1], 2),
+            },
+            "in_order": round(in_order / (len(rows) - 1), 3) if len(rows) > 1 else 1.0,
+        }
+
+    def run(self, scenario):
+        queued = scenario == "orders-queued" and self.driver.in_process
+        self._run(scenario, self.warmup)
+        if queued:
+            self.drain_queue()
+            after_id = BookingRequest.objects.aggregate(last=Max("pk"))["last"] or 0
+        started = time.perf_counter()
+        results = self._run(scenario, self.requests)
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency * 1000 for latency, _, _ in results)
+        # Failed requests stop early, so only successful ones set the baseline.
+        queries = [
+            queries for _, status, queries in results if 200 <= status < 300
+        ]
+        return {
+            "requests": len(results),
+            "errors": sum(not 200 <= status < 300 for _, status, _ in results),
+            "throughput": round(len(results) / elapsed, 1),
+            "latency_ms": {
+                "mean": round(sum(latencies) / len(latencies), 2),
+                "p50": round(percentile(latencies, 0.50), 2),
+                "p95": round(percentile(latencies, 0.95), 2),
+                "p99": round(percentile(latencies, 0.99), 2),
+                "max": round(latencies[-1], 2),
+            },
+            "queries": {
+                "mean": round(sum(queries) / len(queries), 2),
+                "max": max(queries),
+            } if self.driver.counts_queries and queries else None,
+            # Orders queued through a running server are booked by its workers.
+            **({"queue": self.drain_queue(after_id)} if queued else {}),
+        }
+
+
+def compare(report, baseline, tolerance):
+    """Regressions of ``report`` against ``baseline``, as readable strings.
+
+    p95 latency may grow by ``tolerance`` (a fraction) before it counts;
+    any increase in queries per request does.
+    """
+    regressions = []
+    for scenario, result in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if previous is None:
+            continue
+        p95, old_p95 = result["latency_ms"]["p95"], previous["latency_ms"]["p95"]
+        if p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{scenario}: p95 {old_p95} ms -> {p95} ms")
+        if result["queries"] and previous["queries"]:
+            queries, old_queries = result["queries"]["mean"], previous["queries"]["mean"]
+            if queries > old_queries:
+                regressions.append(
+                    f"{scenario}: queries per request {old_queries} -> {queries}"
+                )
+    return regressions
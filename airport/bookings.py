@@ -0,0 +1,154 @@
+"""Queued booking: orders accepted now and booked by ``process_bookings``.
+
+For sale launches, when many customers book the same flights at once,
+``orders/`` can enqueue validated orders as ``BookingRequest`` rows and
+answer 202 with a status URL (``BOOKING_QUEUE`` setting, or a
+``Prefer: respond-async`` header) instead of holding a web worker while it
+waits for the flight's lock. Workers take the oldest pending request and
+the pending requests for its flight, up to a batch, and book them in one
+transaction: the flights are locked once, each order is booked in its own
+savepoint as ``OrderSerializer.create`` would, and an order whose seats
+are gone, or no longer exist on a resized airplane, is rejected without
+affecting the rest. Requests are booked in arrival order, and
+``skip_locked`` lets workers take different flights side by side.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from airport.documents import write_order_document
+from airport.models import BookingRequest, Flight, Order, Ticket
+from airport.reservations import reserve_seats
+from airport.seats import SeatUnavailable
+from airport.serializers import BookingRequestSerializer, validate_seat_range
+
+BATCH_SIZE = 100
+
+
+def wants_queue(request):
+    """Whether an order request should be queued rather than booked now."""
+    prefer = request.headers.get("Prefer", "")
+    return settings.BOOKING_QUEUE or "respond-async" in prefer.lower()
+
+
+class QueuedCreateMixin:
+    """Queue validated orders instead of booking them when ``wants_queue``,
+    answering 202 with the booking request and its status URL."""
+
+    def create(self, request, *args, **kwargs):
+        if not wants_queue(request):
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        booking = enqueue_booking(request.user, serializer.validated_data["tickets"])
+
+        data = BookingRequestSerializer(booking).data
+        data["url"] = request.build_absolute_uri(
+            reverse("airport:bookings-detail", args=[booking.pk])
+        )
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={"Location": data["url"]})
+
+
+def enqueue_booking(user, tickets):
+    """Queue an order of validated ``tickets`` (dicts with a Flight instance)."""
+    tickets = [
+        {"flight": ticket["flight"].pk, "row": ticket["row"], "seat": ticket["seat"]}
+        for ticket in tickets
+    ]
+    return BookingRequest.objects.create(
+        user=user,
+        flight_id=min(ticket["flight"] for ticket in tickets),
+        tickets=tickets,
+    )
+
+
+def process_batch(batch_size=BATCH_SIZE):
+    """Book the oldest pending request and the next pending ones for its
+    flight, up to ``batch_size``; return the requests processed."""
+    with transaction.atomic():
+        pending = (
+            BookingRequest.objects.filter(status=BookingRequest.PENDING)
+            .select_for_update(skip_locked=True, of=("self",))
+            .select_related("user")
+            .order_by("id")
+        )
+        first = pending.first()
+        if first is None:
+            return []
+        if first.flight_id is None:
+            batch = [first]
+        else:
+            batch = list(pending.filter(flight_id=first.flight_id)[:batch_size])
+
+        flights = (
+            Flight.objects.select_for_update(of=("self",))
+            .select_related("airplane__airplane_type", "route__source", "route__destination")
+            .order_by("pk")
+            .in_bulk({ticket["flight"] for booking in batch for ticket in booking.tickets})
+        )
+
+        now = timezone.now()
+        for booking in batch:
+            _book(booking, flights)
+            booking.processed_at = now
+        BookingRequest.objects.bulk_update(
+            batch, ["status", "order", "errors", "processed_at"]
+        )
+    return batch
+
+
+def _book(booking, flights):
+    missing = [ticket["flight"] for ticket in booking.tickets if ticket["flight"] not in flights]
+    if missing:
+        booking.status = BookingRequest.REJECTED
+        booking.errors = {"tickets": f"Flight {missing[0]} no longer exists."}
+        return
+
+    try:
+        with transaction.atomic():
+            # The airplane may have shrunk since the order was validated.
+            for ticket in booking.tickets:
+                validate_seat_range(
+                    flights[ticket["flight"]].airplane, ticket["row"], ticket["seat"]
+                )
+            order = Order.objects.create(user=booking.user)
+            tickets = reserve_seats(
+                booking.user,
+                (
+                    Ticket(
+                        order=order,
+                        flight=flights[ticket["flight"]],
+                        row=ticket["row"],
+                        seat=ticket["seat"],
+                    )
+                    for ticket in booking.tickets
+                ),
+            )
+            write_order_document(order, tickets)
+    except SeatUnavailable as error:
+        booking.status = BookingRequest.REJECTED
+        booking.errors = {"taken_seats": str(error)}
+    except ValidationError as error:
+        booking.status = BookingRequest.REJECTED
+        booking.errors = error.detail
+    except ValueError as error:
+        # Rejected alone rather than rolling back (and retrying) the batch.
+        booking.status = BookingRequest.REJECTED
+        booking.errors = {"tickets": str(error)}
+    else:
+        booking.status = BookingRequest.CONFIRMED
+        booking.order = order
+
+
+def process_bookings(batch_size=BATCH_SIZE):
+    """Process batches until the queue is empty; return how many requests
+    were confirmed and rejected."""
+    counts = {BookingRequest.CONFIRMED: 0, BookingRequest.REJECTED: 0}
+    while batch := process_batch(batch_size):
+        for booking in batch:
+            counts[booking.status] += 1
+    return counts
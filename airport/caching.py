@@ -0,0 +1,87 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+# Backends that keep entries in the memory of each process.
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.dummy.DummyCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+)
+
+
+def cache_is_shared(alias=DEFAULT_CACHE_ALIAS):
+    """Whether every process sees the same cache ``alias``. Model versions
+    (and so cached responses) are only invalidated in the processes that
+    see the write unless it is."""
+    return settings.CACHES[alias]["BACKEND"] not in PROCESS_LOCAL_CACHES
+
+
+def _version_key(model):
+    return f"airport:cache:version:{model._meta.label_lower}"
+
+
+def touch_models(*models):
+    """Record that ``models`` changed now, expiring responses built from them."""
+    def touch():
+        cache.set_many(
+            {_version_key(model): time.time() for model in models}, timeout=None
+        )
+
+    touch()
+    transaction.on_commit(touch)
+
+
+def models_last_modified(models):
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return max(versions.values())
+
+
+class CachedResponseMixin:
+    """Serve list/retrieve from the cache until a model in ``cache_models``
+    changes, with ETag/Last-Modified revalidation."""
+
+    cache_models = ()
+    cache_timeout = 60 * 60
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        last_modified = models_last_modified(self.cache_models or (self.queryset.model,))
+        fingerprint = "|".join((
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            repr(last_modified),
+        ))
+        etag = quote_etag(hashlib.sha1(fingerprint.encode()).hexdigest())
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified)
+        )
+        if response is None:
+            key = f"airport:cache:response:{etag}"
+            data = cache.get(key)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = handler(request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(key, response.data, self.cache_timeout)
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
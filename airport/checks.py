@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from airport.caching import cache_is_shared
+
+
+@register(Tags.caches)
+def check_replica_pin_cache(app_configs, **kwargs):
+    """Replica pins must be seen by every process, or a client that wrote
+    through one worker reads stale rows through another."""
+    if settings.DATABASE_REPLICAS and not cache_is_shared():
+        return [
+            Error(
+                "DATABASE_REPLICAS needs a cache shared between processes.",
+                hint="Set REDIS_URL, or configure CACHES with Redis or Memcached.",
+                id="airport.E001",
+            )
+        ]
+    return []
@@ -0,0 +1,219 @@
+import heapq
+import itertools
+import threading
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from datetime import timedelta
+from operator import attrgetter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+VERSION_KEY = "airport:connections:version"
+MAX_LAYOVER = timedelta(hours=24)
+MAX_PATHS = 20000
+
+
+@dataclass(frozen=True)
+class Leg:
+    flight: int
+    route: int
+    source: int
+    destination: int
+    departure_time: object
+    arrival_time: object
+    distance: int
+
+
+@dataclass
+class Itinerary:
+    legs: list
+
+    @property
+    def departure_time(self):
+        return self.legs[0].departure_time
+
+    @property
+    def arrival_time(self):
+        return self.legs[-1].arrival_time
+
+    @property
+    def duration(self):
+        return int((self.arrival_time - self.departure_time).total_seconds() // 60)
+
+    @property
+    def distance(self):
+        return sum(leg.distance for leg in self.legs)
+
+
+class ConnectionIndex:
+    """Route graph plus time-sorted departures per airport, held in memory."""
+
+    def __init__(self, legs, airports):
+        self.airports = airports
+        self.airport_ids = {name.lower(): pk for pk, name in airports.items()}
+        self.departures = defaultdict(list)
+        self.routes = defaultdict(set)
+        for leg in sorted(legs, key=lambda leg: leg.departure_time):
+            self.departures[leg.source].append(leg)
+            self.routes[leg.source].add(leg.destination)
+        self.departure_times = {
+            airport: [leg.departure_time for leg in legs]
+            for airport, legs in self.departures.items()
+        }
+        self._hops = {}
+
+    @classmethod
+    def build(cls):
+        """Index the flights that have not departed yet."""
+        from airport.models import Airport, Flight, Route
+
+        airports = dict(Airport.objects.values_list("id", "name"))
+        routes = {
+            pk: (source, destination, distance)
+            for pk, source, destination, distance in Route.objects.values_list(
+                "id", "source_id", "destination_id", "distance"
+            )
+        }
+        legs = []
+        flights = Flight.objects.filter(departure_time__gte=timezone.now()).values_list(
+            "id", "route_id", "departure_time", "arrival_time"
+        )
+        for pk, route, departure_time, arrival_time in flights.iterator(chunk_size=10000):
+            source, destination, distance = routes[route]
+            legs.append(
+                Leg(pk, route, source, destination, departure_time, arrival_time, distance)
+            )
+        return cls(legs, airports)
+
+    def resolve_airport(self, value):
+        value = str(value)
+        if value.isdigit() and int(value) in self.airports:
+            return int(value)
+        return self.airport_ids.get(value.lower())
+
+    def _hops_to(self, destination):
+        """Fewest legs from every airport to ``destination`` over the route graph."""
+        if destination in self._hops:
+            return self._hops[destination]
+
+        incoming = defaultdict(set)
+        for source, destinations in self.routes.items():
+            for target in destinations:
+                incoming[target].add(source)
+
+        hops = {destination: 0}
+        queue = deque([destination])
+        while queue:
+            airport = queue.popleft()
+            for source in incoming[airport]:
+                if source not in hops:
+                    hops[source] = hops[airport] + 1
+                    queue.append(source)
+        self._hops[destination] = hops
+        return hops
+
+    def _departures(self, airport, start, end):
+        times = self.departure_times.get(airport, [])
+        first, last = bisect_left(times, start), bisect_right(times, end)
+        return self.departures[airport][first:last]
+
+    def search(
+        self,
+        source,
+        destination,
+        start,
+        end,
+        max_legs=3,
+        min_connection=timedelta(minutes=60),
+        order_by="duration",
+        limit=20,
+    ):
+        """The best ``limit`` itineraries from ``source`` to ``destination``
+        whose first leg departs in ``[start, end]``, with at most ``max_legs``
+        legs, and whether the search gave up after ``MAX_PATHS`` paths.
+
+        Paths are explored best first: adding a leg never shortens the
+        duration or distance, so itineraries come out already ranked and the
+        search stops at the ``limit``-th."""
+        hops = self._hops_to(destination)
+        if source == destination or hops.get(source, max_legs + 1) > max_legs:
+            return [], False
+
+        if order_by == "distance":
+            key = attrgetter("distance", "duration")
+        else:
+            key = attrgetter("duration", "distance")
+
+        heap, order = [], itertools.count()
+
+        def push(path):
+            itinerary = Itinerary(path)
+            heapq.heappush(heap, (key(itinerary), next(order), itinerary))
+
+        found, explored = [], 0
+        for leg in self._departures(source, start, end):
+            push([leg])
+        while heap and len(found) < limit:
+            if explored == MAX_PATHS:
+                return found, True
+            itinerary = heapq.heappop(heap)[2]
+            explored += 1
+            path = itinerary.legs
+            last = path[-1]
+            if last.destination == destination:
+                found.append(itinerary)
+                continue
+
+            remaining = max_legs - len(path)
+            if hops.get(last.destination, remaining + 1) > remaining:
+                continue
+            visited = {leg.source for leg in path}
+            ready = last.arrival_time + min_connection
+            for leg in self._departures(last.destination, ready, last.arrival_time + MAX_LAYOVER):
+                if leg.destination not in visited:
+                    push(path + [leg])
+        return found, False
+
+
+_lock = threading.Lock()
+_index = None
+_index_version = None
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Lost from the cache: start a version no process has built yet.
+        cache.add(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_connection_index():
+    """Return this process's index, rebuilding it if routes or flights changed."""
+    global _index, _index_version
+
+    version = _current_version()
+    if _index is None or _index_version != version:
+        with _lock:
+            if _index is None or _index_version != version:
+                _index = ConnectionIndex.build()
+                _index_version = version
+    return _index
+
+
+def _bump_version():
+    # A fresh token rather than a counter, which could return to a number
+    # some process still holds after the key is evicted.
+    cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_connection_index():
+    # Bump again after commit so a rebuild racing with the writing
+    # transaction cannot keep serving the old schedule.
+    _bump_version()
+    transaction.on_commit(_bump_version)
@@ -0,0 +1,221 @@
+"""Order read model: ``OrderDocument`` rows that ``orders/`` is served from.
+
+A document holds an order's tickets with a snapshot of each ticket's flight,
+so a page of orders is one query on the order index instead of a walk over
+tickets, flights, routes, airports and airplanes. Seat counts change with
+every booking and are not part of the snapshot; the retrieve view reads
+them live.
+
+Documents are written with the order (``write_order_document``). Edits
+that change what a document shows drop the affected documents, and the next
+read rebuilds them: tickets saved or deleted one by one and flights deleted
+drop theirs in the same transaction; flights, routes, airports, airplanes
+and airplane types saved drop theirs once the change commits, a batch at a
+time. Drops and rebuilds lock the orders, so a rebuild that read tickets
+before a change cannot write them back after the change's drop.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from airport.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Flight,
+    Order,
+    OrderDocument,
+    Route,
+    Ticket,
+)
+from airport.rows import RowMapper, format_datetime
+
+DROP_BATCH_SIZE = 1000
+
+# The flight of a ticket as FlightListSerializer renders it, minus
+# taken_seats and available_seats.
+FLIGHT_SNAPSHOT_ROW = RowMapper(
+    ("id", "flight_id", None),
+    ("route", "flight__route_id", None),
+    ("airplane", "flight__airplane__name", None),
+    ("airplane_type", "flight__airplane__airplane_type__name", None),
+    ("departure", "flight__route__source__name", None),
+    ("arrival", "flight__route__destination__name", None),
+    ("departure_time", "flight__departure_time", format_datetime),
+    ("arrival_time", "flight__arrival_time", format_datetime),
+)
+
+
+def build_order_documents(order_ids):
+    """Write the documents of ``order_ids`` and return their tickets by order id."""
+    documents = {order_id: [] for order_id in order_ids}
+    with transaction.atomic(savepoint=False):
+        # The order locks are held until the documents are written: a drop
+        # waits for them, and the tickets are read after any drop holding
+        # them has committed.
+        _lock_orders(documents)
+        rows = (
+            Ticket.objects.filter(order_id__in=documents)
+            .order_by("order_id", "id")
+            .values("id", "row", "seat", "order_id", *FLIGHT_SNAPSHOT_ROW.columns)
+        )
+        for row in rows:
+            documents[row["order_id"]].append({
+                "id": row["id"],
+                "row": row["row"],
+                "seat": row["seat"],
+                "flight": FLIGHT_SNAPSHOT_ROW(row),
+            })
+
+        OrderDocument.objects.bulk_create(
+            [
+                OrderDocument(order_id=order_id, tickets=tickets)
+                for order_id, tickets in documents.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["order"],
+            update_fields=["tickets", "updated_at"],
+        )
+    return documents
+
+
+def write_order_document(order, tickets):
+    """Write the document of a new ``order`` from its saved ``tickets``, whose
+    flights have their route airports and airplane type loaded."""
+    OrderDocument.objects.create(
+        order=order,
+        tickets=[
+            {
+                "id": ticket.pk,
+                "row": ticket.row,
+                "seat": ticket.seat,
+                "flight": flight_snapshot(ticket.flight),
+            }
+            for ticket in sorted(tickets, key=lambda ticket: ticket.pk)
+        ],
+    )
+
+
+def flight_snapshot(flight):
+    """FLIGHT_SNAPSHOT_ROW of a Flight instance with its route airports and
+    airplane type loaded."""
+    return {
+        "id": flight.pk,
+        "route": flight.route_id,
+        "airplane": flight.airplane.name,
+        "airplane_type": flight.airplane.airplane_type.name,
+        "departure": flight.route.source.name,
+        "arrival": flight.route.destination.name,
+        "departure_time": format_datetime(flight.departure_time),
+        "arrival_time": format_datetime(flight.arrival_time),
+    }
+
+
+def order_documents(rows):
+    """Tickets by order id for ``rows`` read with a ``document__tickets``
+    column, rebuilding the documents that are missing."""
+    documents = {row["id"]: row["document__tickets"] for row in rows}
+    missing = [order_id for order_id, tickets in documents.items() if tickets is None]
+    if missing:
+        documents.update(build_order_documents(missing))
+    return documents
+
+
+def _lock_orders(order_ids):
+    return list(
+        Order.objects.select_for_update()
+        .filter(pk__in=order_ids)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+
+def drop_order_documents(order_ids):
+    """Delete the documents of ``order_ids`` (ids or an id queryset)."""
+    with transaction.atomic(savepoint=False):
+        OrderDocument.objects.filter(order_id__in=_lock_orders(order_ids)).delete()
+
+
+def _showing(instance):
+    """Filter on Ticket for the tickets whose flight snapshot shows ``instance``."""
+    if isinstance(instance, Flight):
+        return Q(flight=instance)
+    elif isinstance(instance, Route):
+        return Q(flight__route=instance)
+    elif isinstance(instance, Airport):
+        return Q(flight__route__source=instance) | Q(flight__route__destination=instance)
+    elif isinstance(instance, Airplane):
+        return Q(flight__airplane=instance)
+    elif isinstance(instance, AirplaneType):
+        return Q(flight__airplane__airplane_type=instance)
+    raise TypeError(f"Order documents do not show {type(instance).__name__}")
+
+
+def drop_documents_for(instance):
+    """Delete the documents showing ``instance``, a reference data object
+    that ticket flight snapshots are built from, once the change commits and
+    ``DROP_BATCH_SIZE`` orders at a time."""
+    documents = OrderDocument.objects.filter(
+        order__in=Ticket.objects.filter(_showing(instance)).values("order_id")
+    ).order_by("order_id").values_list("order_id", flat=True)
+
+    def drop():
+        last = 0
+        while batch := list(documents.filter(order_id__gt=last)[:DROP_BATCH_SIZE]):
+            drop_order_documents(batch)
+            last = batch[-1]
+
+    transaction.on_commit(drop)
+
+
+def drop_documents_for_flight_delete(flight):
+    """Delete the documents showing the tickets of ``flight``, which is about
+    to be deleted with them."""
+    drop_order_documents(Ticket.objects.filter(flight=flight).values("order_id"))
+
+
+def flight_availability(flight_ids):
+    """``{flight id: (taken seats, available seats)}``, read live."""
+    return {
+        pk: (taken, available)
+        for pk, taken, available in Flight.objects.with_availability()
+        .filter(pk__in=flight_ids)
+        .values_list("pk", "taken_seats_count", "available_seats_count")
+    }
+
+
+def render_order(row, email, tickets, availability=None):
+    """An order as OrderListSerializer renders it or, given the live
+    ``availability`` of its flights, as OrderRetrieveSerializer does."""
+    return {
+        "id": row["id"],
+        "created_at": format_datetime(row["created_at"]),
+        "user": email,
+        "tickets": [
+            {
+                "id": ticket["id"],
+                "row": ticket["row"],
+                "seat": ticket["seat"],
+                "flight": (
+                    ticket["flight"]["id"] if availability is None
+                    else _flight(ticket["flight"], availability)
+                ),
+            }
+            for ticket in tickets
+        ],
+    }
+
+
+def _flight(snapshot, availability):
+    taken, available = availability.get(snapshot["id"], (None, None))
+    return {
+        "id": snapshot["id"],
+        "route": snapshot["route"],
+        "airplane": snapshot["airplane"],
+        "airplane_type": snapshot["airplane_type"],
+        "taken_seats": taken,
+        "available_seats": available,
+        "departure": snapshot["departure"],
+        "arrival": snapshot["arrival"],
+        "departure_time": snapshot["departure_time"],
+        "arrival_time": snapshot["arrival_time"],
+    }
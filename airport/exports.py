@@ -0,0 +1,128 @@
+"""Streaming CSV and JSON Lines exports of bookings for reporting.
+
+Rows are read with a server-side cursor (``iterator``/``aiterator`` with
+``chunk_size``) and encoded a chunk at a time, so an export of millions of
+tickets holds one chunk in memory. Under ASGI the body is an async
+iterator; Django would otherwise read a synchronous one to the end before
+sending anything.
+"""
+import csv
+import io
+from itertools import islice
+
+import orjson
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Min
+from django.http import StreamingHttpResponse
+
+from airport.models import Order, Ticket
+from airport.rows import RowMapper, format_datetime
+
+CHUNK_SIZE = 2000
+
+
+TICKET_EXPORT_ROW = RowMapper(
+    ("order", "order_id", None),
+    ("booked_at", "order__created_at", format_datetime),
+    ("user", "order__user__email", None),
+    ("ticket", "id", None),
+    ("row", "row", None),
+    ("seat", "seat", None),
+    ("flight", "flight_id", None),
+    ("departure", "flight__route__source__name", None),
+    ("arrival", "flight__route__destination__name", None),
+    ("departure_time", "flight__departure_time", format_datetime),
+    ("arrival_time", "flight__arrival_time", format_datetime),
+    ("distance", "flight__route__distance", None),
+    ("airplane", "flight__airplane__name", None),
+    ("airplane_type", "flight__airplane__airplane_type__name", None),
+)
+
+ORDER_EXPORT_ROW = RowMapper(
+    ("order", "id", None),
+    ("booked_at", "created_at", format_datetime),
+    ("user", "user__email", None),
+    ("tickets", "ticket_count", None),
+    ("first_departure_time", "first_departure_time", format_datetime),
+)
+
+
+def ticket_export_queryset(start=None, end=None):
+    """Tickets of orders booked from ``start`` to before ``end`` (datetimes)."""
+    return _booked_between(Ticket.objects, "order__created_at", start, end).order_by(
+        "order_id", "id"
+    )
+
+
+def order_export_queryset(start=None, end=None):
+    """Orders booked from ``start`` to before ``end``, with ticket counts."""
+    return (
+        _booked_between(Order.objects, "created_at", start, end)
+        .annotate(
+            ticket_count=Count("tickets"),
+            first_departure_time=Min("tickets__flight__departure_time"),
+        )
+        .order_by("id")
+    )
+
+
+def _booked_between(queryset, field, start, end):
+    if start is not None:
+        queryset = queryset.filter(**{f"{field}__gte": start})
+    if end is not None:
+        queryset = queryset.filter(**{f"{field}__lt": end})
+    return queryset
+
+
+class _Encoder:
+    def __init__(self, mapper, file_format):
+        self.mapper = mapper
+        self.file_format = file_format
+
+    def header(self):
+        if self.file_format != "csv":
+            return b""
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(self.mapper.keys)
+        return buffer.getvalue().encode()
+
+    def encode(self, rows):
+        rows = self.mapper.map(rows)
+        if self.file_format == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(row.values() for row in rows)
+            return buffer.getvalue().encode()
+        return b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
+
+def _chunks(iterator, size):
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def stream_export(request, queryset, mapper, file_format, filename, chunk_size=CHUNK_SIZE):
+    """``StreamingHttpResponse`` of ``queryset`` rows mapped by ``mapper``."""
+    encoder = _Encoder(mapper, file_format)
+    rows = queryset.values(*mapper.columns)
+
+    if isinstance(request, ASGIRequest):
+        async def content():
+            yield encoder.header()
+            chunk = []
+            async for row in rows.aiterator(chunk_size=chunk_size):
+                chunk.append(row)
+                if len(chunk) == chunk_size:
+                    yield encoder.encode(chunk)
+                    chunk = []
+            if chunk:
+                yield encoder.encode(chunk)
+    else:
+        def content():
+            yield encoder.header()
+            for chunk in _chunks(rows.iterator(chunk_size=chunk_size), chunk_size):
+                yield encoder.encode(chunk)
+
+    content_type = "text/csv" if file_format == "csv" else "application/x-ndjson"
+    response = StreamingHttpResponse(content(), content_type=f"{content_type}; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{file_format}"'
+    return response
@@ -0,0 +1,119 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework.exceptions import ValidationError
+
+FLIGHT_FILTER_PARAMETERS = [
+    OpenApiParameter(
+        "source", OpenApiTypes.STR,
+        description="Departure airport id or name (ex. ?source=3 or ?source=Heathrow)",
+    ),
+    OpenApiParameter(
+        "destination", OpenApiTypes.STR,
+        description="Arrival airport id or name",
+    ),
+    OpenApiParameter(
+        "date", OpenApiTypes.DATE,
+        description="Departure date (ex. ?date=2025-07-01)",
+    ),
+    OpenApiParameter(
+        "departure_after", OpenApiTypes.DATETIME,
+        description="Earliest departure time, inclusive",
+    ),
+    OpenApiParameter(
+        "departure_before", OpenApiTypes.DATETIME,
+        description="Latest departure time, exclusive",
+    ),
+    OpenApiParameter(
+        "min_seats", OpenApiTypes.INT,
+        description="Minimum number of free seats",
+    ),
+]
+
+
+def _airport_lookup(prefix, value):
+    if value.isdigit():
+        return {f"{prefix}_id": int(value)}
+    return {f"{prefix}__name__iexact": value}
+
+
+def _datetime_param(params, name, errors):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = day and datetime.combine(day, time.min)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        errors[name] = "Use an ISO 8601 date or date-time."
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def filter_flights(queryset, params):
+    """Apply the flight search query parameters to ``queryset``.
+
+    Departure filters are ranges on ``departure_time`` (never a ``__date``
+    lookup) so they can use the (route, departure_time) and departure_time
+    indexes.
+    """
+    errors = {}
+
+    source = params.get("source")
+    if source:
+        queryset = queryset.filter(**_airport_lookup("route__source", source))
+
+    destination = params.get("destination")
+    if destination:
+        queryset = queryset.filter(**_airport_lookup("route__destination", destination))
+
+    date = params.get("date")
+    if date:
+        try:
+            day = parse_date(date)
+        except ValueError:
+            day = None
+        if day is None:
+            errors["date"] = "Use the YYYY-MM-DD format."
+        else:
+            start = timezone.make_aware(datetime.combine(day, time.min))
+            queryset = queryset.filter(
+                departure_time__gte=start,
+                departure_time__lt=start + timedelta(days=1),
+            )
+
+    departure_after = _datetime_param(params, "departure_after", errors)
+    if departure_after:
+        queryset = queryset.filter(departure_time__gte=departure_after)
+
+    departure_before = _datetime_param(params, "departure_before", errors)
+    if departure_before:
+        queryset = queryset.filter(departure_time__lt=departure_before)
+
+    min_seats = params.get("min_seats")
+    if min_seats:
+        try:
+            min_seats = int(min_seats)
+        except ValueError:
+            errors["min_seats"] = "A valid integer is required."
+        else:
+            queryset = queryset.filter(
+                seats_taken__lte=(
+                    F("airplane__rows") * F("airplane__seats_in_row") - min_seats
+                )
+            )
+
+    if errors:
+        raise ValidationError(errors)
+
+    return queryset
@@ -0,0 +1,100 @@
+"""``Idempotency-Key`` support for retried POSTs.
+
+A request with the header inserts an ``IdempotencyKey`` row for (user, key)
+before it does its work, in the same transaction, and stores its response
+there when it succeeds. A retry finds the row and gets the stored response
+back without running the view again. A duplicate sent while the first is
+still running blocks on the row's unique index until the first commits,
+then replays its response; if the first fails, nothing is stored and the
+duplicate runs in its place. Failed requests (4xx) are not stored.
+
+The replay carries the stored status, body and ``REPLAYED_HEADERS`` (the
+``Location`` of a created order or of a queued booking request).
+"""
+import hashlib
+
+import orjson
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from airport.models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADERS = ("Location",)
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was already used for a different request."
+    default_code = "idempotency_key_reused"
+
+
+def request_fingerprint(request):
+    return hashlib.sha256(
+        orjson.dumps(request.data, option=orjson.OPT_SORT_KEYS, default=str)
+    ).hexdigest()
+
+
+def _stored(user, key, now):
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record is not None and record.expires_at <= now:
+        record.delete()
+        return None
+    return record
+
+
+def _replay(record, fingerprint):
+    if record.fingerprint != fingerprint:
+        raise IdempotencyKeyReused()
+    response = Response(record.response, status=record.status_code, headers=record.headers)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+class IdempotentCreateMixin:
+    """Make ``create`` idempotent for requests with an ``Idempotency-Key``."""
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return super().create(request, *args, **kwargs)
+        if not 1 <= len(key) <= IdempotencyKey._meta.get_field("key").max_length:
+            raise ValidationError({HEADER: "Must be 1 to 255 characters long."})
+
+        fingerprint = request_fingerprint(request)
+        now = timezone.now()
+        record = _stored(request.user, key, now)
+        if record is not None:
+            return _replay(record, fingerprint)
+
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=request.user,
+                    key=key,
+                    fingerprint=fingerprint,
+                    expires_at=now + settings.IDEMPOTENCY_KEY_TTL,
+                )
+                response = super().create(request, *args, **kwargs)
+                record.status_code = response.status_code
+                record.response = response.data
+                record.headers = {
+                    name: response[name] for name in REPLAYED_HEADERS if name in response
+                }
+                record.save(update_fields=["status_code", "response", "headers"])
+        except IntegrityError:
+            # A concurrent request with the key committed first.
+            record = _stored(request.user, key, now)
+            if record is None:
+                raise
+            return _replay(record, fingerprint)
+        return response
+
+
+def purge_expired_keys(now=None):
+    """Delete every expired key in one statement; return how many."""
+    return IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()[0]
@@ -0,0 +1,146 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from airport.benchmark import SCENARIOS, Benchmark, ClientDriver, HttpDriver, compare
+from airport.seeding import SEED_PASSWORD, seed_airport
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the API routes and prints throughput, latency percentiles "
+        "and queries per request as JSON. By default the data is seeded into a "
+        "throwaway test database and requests go through the test client."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            help="Benchmark a running server (ex. http://localhost:8000) instead",
+        )
+        parser.add_argument(
+            "--existing-db",
+            action="store_true",
+            help="Use the configured database instead of a throwaway test database",
+        )
+        parser.add_argument(
+            "--no-seed",
+            action="store_true",
+            help="Do not seed data (requires --email and --password)",
+        )
+        parser.add_argument("--email", help="User to log in as")
+        parser.add_argument("--password")
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=SCENARIOS,
+            dest="scenarios",
+            help="Scenario to run, may be repeated (default: all)",
+        )
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--requests", type=int, default=200, help="Per scenario")
+        parser.add_argument("--warmup", type=int, default=10, help="Per scenario")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--flights", type=int, default=2000)
+        parser.add_argument("--orders", type=int, default=2000)
+        parser.add_argument("--output", help="Also write the JSON report to this file")
+        parser.add_argument(
+            "--compare",
+            help="Fail if p95 latency or queries per request regressed against "
+                 "this earlier report",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed p95 latency growth for --compare (default: 0.2, i.e. 20%%)",
+        )
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be at least 1")
+        seed = not (options["no_seed"] or options["url"])
+        if not seed and not (options["email"] and options["password"]):
+            raise CommandError("--email and --password are required without seeding")
+
+        if options["url"] or options["existing_db"]:
+            report = self.benchmark(options, seed)
+        else:
+            setup_test_environment(debug=False)
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                report = self.benchmark(options, seed)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+
+        if options["compare"]:
+            with open(options["compare"]) as file:
+                baseline = json.load(file)
+            regressions = compare(report, baseline, options["tolerance"])
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}")
+
+    def benchmark(self, options, seed):
+        dataset = None
+        email, password = options["email"], options["password"]
+        if seed:
+            dataset = seed_airport(
+                flights=options["flights"],
+                orders=options["orders"],
+                seed=options["seed"],
+            )
+            email = email or f"seed{options['seed']}-0@example.com"
+            password = password or SEED_PASSWORD
+
+        driver = HttpDriver(options["url"]) if options["url"] else ClientDriver()
+        scenarios = options["scenarios"] or SCENARIOS
+        benchmark = Benchmark(
+            driver,
+            email,
+            password,
+            concurrency=options["concurrency"],
+            requests=options["requests"],
+            warmup=options["warmup"],
+        )
+        try:
+            benchmark.prepare(scenarios)
+        except ValueError as error:
+            raise CommandError(error)
+
+        return {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": options["url"] or connection.vendor,
+            "concurrency": options["concurrency"],
+            "dataset": dataset,
+            "scenarios": {scenario: benchmark.run(scenario) for scenario in scenarios},
+        }
@@ -0,0 +1,71 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from airport.schedule_import import FORMATS, ScheduleImporter, guess_format, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports flights from a CSV or JSON Lines schedule, a chunk at a time. "
+        "Valid rows are inserted even when others are rejected."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Schedule file, or - for standard input")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            dest="file_format",
+            help="Defaults to the file's extension",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--max-errors", type=int, default=1000, help="Errors to list")
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Validate without inserting anything"
+        )
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Use bulk_create instead of COPY on PostgreSQL",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["file_format"] or guess_format(path)
+        if file_format is None:
+            raise CommandError("Cannot tell the format from the file name, use --format")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+
+        importer = ScheduleImporter(
+            chunk_size=options["chunk_size"],
+            use_copy=False if options["no_copy"] else None,
+            dry_run=options["dry_run"],
+            max_errors=options["max_errors"],
+        )
+
+        def progress(report):
+            self.stdout.write(
+                f"Chunk {report['chunks']}: {report['rows']} rows read, "
+                f"{report['created']} valid, {report['rejected']} rejected"
+            )
+
+        if path == "-":
+            report = importer.run(read_rows(sys.stdin.buffer, file_format), progress)
+        else:
+            try:
+                stream = open(path, "rb")
+            except OSError as error:
+                raise CommandError(error)
+            with stream:
+                report = importer.run(read_rows(stream, file_format), progress)
+
+        for error in report["errors"]:
+            details = "; ".join(f"{field}: {message}" for field, message in error["errors"].items())
+            self.stderr.write(f"Line {error['line']}: {details}")
+
+        verb = "Would import" if options["dry_run"] else "Imported"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {report['created']} flight(s)"))
+        if report["rejected"]:
+            raise CommandError(f"{report['rejected']} row(s) rejected")
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from airport.partitions import MONTHS_AHEAD, is_partitioned, manage_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the ticket partitions of the coming months and detaches "
+        "(or archives) those past retention; PostgreSQL only"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=MONTHS_AHEAD,
+            help="Months after the current one to have partitions for",
+        )
+        parser.add_argument(
+            "--retain-months",
+            type=int,
+            help="Detach the partitions of months more than this many months ago",
+        )
+        parser.add_argument(
+            "--archive-dir",
+            help="Write detached partitions to gzipped CSV files here and drop them",
+        )
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError("The ticket table is not partitioned (PostgreSQL only)")
+        if options["archive_dir"] and options["retain_months"] is None:
+            raise CommandError("--archive-dir needs --retain-months")
+
+        created, detached = manage_partitions(
+            months_ahead=options["months_ahead"],
+            retain_months=options["retain_months"],
+            archive_dir=options["archive_dir"],
+        )
+        for name in created:
+            self.stdout.write(f"Created {name}")
+        for name, path in detached:
+            self.stdout.write(f"Archived {name} to {path}" if path else f"Detached {name}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(created)} and detached {len(detached)} partition(s)"
+        ))
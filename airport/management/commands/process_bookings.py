@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from airport.bookings import BATCH_SIZE, process_batch
+
+
+class Command(BaseCommand):
+    help = "Books the orders waiting in the booking queue, a batch per flight at a time"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queue is empty instead of waiting for more",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=0.5,
+            help="Seconds to wait when the queue is empty (default: 0.5)",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        confirmed = rejected = 0
+        try:
+            while True:
+                batch = process_batch(options["batch_size"])
+                if not batch:
+                    if options["once"]:
+                        break
+                    close_old_connections()
+                    time.sleep(options["poll_interval"])
+                    continue
+                done = sum(booking.status == booking.CONFIRMED for booking in batch)
+                confirmed += done
+                rejected += len(batch) - done
+                if options["verbosity"] > 1:
+                    self.stdout.write(
+                        f"Flight {batch[0].flight_id}: {done} confirmed, "
+                        f"{len(batch) - done} rejected"
+                    )
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(
+            self.style.SUCCESS(f"Confirmed {confirmed} and rejected {rejected} booking(s)")
+        )
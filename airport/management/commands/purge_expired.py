@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from airport.idempotency import purge_expired_keys
+from airport.reservations import purge_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Deletes expired seat holds and idempotency keys"
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_holds()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired seat hold(s)"))
+        deleted = purge_expired_keys()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency key(s)"))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from airport.occupancy import rebuild_occupancy, stale_occupancy
+
+
+class Command(BaseCommand):
+    help = "Rebuilds (or checks) the route occupancy statistics from the Flight table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report statistics rows that are out of date",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if not options["check"]:
+            written = rebuild_occupancy(batch_size=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} occupancy row(s)"))
+            return
+
+        stale = 0
+        for (route_id, airplane_type_id, day), stored, actual in stale_occupancy(
+            batch_size=options["batch_size"]
+        ):
+            self.stdout.write(
+                f"Route {route_id}, airplane type {airplane_type_id}, {day}: "
+                f"stored {stored}, actual {actual} (flights, seats, tickets)"
+            )
+            stale += 1
+        if stale:
+            raise CommandError(f"{stale} occupancy row(s) out of date")
+        self.stdout.write(self.style.SUCCESS("All occupancy statistics are up to date"))
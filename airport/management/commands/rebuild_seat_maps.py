@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from airport.models import Flight
+from airport.partitions import retained_since
+from airport.seats import build_seat_maps, rebuild_seat_maps
+
+
+class Command(BaseCommand):
+    help = "Rebuilds (or checks) flight seat maps from the Ticket table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report flights whose stored seat map is out of date",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("flights", nargs="*", type=int, help="Flight ids")
+
+    def handle(self, *args, **options):
+        flight_ids = Flight.objects.order_by("pk").values_list("pk", flat=True)
+        if options["flights"]:
+            flight_ids = flight_ids.filter(pk__in=options["flights"])
+        # Older flights may have had their tickets archived.
+        if (since := retained_since()) is not None:
+            flight_ids = flight_ids.filter(departure_time__gte=since)
+
+        batch_size = options["batch_size"]
+        batch, stale = [], 0
+        for flight_id in flight_ids.iterator(chunk_size=batch_size):
+            batch.append(flight_id)
+            if len(batch) == batch_size:
+                stale += self.process(batch, options["check"])
+                batch = []
+        if batch:
+            stale += self.process(batch, options["check"])
+
+        if options["check"]:
+            if stale:
+                raise CommandError(f"{stale} flight seat map(s) out of date")
+            self.stdout.write(self.style.SUCCESS("All seat maps are up to date"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {stale} seat map(s)"))
+
+    def process(self, flight_ids, check):
+        flights = Flight.objects.select_related("airplane").filter(pk__in=flight_ids)
+
+        if not check:
+            with transaction.atomic():
+                return len(rebuild_seat_maps(flights.select_for_update(of=("self",))))
+
+        stale = 0
+        flights = list(flights)
+        seat_maps = build_seat_maps(flights)
+        for flight in flights:
+            seat_map = seat_maps[flight.pk]
+            if (
+                bytes(flight.seat_map or b"") != seat_map.to_bytes()
+                or flight.seats_taken != seat_map.count()
+            ):
+                self.stdout.write(f"Flight {flight.pk}: seat map out of date")
+                stale += 1
+        return stale
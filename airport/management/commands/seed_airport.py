@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from airport.seeding import seed_airport
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a deterministic synthetic schedule: airports, a fleet, a hub "
+        "and spoke route network, flights, orders and tickets"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--airports", type=int, default=50)
+        parser.add_argument("--airplanes", type=int, default=40)
+        parser.add_argument("--routes", type=int, default=300)
+        parser.add_argument("--flights", type=int, default=100000)
+        parser.add_argument("--orders", type=int, default=1000000)
+        parser.add_argument("--tickets-per-order", type=int, default=3)
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--crews", type=int, default=300)
+        parser.add_argument("--days", type=int, default=365, help="Schedule length")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000, help="Flights per batch")
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Use bulk_create instead of COPY on PostgreSQL",
+        )
+
+    def handle(self, *args, **options):
+        if options["airports"] < 2:
+            raise CommandError("--airports must be at least 2")
+        for option in (
+            "airplanes", "routes", "users", "crews", "days", "batch_size", "tickets_per_order"
+        ):
+            if options[option] < 1:
+                raise CommandError(f"--{option.replace('_', '-')} must be at least 1")
+
+        started = time.monotonic()
+
+        def progress(label, done, total):
+            self.stdout.write(
+                f"{label}: {done}/{total} ({done * 100 // max(total, 1)}%) "
+                f"{time.monotonic() - started:.1f}s"
+            )
+
+        counts = seed_airport(
+            airports=options["airports"],
+            airplanes=options["airplanes"],
+            routes=options["routes"],
+            flights=options["flights"],
+            orders=options["orders"],
+            tickets_per_order=options["tickets_per_order"],
+            users=options["users"],
+            crews=options["crews"],
+            days=options["days"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            use_copy=connection.vendor == "postgresql" and not options["no_copy"],
+            progress=progress,
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            ", ".join(f"{count} {name}" for name, count in counts.items())
+            + f" in {elapsed:.1f}s ({counts['tickets'] / elapsed:.0f} tickets/s)"
+        ))
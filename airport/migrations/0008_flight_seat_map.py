@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:07
+
+from django.db import migrations, models
+
+
+def fill_seat_maps(apps, schema_editor):
+    # The layout of airport.seats.SeatMap as of this migration: one bit per
+    # seat, row-major, least significant bit first; seats outside the
+    # airplane are left out.
+    Flight = apps.get_model("airport", "Flight")
+    Ticket = apps.get_model("airport", "Ticket")
+
+    for flight in Flight.objects.select_related("airplane").iterator():
+        rows, seats_in_row = flight.airplane.rows, flight.airplane.seats_in_row
+        bits = bytearray((rows * seats_in_row + 7) // 8)
+        for row, seat in Ticket.objects.filter(flight=flight).values_list("row", "seat"):
+            if 1 <= row <= rows and 1 <= seat <= seats_in_row:
+                index = (row - 1) * seats_in_row + (seat - 1)
+                bits[index >> 3] |= 1 << (index & 7)
+        flight.seat_map = bytes(bits)
+        flight.seats_taken = int.from_bytes(bits, "little").bit_count()
+        flight.save(update_fields=["seat_map", "seats_taken"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("airport", "0006_alter_ticket_flight_squashed_0007_alter_ticket_flight"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="flight",
+            name="seat_map",
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.AddField(
+            model_name="flight",
+            name="seats_taken",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_seat_maps, migrations.RunPython.noop),
+    ]
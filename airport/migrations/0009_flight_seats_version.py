@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("airport", "0008_flight_seat_map"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="flight",
+            name="seats_version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def remove_double_bookings(apps, schema_editor):
+    """Keep the first ticket sold for each seat and delete the later ones,
+    which the seat's new unique constraint would reject, listing them so
+    their orders can be followed up."""
+    Ticket = apps.get_model("airport", "Ticket")
+
+    seats = (
+        Ticket.objects.values("flight_id", "row", "seat")
+        .annotate(tickets=models.Count("id"), first=models.Min("id"))
+        .filter(tickets__gt=1)
+    )
+    for seat in list(seats):
+        duplicates = Ticket.objects.filter(
+            flight_id=seat["flight_id"], row=seat["row"], seat=seat["seat"], id__gt=seat["first"]
+        )
+        for ticket_id, order_id in duplicates.values_list("id", "order_id"):
+            print(
+                f"\n  Deleting ticket {ticket_id} of order {order_id}: seat "
+                f"{seat['row']}-{seat['seat']} of flight {seat['flight_id']} was "
+                f"already sold as ticket {seat['first']}."
+            )
+        duplicates.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("airport", "0009_flight_seats_version"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SeatHold",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("row", models.IntegerField()),
+                ("seat", models.IntegerField()),
+                ("expires_at", models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.RunPython(remove_double_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="ticket",
+            constraint=models.UniqueConstraint(fields=("flight", "row", "seat"), name="unique_ticket_seat"),
+        ),
+        migrations.AddField(
+            model_name="seathold",
+            name="flight",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="holds", to="airport.flight"),
+        ),
+        migrations.AddField(
+            model_name="seathold",
+            name="user",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name="seathold",
+            constraint=models.UniqueConstraint(fields=("flight", "row", "seat"), name="unique_seat_hold"),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("airport", "0012_order_user_created_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderDocument",
+            fields=[
+                ("order", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="document", serialize=False, to="airport.order")),
+                ("tickets", models.JSONField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("airport", "0013_order_document"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RouteOccupancy",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("day", models.DateField()),
+                ("flights", models.PositiveIntegerField(default=0)),
+                ("seats", models.PositiveIntegerField(default=0)),
+                ("tickets", models.IntegerField(default=0)),
+                ("airplane_type", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="+", to="airport.airplanetype")),
+                ("route", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="+", to="airport.route")),
+            ],
+            options={
+                "indexes": [models.Index(fields=["day"], name="route_occupancy_day_idx")],
+                "constraints": [models.UniqueConstraint(fields=("route", "airplane_type", "day"), name="unique_route_occupancy")],
+            },
+        ),
+    ]
@@ -0,0 +1,164 @@
+from datetime import date, timezone as dt_timezone
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Copied from airport.partitions, which imports the current models and so
+# cannot be used by a migration.
+MONTHS_AHEAD = 3
+
+
+def _month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return date(value.year, value.month, 1)
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_partition(execute, month):
+    start, end = month, _add_months(month, 1)
+    execute(
+        f"CREATE TABLE airport_ticket_{month:%Y_%m} PARTITION OF airport_ticket"
+        f" FOR VALUES FROM ('{start.isoformat()} 00:00:00+00')"
+        f" TO ('{end.isoformat()} 00:00:00+00')"
+    )
+
+
+def partition_tickets(apps, schema_editor):
+    """Recreate airport_ticket as a table partitioned by departure month."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    execute = schema_editor.execute
+    execute("ALTER TABLE airport_ticket RENAME TO airport_ticket_unpartitioned")
+    # Partitioned tables cannot have identity columns before PostgreSQL 17,
+    # and their primary key must include the partition key.
+    execute(
+        "CREATE TABLE airport_ticket ("
+        " id bigint NOT NULL,"
+        ' "row" integer NOT NULL,'
+        " seat integer NOT NULL,"
+        " flight_id bigint NOT NULL,"
+        " order_id bigint NOT NULL,"
+        " departure_time timestamp with time zone NOT NULL,"
+        " PRIMARY KEY (id, departure_time)"
+        ") PARTITION BY RANGE (departure_time)"
+    )
+    execute("CREATE TABLE airport_ticket_default PARTITION OF airport_ticket DEFAULT")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT min(departure_time) FROM airport_ticket_unpartitioned")
+        first = cursor.fetchone()[0]
+    current = _month_start(timezone.now())
+    month = min(_month_start(first), current) if first else current
+    # The new table is still empty, so there is nothing to move out of the
+    # default partition.
+    while month <= _add_months(current, MONTHS_AHEAD):
+        _create_partition(execute, month)
+        month = _add_months(month, 1)
+    execute(
+        'INSERT INTO airport_ticket (id, "row", seat, flight_id, order_id, departure_time)'
+        ' SELECT id, "row", seat, flight_id, order_id, departure_time'
+        " FROM airport_ticket_unpartitioned"
+    )
+    execute("DROP TABLE airport_ticket_unpartitioned")
+
+    execute("CREATE SEQUENCE airport_ticket_id_seq OWNED BY airport_ticket.id")
+    execute(
+        "SELECT setval('airport_ticket_id_seq', coalesce(max(id), 0) + 1, false)"
+        " FROM airport_ticket"
+    )
+    execute(
+        "ALTER TABLE airport_ticket ALTER COLUMN id SET DEFAULT nextval('airport_ticket_id_seq')"
+    )
+    # Also the index on flight_id, which it starts with.
+    execute(
+        "ALTER TABLE airport_ticket ADD CONSTRAINT unique_ticket_seat"
+        ' UNIQUE (flight_id, "row", seat, departure_time)'
+    )
+    _add_foreign_keys(execute)
+
+
+def unpartition_tickets(apps, schema_editor):
+    """Copy the attached partitions back into a plain airport_ticket table;
+    detached partitions are left as they are."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    execute = schema_editor.execute
+    execute(
+        "CREATE TABLE airport_ticket_unpartitioned ("
+        " id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,"
+        ' "row" integer NOT NULL,'
+        " seat integer NOT NULL,"
+        " flight_id bigint NOT NULL,"
+        " order_id bigint NOT NULL,"
+        " departure_time timestamp with time zone NOT NULL"
+        ")"
+    )
+    execute(
+        "INSERT INTO airport_ticket_unpartitioned"
+        ' (id, "row", seat, flight_id, order_id, departure_time)'
+        ' SELECT id, "row", seat, flight_id, order_id, departure_time FROM airport_ticket'
+    )
+    execute("DROP TABLE airport_ticket")
+    execute("ALTER TABLE airport_ticket_unpartitioned RENAME TO airport_ticket")
+    execute(
+        "SELECT setval(pg_get_serial_sequence('airport_ticket', 'id'),"
+        " coalesce(max(id), 0) + 1, false) FROM airport_ticket"
+    )
+    execute(
+        "ALTER TABLE airport_ticket ADD CONSTRAINT unique_ticket_seat"
+        ' UNIQUE (flight_id, "row", seat, departure_time)'
+    )
+    execute("CREATE INDEX airport_ticket_flight_id_idx ON airport_ticket (flight_id)")
+    _add_foreign_keys(execute)
+
+
+def _add_foreign_keys(execute):
+    execute(
+        "ALTER TABLE airport_ticket ADD CONSTRAINT airport_ticket_flight_id_fk"
+        " FOREIGN KEY (flight_id) REFERENCES airport_flight (id) DEFERRABLE INITIALLY DEFERRED"
+    )
+    execute(
+        "ALTER TABLE airport_ticket ADD CONSTRAINT airport_ticket_order_id_fk"
+        ' FOREIGN KEY (order_id) REFERENCES airport_order (id) DEFERRABLE INITIALLY DEFERRED'
+    )
+    execute("CREATE INDEX airport_ticket_order_id_idx ON airport_ticket (order_id)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("airport", "0016_booking_request"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ticket",
+            name="departure_time",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            "UPDATE airport_ticket SET departure_time = ("
+            "SELECT departure_time FROM airport_flight"
+            " WHERE airport_flight.id = airport_ticket.flight_id)",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name="ticket",
+            name="departure_time",
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.RemoveConstraint(
+            model_name="ticket",
+            name="unique_ticket_seat",
+        ),
+        migrations.AddConstraint(
+            model_name="ticket",
+            constraint=models.UniqueConstraint(
+                fields=("flight", "row", "seat", "departure_time"), name="unique_ticket_seat"
+            ),
+        ),
+        migrations.RunPython(partition_tickets, unpartition_tickets),
+    ]
@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 
+from airport.seats import SeatMap
+
 
 class Airport(models.Model):
     name = models.CharField(max_length=80, unique=True)
@@ -32,57 +34,257 @@ class Route(models.Model):
     destination = models.ForeignKey("Airport", on_delete=models.PROTECT, related_name="arrivals")
     distance = models.IntegerField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["source", "destination"], name="route_source_dest_idx"),
+        ]
+
     def __str__(self):
         return f"{self.source}, {self.destination}"
 
 
+class FlightQuerySet(models.QuerySet):
+    def with_availability(self):
+        return self.annotate(
+            capacity=models.F("airplane__rows") * models.F("airplane__seats_in_row"),
+            taken_seats_count=models.F("seats_taken"),
+        ).annotate(
+            available_seats_count=models.F("capacity") - models.F("taken_seats_count"),
+        )
+
+
 class Flight(models.Model):
     route = models.ForeignKey("Route", on_delete=models.PROTECT)
     airplane = models.ForeignKey("Airplane", on_delete=models.PROTECT)
     departure_time = models.DateTimeField()
     arrival_time = models.DateTimeField()
     members = models.ManyToManyField("Crew", related_name="crews")
+    seat_map = models.BinaryField(default=bytes, editable=False)
+    seats_taken = models.PositiveIntegerField(default=0, editable=False)
+    seats_version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = FlightQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["departure_time"], name="flight_departure_idx"),
+            models.Index(fields=["route", "departure_time"], name="flight_route_departure_idx"),
+        ]
 
     def __str__(self):
         return f"{self.route} - {self.airplane}"
 
+    @property
+    def seats(self) -> SeatMap:
+        return SeatMap.for_flight(self)
+
     @property
     def available_seats(self):
         total_seats = self.airplane.rows * self.airplane.seats_in_row
 
-        taken_seats = self.tickets.count()
-
-        return total_seats - taken_seats
+        return total_seats - self.seats_taken
 
     @property
     def taken_seats_detail(self):
-        return [
-            {"row": ticket.row, "seat": ticket.seat}
-            for ticket in Ticket.objects.all()
-        ]
+        return [{"row": row, "seat": seat} for row, seat in self.seats.taken()]
 
     @property
     def taken_seats_list(self):
-        return self.tickets.count()
+        return self.seats_taken
+
+    def is_seat_free(self, row, seat) -> bool:
+        return not self.seats.is_taken(row, seat)
+
+
+class RouteOccupancy(models.Model):
+    """Flights, seats and tickets sold per route, airplane type and
+    departure day, which ``stats/occupancy/`` is served from.
+
+    Kept up to date by ``airport.occupancy``; ``rebuild_occupancy``
+    recomputes it from the Flight table.
+    """
+
+    route = models.ForeignKey("Route", on_delete=models.CASCADE, related_name="+")
+    airplane_type = models.ForeignKey("AirplaneType", on_delete=models.CASCADE, related_name="+")
+    day = models.DateField()
+    flights = models.PositiveIntegerField(default=0)
+    seats = models.PositiveIntegerField(default=0)
+    tickets = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["route", "airplane_type", "day"], name="unique_route_occupancy"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["day"], name="route_occupancy_day_idx"),
+        ]
+
+    @property
+    def load_factor(self):
+        return self.tickets / self.seats if self.seats else None
+
+    def __str__(self):
+        return f"{self.route_id}, {self.airplane_type_id}, {self.day}: {self.tickets}/{self.seats}"
 
 
 class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at", "id"], name="order_user_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.created_at}, {self.user}"
 
 
+class OrderDocument(models.Model):
+    """Denormalized copy of an order's tickets with a snapshot of their
+    flights, which ``orders/`` list and retrieve are served from.
+
+    Kept up to date by ``airport.documents``; a missing document is rebuilt
+    when the order is next read.
+    """
+
+    order = models.OneToOneField(
+        Order, on_delete=models.CASCADE, primary_key=True, related_name="document"
+    )
+    tickets = models.JSONField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Document of order {self.order_id}"
+
+
+class IdempotencyKey(models.Model):
+    """The response to a request made with an ``Idempotency-Key`` header,
+    replayed when the same user sends the key again before ``expires_at``."""
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True)
+    headers = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="unique_idempotency_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.key}, {self.user} until {self.expires_at}"
+
+
+class BookingRequest(models.Model):
+    """An order waiting in the booking queue for ``process_bookings``.
+
+    ``tickets`` are the validated ``{"flight", "row", "seat"}`` of the order;
+    ``flight`` is the lowest of their flights, which requests are batched by.
+    """
+
+    PENDING = "pending"
+    CONFIRMED = "confirmed"
+    REJECTED = "rejected"
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (CONFIRMED, "Confirmed"),
+        (REJECTED, "Rejected"),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    flight = models.ForeignKey("Flight", on_delete=models.SET_NULL, null=True, related_name="+")
+    tickets = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    order = models.OneToOneField(
+        "Order", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    errors = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["flight", "id"],
+                condition=models.Q(status="pending"),
+                name="booking_request_pending_idx",
+            ),
+            models.Index(
+                fields=["id"],
+                condition=models.Q(status="pending"),
+                name="booking_request_queue_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Booking {self.pk} by {self.user}: {self.status}"
+
+
+class TicketQuerySet(models.QuerySet):
+    def for_flights(self, flights):
+        """Tickets of ``flights``, also filtered by their departure times so
+        that only the partitions of those months are read."""
+        departures = [flight.departure_time for flight in flights]
+        if not departures:
+            return self.none()
+        return self.filter(
+            flight__in=flights, departure_time__range=(min(departures), max(departures))
+        )
+
+
 class Ticket(models.Model):
     row = models.IntegerField()
     seat = models.IntegerField()
     flight = models.ForeignKey("Flight", on_delete=models.CASCADE, related_name="tickets")
     order = models.ForeignKey("Order", on_delete=models.CASCADE, related_name="tickets")
+    # The flight's, which the table is partitioned by (see airport.partitions).
+    departure_time = models.DateTimeField(editable=False)
+
+    objects = TicketQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # The departure time is the flight's, so this is (flight, row,
+            # seat); PostgreSQL needs the partition key in unique constraints.
+            models.UniqueConstraint(
+                fields=["flight", "row", "seat", "departure_time"], name="unique_ticket_seat"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.row}, {self.seat}, {self.order}"
 
+    def save(self, *args, **kwargs):
+        self.departure_time = self.flight.departure_time
+        # The flight's seat map is updated from post_save, inside this block.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class SeatHold(models.Model):
+    row = models.IntegerField()
+    seat = models.IntegerField()
+    flight = models.ForeignKey("Flight", on_delete=models.CASCADE, related_name="holds")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["flight", "row", "seat"], name="unique_seat_hold"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.row}, {self.seat}, {self.user} until {self.expires_at}"
+
 
 class Crew(models.Model):
     first_name = models.CharField(max_length=80)
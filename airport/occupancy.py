@@ -0,0 +1,217 @@
+"""Occupancy statistics: ``RouteOccupancy`` rows that ``stats/occupancy/``
+is served from.
+
+A row counts the flights, seats (``rows * seats_in_row``) and tickets sold
+for one route, airplane type and departure day (in the current time zone),
+so load factors are read from a table of a few rows per route and day
+instead of an aggregation over every ticket.
+
+Tickets are counted as seat maps change (``count_tickets``, called by
+``airport.seats`` in the same transaction). Flights saved or deleted and
+airplanes changed recompute the route days they touch
+(``refresh_occupancy``); ``rebuild_occupancy`` recomputes everything. Both
+read ``Flight.seats_taken``, so fix seat maps with ``rebuild_seat_maps``
+first if they are out of date. Each also drops the cached availability
+calendars of the route days it changes (``airport.availability``).
+"""
+from datetime import datetime, time, timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Max, Min, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from airport.availability import months_between, touch_calendars
+from airport.models import Flight, RouteOccupancy
+
+STAT_FIELDS = ("flights", "seats", "tickets")
+OCCUPANCY_GROUPS = ("route", "airplane_type", "day")
+_GROUP_COLUMNS = {"route": "route_id", "airplane_type": "airplane_type_id", "day": "day"}
+
+
+def departure_day(departure_time):
+    """The day of a departure time, which may be given as a string."""
+    departure_time = Flight._meta.get_field("departure_time").to_python(departure_time)
+    if timezone.is_naive(departure_time):
+        departure_time = timezone.make_aware(departure_time)
+    return timezone.localdate(departure_time)
+
+
+def occupancy_key(flight):
+    """``(route id, airplane type id, day)`` of a flight with its airplane loaded."""
+    return (
+        flight.route_id,
+        flight.airplane.airplane_type_id,
+        departure_day(flight.departure_time),
+    )
+
+
+def count_tickets(deltas):
+    """Add ``{occupancy key: change in tickets}`` to the statistics, in one
+    update whatever the number of keys."""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    touch_calendars({(route_id, day) for route_id, _, day in deltas})
+    matches = {
+        key: Q(route_id=key[0], airplane_type_id=key[1], day=key[2]) for key in deltas
+    }
+    rows = RouteOccupancy.objects.filter(reduce(or_, matches.values()))
+    updated = rows.update(
+        tickets=F("tickets") + Case(
+            *(When(matches[key], then=Value(delta)) for key, delta in deltas.items()),
+            default=Value(0),
+        )
+    )
+    if updated < len(deltas):
+        found = set(rows.values_list("route_id", "airplane_type_id", "day"))
+        for route_id, _, day in deltas.keys() - found:
+            refresh_occupancy([route_id], day, day)
+
+
+def aggregate_occupancy(flights):
+    """RouteOccupancy field values aggregated from a Flight queryset."""
+    return (
+        flights.annotate(day=TruncDate("departure_time"))
+        .values("route_id", "day", airplane_type_id=F("airplane__airplane_type_id"))
+        .annotate(
+            flight_count=Count("id"),
+            seat_count=Sum(F("airplane__rows") * F("airplane__seats_in_row")),
+            ticket_count=Sum("seats_taken"),
+        )
+        .order_by("route_id", "airplane_type_id", "day")
+    )
+
+
+def _occupancy(row):
+    return RouteOccupancy(
+        route_id=row["route_id"],
+        airplane_type_id=row["airplane_type_id"],
+        day=row["day"],
+        flights=row["flight_count"],
+        seats=row["seat_count"],
+        tickets=row["ticket_count"],
+    )
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def refresh_occupancy(route_ids, first_day, last_day):
+    """Recompute the statistics of ``route_ids`` from ``first_day`` to
+    ``last_day`` inclusive from their flights."""
+    route_ids = set(route_ids)
+    if not route_ids:
+        return
+    touch_calendars(
+        (route_id, month)
+        for route_id in route_ids
+        for month in months_between(first_day, last_day)
+    )
+    with transaction.atomic(savepoint=False):
+        # Deleted first, so a booking counting into these rows commits
+        # before the flights are read.
+        RouteOccupancy.objects.filter(
+            route_id__in=route_ids, day__range=(first_day, last_day)
+        ).delete()
+        rows = aggregate_occupancy(
+            Flight.objects.filter(
+                route_id__in=route_ids,
+                departure_time__gte=_day_start(first_day),
+                departure_time__lt=_day_start(last_day + timedelta(days=1)),
+            )
+        )
+        RouteOccupancy.objects.bulk_create(
+            [_occupancy(row) for row in rows],
+            update_conflicts=True,
+            unique_fields=["route", "airplane_type", "day"],
+            update_fields=STAT_FIELDS,
+        )
+
+
+def refresh_flight_occupancy(flights):
+    """Recompute the statistics of the route days of a Flight queryset."""
+    bounds = flights.aggregate(first=Min("departure_time"), last=Max("departure_time"))
+    if bounds["first"] is not None:
+        refresh_occupancy(
+            flights.order_by().values_list("route_id", flat=True).distinct(),
+            timezone.localdate(bounds["first"]),
+            timezone.localdate(bounds["last"]),
+        )
+
+
+def rebuild_occupancy(batch_size=5000):
+    """Recompute every statistics row; return the number of rows written."""
+    written = 0
+    touch_calendars()
+    with transaction.atomic():
+        RouteOccupancy.objects.all().delete()
+        batch = []
+        for row in aggregate_occupancy(Flight.objects.all()).iterator(chunk_size=batch_size):
+            batch.append(_occupancy(row))
+            if len(batch) == batch_size:
+                written += len(RouteOccupancy.objects.bulk_create(batch))
+                batch = []
+        written += len(RouteOccupancy.objects.bulk_create(batch))
+    return written
+
+
+def stale_occupancy(batch_size=5000):
+    """``(key, stored, actual)`` for every statistics row that differs from
+    its flights; ``stored`` or ``actual`` is None for a missing row. Counts
+    are ``(flights, seats, tickets)``."""
+    stored = {
+        (route_id, airplane_type_id, day): counts
+        for route_id, airplane_type_id, day, *counts in RouteOccupancy.objects.values_list(
+            "route_id", "airplane_type_id", "day", *STAT_FIELDS
+        ).iterator(chunk_size=batch_size)
+    }
+    for row in aggregate_occupancy(Flight.objects.all()).iterator(chunk_size=batch_size):
+        key = (row["route_id"], row["airplane_type_id"], row["day"])
+        actual = (row["flight_count"], row["seat_count"], row["ticket_count"])
+        counts = stored.pop(key, None)
+        if counts is None or tuple(counts) != actual:
+            yield key, counts and tuple(counts), actual
+    for key, counts in stored.items():
+        yield key, tuple(counts), None
+
+
+def occupancy_stats(
+    start=None, end=None, route=None, airplane_type=None, group_by=OCCUPANCY_GROUPS
+):
+    """Flights, seats, tickets and load factors from the statistics, from day
+    ``start`` to ``end`` inclusive, summed over the ``group_by`` dimensions
+    (at least one)."""
+    rows = RouteOccupancy.objects.all()
+    if start is not None:
+        rows = rows.filter(day__gte=start)
+    if end is not None:
+        rows = rows.filter(day__lte=end)
+    if route is not None:
+        rows = rows.filter(route_id=route)
+    if airplane_type is not None:
+        rows = rows.filter(airplane_type_id=airplane_type)
+
+    groups = [group for group in OCCUPANCY_GROUPS if group in group_by]
+    columns = [_GROUP_COLUMNS[group] for group in groups]
+    totals = {
+        "flight_count": Sum("flights"),
+        "seat_count": Sum("seats"),
+        "ticket_count": Sum("tickets"),
+    }
+    rows = rows.values(*columns).annotate(**totals).order_by(*columns)
+    return [
+        {
+            **{group: row[column] for group, column in zip(groups, columns)},
+            "flights": row["flight_count"],
+            "seats": row["seat_count"],
+            "tickets": row["ticket_count"],
+            "load_factor": (
+                round(row["ticket_count"] / row["seat_count"], 4) if row["seat_count"] else None
+            ),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,178 @@
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.response import Response
+
+
+def _flip(field):
+    return field[1:] if field.startswith("-") else f"-{field}"
+
+
+def _after(ordering, values):
+    """Filter for the rows after ``values`` in ``ordering``, compared as a
+    tuple: ``(a, b) > (x, y)`` is ``a > x OR (a = x AND b > y)``. The
+    redundant ``a >= x`` lets the index on ``a`` bound the scan."""
+    def compare(field, value, strict=True):
+        lookup = ("lt" if field.startswith("-") else "gt") + ("" if strict else "e")
+        return Q(**{f"{field.lstrip('-')}__{lookup}": value})
+
+    condition = None
+    for field, value in reversed(list(zip(ordering, values))):
+        step = compare(field, value)
+        if condition is not None:
+            step |= Q(**{field.lstrip("-"): value}) & condition
+        condition = step
+    return compare(ordering[0], values[0], strict=False) & condition
+
+
+class CountableCursorPagination(CursorPagination):
+    """Keyset pagination that only runs ``COUNT(*)`` when asked (?count=true).
+
+    DRF's cursor holds the value of the first ``ordering`` field and an
+    offset past the rows sharing it. This cursor holds every field of the
+    ordering instead, which has to be unique (end it with ``id``). A page
+    is then the rows after that tuple, which is an index range scan however
+    deep the page is and however many rows share a departure time.
+    """
+
+    page_size = 5
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    count_query_param = "count"
+
+    def count_requested(self, request):
+        return request.query_params.get(self.count_query_param) in ("1", "true")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = queryset.count() if self.count_requested(request) else None
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.count = await queryset.acount() if self.count_requested(request) else None
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([row async for row in queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """The rows of the page ``request`` asks for, plus one to tell
+        whether another page follows; None if pagination is off."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        ordering = self.ordering
+        if self.cursor is not None and self.cursor.reverse:
+            ordering = tuple(_flip(field) for field in ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None and self.cursor.position is not None:
+            values = self.decode_position(queryset.model, self.cursor.position)
+            queryset = queryset.filter(_after(ordering, values))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        """Keep the page read from ``get_page_queryset`` and return it."""
+        reverse = self.cursor is not None and self.cursor.reverse
+        following = len(rows) > self.page_size
+        self.page = list(rows[:self.page_size])
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, following
+        else:
+            self.has_next, self.has_previous = following, self.cursor is not None
+
+        # An empty page (its rows deleted since) links both ways from where
+        # it was asked for.
+        current = self.cursor.position if self.cursor is not None else None
+        self.previous_position = self.encode_position(self.page[0]) if self.page else current
+        self.next_position = self.encode_position(self.page[-1]) if self.page else current
+        if self.next_position is None:
+            self.has_next = self.has_previous = False
+
+        self.display_page_controls = (
+            (self.has_previous or self.has_next) and self.template is not None
+        )
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.previous_position))
+
+    def encode_position(self, row):
+        """The ordering values of ``row`` (an instance or a ``.values()`` dict)."""
+        values = []
+        for field in self.ordering:
+            name = field.lstrip("-")
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        return json.dumps(values, separators=(",", ":"))
+
+    def decode_position(self, model, position):
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError(position)
+            return [
+                model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_paginated_response(self, data):
+        response = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+        if self.count is not None:
+            response = {"count": self.count, **response}
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema["properties"] = {
+            "count": {
+                "type": "integer",
+                "example": 123,
+                "description": f"Only present with ?{self.count_query_param}=true",
+            },
+            **schema["properties"],
+        }
+        return schema
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Include the total number of results",
+                "schema": {"type": "boolean"},
+            },
+        ]
+
+
+class FlightCursorPagination(CountableCursorPagination):
+    ordering = ("departure_time", "id")
+
+
+class OrderCursorPagination(CountableCursorPagination):
+    ordering = ("-created_at", "-id")
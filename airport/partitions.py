@@ -0,0 +1,182 @@
+"""Monthly partitions of the Ticket table on PostgreSQL.
+
+Migration 0017 turns ``airport_ticket`` into a table partitioned by range of
+``departure_time`` (the ticket's flight's): one partition per month, named
+``airport_ticket_YYYY_MM``, and a default partition for tickets outside
+them. Ticket reads for given flights (``Ticket.objects.for_flights``) filter
+on their departure times as well, so PostgreSQL only scans the partitions of
+those months, which for upcoming flights are the newest few.
+
+``manage_partitions`` keeps the partitions going: it creates the ones for
+the coming months, moving in any tickets the default partition has for
+them, and detaches those of months past retention, optionally archiving
+each to a gzipped CSV file and dropping it. Flights keep their seat maps
+and orders their documents, so neither needs the archived tickets; an
+order document rebuilt later lists only the tickets still attached.
+
+On other databases the table is not partitioned and there is nothing to
+manage.
+"""
+import gzip
+import re
+from datetime import date, datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from airport.models import Ticket
+
+TABLE = Ticket._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+MONTHS_AHEAD = 3
+_PARTITION_NAME = re.compile(rf"^{TABLE}_(\d{{4}})_(\d{{2}})$")
+
+
+def month_start(value):
+    """The first day of the month of a date or (aware) datetime, in UTC."""
+    if hasattr(value, "tzinfo") and timezone.is_aware(value):
+        value = value.astimezone(dt_timezone.utc)
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_{month:%Y_%m}"
+
+
+def _bound(month):
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def is_partitioned(using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def attached_months(using=DEFAULT_DB_ALIAS):
+    """The months that have a partition attached, oldest first."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits"
+            " JOIN pg_class child ON child.oid = pg_inherits.inhrelid"
+            " WHERE pg_inherits.inhparent = to_regclass(%s)",
+            [TABLE],
+        )
+        names = [name for name, in cursor.fetchall()]
+    return sorted(
+        date(int(match[1]), int(match[2]), 1)
+        for match in map(_PARTITION_NAME.match, names) if match
+    )
+
+
+def retained_since(using=DEFAULT_DB_ALIAS):
+    """The start of the oldest attached month, before which tickets may have
+    been archived; None if the table is not partitioned."""
+    if not is_partitioned(using):
+        return None
+    months = attached_months(using)
+    if not months:
+        return None
+    return datetime(months[0].year, months[0].month, 1, tzinfo=dt_timezone.utc)
+
+
+def plan_partitions(attached, today, months_ahead=MONTHS_AHEAD, retain_months=None):
+    """``(months to create, months to detach)``: partitions from the month of
+    ``today`` to ``months_ahead`` months later should exist, and those more
+    than ``retain_months`` months before it (if given) should not."""
+    current = month_start(today)
+    attached = set(attached)
+    create = [
+        month
+        for month in (add_months(current, ahead) for ahead in range(months_ahead + 1))
+        if month not in attached
+    ]
+    detach = []
+    if retain_months is not None:
+        cutoff = add_months(current, -retain_months)
+        detach = sorted(month for month in attached if month < cutoff)
+    return create, detach
+
+
+def create_partition(cursor, month):
+    """Create and attach the partition of ``month``, moving in the tickets
+    the default partition has for it."""
+    quote = cursor.db.ops.quote_name
+    name, start, end = quote(partition_name(month)), _bound(month), _bound(add_months(month, 1))
+    cursor.execute(f"CREATE TABLE {name} (LIKE {quote(TABLE)})")
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)}"
+        f" WHERE departure_time >= {start} AND departure_time < {end} RETURNING *)"
+        f" INSERT INTO {name} SELECT * FROM moved"
+    )
+    cursor.execute(
+        f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {name}"
+        f" FOR VALUES FROM ({start}) TO ({end})"
+    )
+
+
+def ensure_partitions(first, last, using=DEFAULT_DB_ALIAS):
+    """Create the missing partitions of the months from datetime ``first`` to
+    ``last``, if the table is partitioned."""
+    if not is_partitioned(using):
+        return
+    attached = set(attached_months(using))
+    month = month_start(first)
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        while month <= month_start(last):
+            if month not in attached:
+                create_partition(cursor, month)
+            month = add_months(month, 1)
+
+
+def detach_partition(cursor, month, archive_dir=None):
+    """Detach the partition of ``month``; with ``archive_dir``, also write its
+    rows to ``<archive_dir>/<partition>.csv.gz`` and drop it. Returns the
+    archive's path, if any."""
+    quote = cursor.db.ops.quote_name
+    name = partition_name(month)
+    cursor.execute(f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}")
+    if archive_dir is None:
+        return None
+
+    Path(archive_dir).mkdir(parents=True, exist_ok=True)
+    path = Path(archive_dir) / f"{name}.csv.gz"
+    with gzip.open(path, "wb") as archive:
+        with cursor.copy(f"COPY {quote(name)} TO STDOUT WITH (FORMAT csv, HEADER)") as copy:
+            for block in copy:
+                archive.write(block)
+    cursor.execute(f"DROP TABLE {quote(name)}")
+    return path
+
+
+def manage_partitions(
+    months_ahead=MONTHS_AHEAD, retain_months=None, archive_dir=None, today=None,
+    using=DEFAULT_DB_ALIAS,
+):
+    """Create the partitions due and detach (or archive) the expired ones;
+    return the names created and ``(name, archive path or None)`` of those
+    detached."""
+    create, detach = plan_partitions(
+        attached_months(using), today or timezone.now(), months_ahead, retain_months
+    )
+    created, detached = [], []
+    connection = connections[using]
+    for month in create:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            create_partition(cursor, month)
+        created.append(partition_name(month))
+    for month in detach:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            detached.append((partition_name(month), detach_partition(cursor, month, archive_dir)))
+    return created, detached
@@ -0,0 +1,227 @@
+"""Maximum number of database queries per view action.
+
+Views declare ``query_budgets``, a dict from viewset action (``"list"``,
+``"retrieve"``, ``"seatmap"``...) or, for plain views, lower-case HTTP
+method to the most queries one request may run. DRF views whose cost
+depends on the request also define ``get_query_budget(request)``, called
+once the view has run. Tests check every route
+against it (``QueryBudgetTestMixin``); in production
+``QueryBudgetMiddleware`` logs and counts the requests that go over.
+
+Queries are counted by ``count_queries``, which every database connection
+runs (``airport.signals`` installs it as connections open) and which adds
+to the counter of the request in the current context. That follows a
+request into the threads its sync code runs in under ASGI.
+"""
+import importlib
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, resolve
+
+logger = logging.getLogger(__name__)
+
+# Requests over budget since this process started, by "<view>.<action>".
+overruns = Counter()
+
+
+def view_action(view_func, method):
+    """Action (viewsets) or handler name (other views) serving ``method``."""
+    method = "get" if method.lower() == "head" else method.lower()
+    actions = getattr(view_func, "actions", None)
+    if actions is not None:
+        return actions.get(method)
+    return method
+
+
+def view_name(view_func):
+    view = getattr(view_func, "cls", None) or getattr(view_func, "view_class", view_func)
+    return f"{view.__module__}.{view.__qualname__}"
+
+
+def get_query_budget(view_func, method):
+    """Budget of the view handling ``method``, or None if it has none."""
+    view = getattr(view_func, "cls", None) or getattr(view_func, "view_class", view_func)
+    return (getattr(view, "query_budgets", None) or {}).get(view_action(view_func, method))
+
+
+def request_query_budget(view_func, request, response):
+    """Budget of the request ``response`` answers: what the DRF view's
+    ``get_query_budget`` says, if it has one, else its declared budget."""
+    view = (getattr(response, "renderer_context", None) or {}).get("view")
+    if view is not None and hasattr(view, "get_query_budget"):
+        return view.get_query_budget(view.request)
+    return get_query_budget(view_func, request.method)
+
+
+def iter_routes(urlconf):
+    """``(url_name, view_func, method)`` for every routed handler in ``urlconf``."""
+    seen = set()
+
+    def walk(patterns, namespace):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns, pattern.namespace or namespace)
+                continue
+            if not isinstance(pattern, URLPattern) or pattern.name is None:
+                continue
+            view_func = pattern.callback
+            actions = getattr(view_func, "actions", None)
+            if actions is not None:
+                methods = actions
+            elif hasattr(view_func, "view_class"):
+                methods = [
+                    method for method in view_func.view_class.http_method_names
+                    if method not in ("head", "options")
+                    and hasattr(view_func.view_class, method)
+                ]
+            else:
+                methods = getattr(view_func, "query_budgets", None) or ["get"]
+            name = f"{namespace}:{pattern.name}" if namespace else pattern.name
+            for method in methods:
+                if (name, method) not in seen:
+                    seen.add((name, method))
+                    yield name, view_func, method
+
+    module = importlib.import_module(urlconf)
+    yield from walk(module.urlpatterns, getattr(module, "app_name", None))
+
+
+class QueryBudgetTestMixin:
+    """``assertWithinQueryBudget`` for ``TestCase``/``APITestCase`` classes."""
+
+    def assertWithinQueryBudget(self, method, path, **kwargs):
+        view_func = resolve(path.split("?")[0]).func
+        budget = get_query_budget(view_func, method)
+        self.assertIsNotNone(budget, f"{view_name(view_func)} has no query budget for {method}")
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method.lower())(path, **kwargs)
+            if response.streaming:
+                response.streaming_content = [b"".join(response.streaming_content)]
+        budget = request_query_budget(view_func, response.wsgi_request, response)
+        self.assertLessEqual(
+            len(queries),
+            budget,
+            f"{method} {path} ran {len(queries)} queries, over its budget of {budget}:\n"
+            + "\n".join(query["sql"] for query in queries.captured_queries),
+        )
+        return response
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+
+# Counter of the request being served in the current context.
+_counter = ContextVar("airport_query_counter", default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    counter = _counter.get()
+    if counter is not None:
+        counter.count += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(connection):
+    # First, so that execute_wrapper() blocks, which pop the last wrapper,
+    # leave it in place.
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_queries)
+
+
+@contextmanager
+def _counting(counter):
+    token = _counter.set(counter)
+    try:
+        yield
+    finally:
+        _counter.reset(token)
+
+
+class QueryBudgetMiddleware:
+    """Logs and counts (in ``overruns``) requests that exceed their budget."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        counter = _QueryCounter()
+        with _counting(counter):
+            response = self.get_response(request)
+        return self.finish(request, response, counter)
+
+    async def __acall__(self, request):
+        counter = _QueryCounter()
+        with _counting(counter):
+            response = await self.get_response(request)
+        return self.finish(request, response, counter)
+
+    def finish(self, request, response, counter):
+        """Check the budget now or, for a streamed body, once it is sent."""
+        match = request.resolver_match
+        if match is None or get_query_budget(match.func, request.method) is None:
+            return response
+        if not response.streaming:
+            self.check_budget(request, response, counter)
+            return response
+
+        content = response.streaming_content
+        if response.is_async:
+            async def counted():
+                iterator = aiter(content)
+                try:
+                    while True:
+                        with _counting(counter):
+                            try:
+                                chunk = await anext(iterator)
+                            except StopAsyncIteration:
+                                return
+                        yield chunk
+                finally:
+                    self.check_budget(request, response, counter)
+        else:
+            def counted():
+                iterator = iter(content)
+                try:
+                    while True:
+                        with _counting(counter):
+                            try:
+                                chunk = next(iterator)
+                            except StopIteration:
+                                return
+                        yield chunk
+                finally:
+                    self.check_budget(request, response, counter)
+
+        response.streaming_content = counted()
+        return response
+
+    def check_budget(self, request, response, counter):
+        match = request.resolver_match
+        budget = request_query_budget(match.func, request, response)
+        if budget is not None and counter.count > budget:
+            view = f"{view_name(match.func)}.{view_action(match.func, request.method)}"
+            overruns[view] += 1
+            logger.warning(
+                "%s %s ran %d queries, over the budget of %d for %s",
+                request.method,
+                request.path,
+                counter.count,
+                budget,
+                view,
+            )
@@ -0,0 +1,51 @@
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer producing the same bytes through orjson.
+
+    Datetimes go through DRF's encoder (``Z`` suffix instead of ``+00:00``);
+    indented, ASCII-only or non-compact output falls back to ``json``.
+    """
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        renderer_context = renderer_context or {}
+        if (
+            self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same strict-javascript escaping of U+2028/U+2029 as JSONRenderer.
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class CSVRenderer(BaseRenderer):
+    """Selects CSV (``?format=csv``) for views that stream their own body;
+    anything else they return is passed through as is."""
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b"" if data is None else data
+
+
+class JSONLinesRenderer(CSVRenderer):
+    """Selects JSON Lines (``?format=jsonl``) for views that stream their own body."""
+
+    media_type = "application/x-ndjson"
+    format = "jsonl"
@@ -0,0 +1,139 @@
+"""Read replica routing with read-your-writes stickiness.
+
+``ReplicaMiddleware`` sends the reads of GET/HEAD/OPTIONS requests to one of
+``DATABASE_REPLICAS`` (picked at random per request) through
+``ReplicaRouter``; writes, reads inside transactions, and every query
+outside a request (commands, workers) go to the primary. A client that has
+just sent a write request is pinned to the primary for ``REPLICA_PIN_TTL``,
+so its next reads see what it wrote even while the replicas lag behind.
+
+Clients are told apart by the user id claim of their JWT (read without
+verifying it; authentication still happens in the view, and a forged claim
+only moves that request to the primary) or, for the admin site, by their
+session cookie. Pins are kept in the default cache, which has to be shared
+between processes (e.g. Redis or Memcached) for them to hold across
+workers; the ``airport.E001`` system check refuses replicas without one.
+"""
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+
+# Where reads go in the current context; None is the primary.
+_read_alias = ContextVar("airport_read_alias", default=None)
+
+
+@contextmanager
+def reading_from(alias):
+    """Route the reads made inside to database ``alias``."""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Reads inside a transaction on the primary must see its writes.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def client_key(request):
+    """Who sent ``request``, for pinning; None for anonymous requests."""
+    header = request.headers.get("Authorization", "").split()
+    if len(header) == 2 and header[0] in api_settings.AUTH_HEADER_TYPES:
+        try:
+            user_id = UntypedToken(header[1], verify=False).get(api_settings.USER_ID_CLAIM)
+        except TokenError:
+            user_id = None
+        if user_id is not None:
+            return f"user:{user_id}"
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session:
+        return f"session:{hashlib.sha256(session.encode()).hexdigest()}"
+    return None
+
+
+def _pin_key(client):
+    return f"airport:replicas:pin:{client}"
+
+
+def pin_to_primary(client):
+    cache.set(_pin_key(client), True, timeout=settings.REPLICA_PIN_TTL.total_seconds())
+
+
+async def apin_to_primary(client):
+    await cache.aset(_pin_key(client), True, timeout=settings.REPLICA_PIN_TTL.total_seconds())
+
+
+def is_pinned(client):
+    return client is not None and cache.get(_pin_key(client), False)
+
+
+async def ais_pinned(client):
+    return client is not None and await cache.aget(_pin_key(client), False)
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            return self.get_response(request)
+
+        client = client_key(request)
+        safe = request.method in SAFE_METHODS
+        alias = random.choice(replicas) if safe and not is_pinned(client) else None
+        with reading_from(alias):
+            response = self.get_response(request)
+        if not safe and client is not None:
+            pin_to_primary(client)
+        return response
+
+    async def __acall__(self, request):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            return await self.get_response(request)
+
+        client = client_key(request)
+        safe = request.method in SAFE_METHODS
+        alias = random.choice(replicas) if safe and not await ais_pinned(client) else None
+        # Sync views run in a thread that inherits the context, and with it
+        # the alias.
+        with reading_from(alias):
+            response = await self.get_response(request)
+        if not safe and client is not None:
+            await apin_to_primary(client)
+        return response
@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from airport.models import Flight, SeatHold, Ticket
+from airport.seats import SeatUnavailable, take_seats
+
+
+def reserve_seats(user, tickets):
+    """Insert ``tickets`` for ``user`` without ever double-booking a seat.
+
+    The flights are locked while their seat maps are checked and updated, so
+    concurrent orders for the same flight are serialized; the unique
+    (flight, row, seat) constraint on Ticket backs this up. Seats held by
+    other users cannot be booked, and the user's own holds on the booked
+    seats are confirmed (consumed).
+    """
+    tickets = list(tickets)
+    with transaction.atomic(savepoint=False):
+        flights = take_seats(tickets)
+
+        requested = {(ticket.flight_id, ticket.row, ticket.seat) for ticket in tickets}
+        holds = SeatHold.objects.filter(
+            flight_id__in={flight_id for flight_id, _, _ in requested},
+            expires_at__gt=timezone.now(),
+        ).values_list("pk", "flight_id", "row", "seat", "user_id")
+
+        confirmed, held = [], []
+        for pk, flight_id, row, seat, user_id in holds:
+            if (flight_id, row, seat) not in requested:
+                continue
+            if user_id == user.pk:
+                confirmed.append(pk)
+            else:
+                held.append((flight_id, row, seat))
+        if held:
+            raise SeatUnavailable(held, reason="held by another customer")
+        if confirmed:
+            SeatHold.objects.filter(pk__in=confirmed).delete()
+
+        for ticket in tickets:
+            # The locked row's: the flight may have moved since the caller
+            # loaded it, and the departure picks the ticket's partition.
+            flight = flights.get(ticket.flight_id, ticket.flight)
+            ticket.departure_time = flight.departure_time
+        try:
+            return Ticket.objects.bulk_create(tickets)
+        except IntegrityError:
+            raise SeatUnavailable(sorted(requested))
+
+
+def hold_seats(user, flight_id, seats, ttl=None):
+    """Hold ``seats`` (``(row, seat)`` pairs) on a flight for ``user``.
+
+    Holds the user already has on those seats are extended. Raises
+    SeatUnavailable if a seat is sold or held by someone else, and
+    ValueError if a seat does not exist on the airplane.
+    """
+    now = timezone.now()
+    expires_at = now + (ttl or settings.SEAT_HOLD_TTL)
+
+    with transaction.atomic():
+        flight = (
+            Flight.objects.select_for_update(of=("self",))
+            .select_related("airplane")
+            .get(pk=flight_id)
+        )
+        SeatHold.objects.filter(flight=flight, expires_at__lte=now).delete()
+
+        seat_map = flight.seats
+        existing = {
+            (row, seat): (pk, user_id)
+            for pk, row, seat, user_id in SeatHold.objects.filter(
+                flight=flight
+            ).values_list("pk", "row", "seat", "user_id")
+        }
+
+        unavailable, extended, created = [], [], []
+        for row, seat in dict.fromkeys(seats):
+            if seat_map.is_taken(row, seat):
+                unavailable.append((flight.pk, row, seat))
+            elif (row, seat) not in existing:
+                created.append(
+                    SeatHold(flight=flight, row=row, seat=seat, user=user, expires_at=expires_at)
+                )
+            elif existing[row, seat][1] == user.pk:
+                extended.append(existing[row, seat][0])
+            else:
+                unavailable.append((flight.pk, row, seat))
+        if unavailable:
+            raise SeatUnavailable(unavailable, reason="not available")
+
+        SeatHold.objects.filter(pk__in=extended).update(expires_at=expires_at)
+        SeatHold.objects.bulk_create(created)
+
+    return list(
+        SeatHold.objects.filter(flight=flight, user=user, expires_at=expires_at)
+        .order_by("row", "seat")
+    )
+
+
+def release_holds(user, flight_id, seats=None):
+    """Drop ``user``'s holds on a flight (only ``seats`` if given)."""
+    holds = SeatHold.objects.filter(flight_id=flight_id, user=user)
+    if seats is not None:
+        wanted = set(seats)
+        holds = holds.filter(
+            pk__in=[
+                pk for pk, row, seat in holds.values_list("pk", "row", "seat")
+                if (row, seat) in wanted
+            ]
+        )
+    return holds.delete()[0]
+
+
+def purge_expired_holds(now=None):
+    """Delete every expired hold in one statement; return how many."""
+    return SeatHold.objects.filter(
+        expires_at__lte=now or timezone.now()
+    ).delete()[0]
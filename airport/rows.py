@@ -0,0 +1,159 @@
+from rest_framework import serializers
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+from airport.models import Crew
+from airport.seats import SeatMap
+
+format_datetime = serializers.DateTimeField().to_representation
+
+
+class RowMapper:
+    """Turns ``.values()`` rows into response dicts without a serializer.
+
+    ``fields`` are ``(key, column, converter)`` triples, in output order;
+    ``column`` may be a tuple, in which case ``converter`` receives every
+    value, or None for a key the caller sets on the row itself. The mapping
+    function is compiled once, so each row costs one dict display rather
+    than a walk over serializer fields.
+    """
+
+    def __init__(self, *fields):
+        self.keys = [key for key, _, _ in fields]
+        self.columns = []
+        namespace, items = {}, []
+        for position, (key, column, converter) in enumerate(fields):
+            columns = column if isinstance(column, tuple) else (column or key,)
+            for name in columns:
+                if column is not None and name not in self.columns:
+                    self.columns.append(name)
+            value = ", ".join(f"row[{name!r}]" for name in columns)
+            if converter is not None:
+                namespace[f"convert_{position}"] = converter
+                value = f"convert_{position}({value})"
+            items.append(f"{key!r}: {value}")
+
+        source = "def map_row(row):\n    return {%s}\n" % ", ".join(items)
+        exec(compile(source, f"<RowMapper {self.columns}>", "exec"), namespace)
+        self.map_row = namespace["map_row"]
+
+    def __call__(self, row):
+        return self.map_row(row)
+
+    def map(self, rows):
+        map_row = self.map_row
+        return [map_row(row) for row in rows]
+
+
+class RowResponseMixin:
+    """List/retrieve straight from ``.values()`` rows via ``list_rows`` and
+    ``retrieve_rows`` mappers; other actions use the serializers."""
+
+    list_rows = None
+    retrieve_rows = None
+
+    def list(self, request, *args, **kwargs):
+        if self.list_rows is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.values(*self.list_rows.columns)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.list_rows.map(page))
+        return Response(self.list_rows.map(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.retrieve_rows is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            queryset.values(*self.retrieve_rows.columns),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]},
+        )
+        return Response(self.retrieve_rows(row))
+
+
+def _taken_seats(rows, seats_in_row, seat_map):
+    return [
+        {"row": row, "seat": seat}
+        for row, seat in SeatMap(rows, seats_in_row, seat_map).taken()
+    ]
+
+
+def _crew_names(flight_id):
+    return [
+        f"{first_name} {last_name}"
+        for first_name, last_name in Crew.objects.filter(crews=flight_id).values_list(
+            "first_name", "last_name"
+        )
+    ]
+
+
+async def acrew_names(flight_id):
+    return [
+        f"{first_name} {last_name}"
+        async for first_name, last_name in Crew.objects.filter(crews=flight_id).values_list(
+            "first_name", "last_name"
+        )
+    ]
+
+
+# Same keys, order and formatting as FlightListSerializer.
+FLIGHT_LIST_ROW = RowMapper(
+    ("id", "id", None),
+    ("route", "route_id", None),
+    ("airplane", "airplane__name", None),
+    ("airplane_type", "airplane__airplane_type__name", None),
+    ("taken_seats", "taken_seats_count", None),
+    ("available_seats", "available_seats_count", None),
+    ("departure", "route__source__name", None),
+    ("arrival", "route__destination__name", None),
+    ("departure_time", "departure_time", format_datetime),
+    ("arrival_time", "arrival_time", format_datetime),
+)
+
+# Same keys, order and formatting as FlightRetrieveSerializer.
+_FLIGHT_RETRIEVE_FIELDS = (
+    ("id", "id", None),
+    ("route", "route_id", None),
+    ("airplane", "airplane__name", None),
+    ("airplane_type", "airplane__airplane_type__name", None),
+    ("row", "airplane__rows", None),
+    ("seat_in_row", "airplane__seats_in_row", None),
+    ("departure", "route__source__name", None),
+    ("arrival", "route__destination__name", None),
+    ("departure_time", "departure_time", format_datetime),
+    ("arrival_time", "arrival_time", format_datetime),
+    ("distance", "route__distance", None),
+    ("members", "id", _crew_names),
+    ("available_seats", "available_seats_count", None),
+    ("taken_seats", ("airplane__rows", "airplane__seats_in_row", "seat_map"), _taken_seats),
+)
+FLIGHT_RETRIEVE_ROW = RowMapper(*_FLIGHT_RETRIEVE_FIELDS)
+
+# For async views: ``members`` is filled in from ``acrew_names``.
+AFLIGHT_RETRIEVE_ROW = RowMapper(*(
+    ("members", None, None) if key == "members" else (key, column, converter)
+    for key, column, converter in _FLIGHT_RETRIEVE_FIELDS
+))
+
+# Same keys, order and formatting as RouteListSerializer.
+ROUTE_LIST_ROW = RowMapper(
+    ("id", "id", None),
+    ("source_airport", "source__name", None),
+    ("destination_airport", "destination__name", None),
+    ("distance", "distance", None),
+)
+
+# Same keys, order and formatting as RouteDetailSerializer.
+ROUTE_DETAIL_ROW = RowMapper(
+    ("id", "id", None),
+    ("source_airport", "source__name", None),
+    ("destination_airport", "destination__name", None),
+    ("source_closest_big_city", "source__closest_big_city", None),
+    ("destination_closest_big_city", "destination__closest_big_city", None),
+    ("distance", "distance", None),
+)
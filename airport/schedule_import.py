@@ -0,0 +1,199 @@
+"""Bulk flight schedule import from CSV or JSON Lines.
+
+Each row names a route, either by ``route`` id or by ``source`` and
+``destination`` airport names, an ``airplane`` by id or name, and ISO 8601
+``departure_time`` and ``arrival_time`` (naive times are in the current
+time zone). Rows are read one at a time, validated a chunk at a time
+against lookup maps built once per import, and each chunk's valid rows are
+inserted in its own transaction, so memory stays bounded by the chunk size
+and an error in one row only rejects that row.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from airport.connections import invalidate_connection_index
+from airport.models import Airplane, Flight, Route
+from airport.occupancy import refresh_occupancy
+from airport.seeding import BulkCreateWriter, CopyWriter
+
+FORMATS = ("csv", "jsonl")
+FLIGHT_FIELDS = (
+    "route_id", "airplane_id", "departure_time", "arrival_time",
+    "seat_map", "seats_taken", "seats_version",
+)
+
+
+def guess_format(filename):
+    """``"csv"`` or ``"jsonl"`` from a file name's extension, else None."""
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    return {"csv": "csv", "jsonl": "jsonl", "ndjson": "jsonl"}.get(extension)
+
+
+def read_rows(stream, file_format):
+    """``(line, row)`` pairs from a binary, UTF-8 ``stream``; ``row`` is a
+    dict, or a string describing why the line could not be parsed."""
+    stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError as error:
+            yield line, f"Invalid JSON: {error}"
+            continue
+        yield line, row if isinstance(row, dict) else "Expected a JSON object"
+
+
+class ScheduleImporter:
+    """Validates and inserts flights ``chunk_size`` rows at a time."""
+
+    # Duplicate check, savepoint, insert, occupancy refresh (three) and
+    # release.
+    queries_per_chunk = 7
+
+    def __init__(self, chunk_size=1000, use_copy=None, dry_run=False, max_errors=1000):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.max_errors = max_errors
+        if use_copy is None:
+            use_copy = connection.vendor == "postgresql"
+        self.writer = CopyWriter() if use_copy else BulkCreateWriter(chunk_size)
+
+        self.route_pairs = {
+            (source.lower(), destination.lower()): pk
+            for pk, source, destination in Route.objects.values_list(
+                "pk", "source__name", "destination__name"
+            )
+        }
+        self.routes = set(self.route_pairs.values())
+        # By id and by lower-case name.
+        self.airplanes = {}
+        for pk, name in Airplane.objects.values_list("pk", "name"):
+            self.airplanes[pk] = self.airplanes[name.lower()] = pk
+
+    def run(self, rows, progress=None):
+        """Import ``(line, row)`` pairs and return a report of the rows
+        created and rejected, with up to ``max_errors`` error details."""
+        report = {"rows": 0, "created": 0, "rejected": 0, "chunks": 0, "errors": []}
+        rows = iter(rows)
+        while chunk := list(islice(rows, self.chunk_size)):
+            flights, errors = self.validate(chunk)
+            if flights and not self.dry_run:
+                with transaction.atomic():
+                    self.writer.write(Flight, FLIGHT_FIELDS, flights)
+                    days = [timezone.localdate(values[2]) for values in flights]
+                    refresh_occupancy({values[0] for values in flights}, min(days), max(days))
+
+            report["rows"] += len(chunk)
+            report["created"] += len(flights)
+            report["rejected"] += len(errors)
+            report["chunks"] += 1
+            report["errors"] += errors[:self.max_errors - len(report["errors"])]
+            if progress is not None:
+                progress(report)
+
+        if report["created"] and not self.dry_run:
+            invalidate_connection_index()
+        return report
+
+    def validate(self, chunk):
+        """Flight rows for ``FLIGHT_FIELDS`` and ``{"line", "errors"}`` dicts."""
+        valid, errors = [], []
+        for line, row in chunk:
+            if isinstance(row, str):
+                errors.append({"line": line, "errors": {"row": row}})
+                continue
+            values, row_errors = self.validate_row(row)
+            if row_errors:
+                errors.append({"line": line, "errors": row_errors})
+            else:
+                valid.append((line, values))
+
+        # Rows already scheduled (same route, airplane and departure), in
+        # the database or earlier in this chunk, are rejected.
+        scheduled = set()
+        if valid:
+            departures = [values[2] for _, values in valid]
+            scheduled = set(
+                Flight.objects.filter(
+                    airplane_id__in={values[1] for _, values in valid},
+                    departure_time__range=(min(departures), max(departures)),
+                ).values_list("route_id", "airplane_id", "departure_time")
+            )
+
+        flights = []
+        for line, values in valid:
+            key = values[:3]
+            if key in scheduled:
+                errors.append(
+                    {"line": line, "errors": {"row": "This flight is already scheduled."}}
+                )
+                continue
+            scheduled.add(key)
+            flights.append((*values, b"", 0, 0))
+        errors.sort(key=lambda error: error["line"])
+        return flights, errors
+
+    def validate_row(self, row):
+        errors = {}
+        route = self.resolve_route(row, errors)
+
+        airplane = str(row.get("airplane") or "").strip()
+        airplane_id = self.airplanes.get(int(airplane) if airplane.isdigit() else airplane.lower())
+        if not airplane:
+            errors["airplane"] = "This field is required."
+        elif airplane_id is None:
+            errors["airplane"] = f"Unknown airplane {airplane!r}."
+
+        times = {}
+        for field in ("departure_time", "arrival_time"):
+            value = str(row.get(field) or "").strip()
+            try:
+                parsed = parse_datetime(value)
+            except ValueError:
+                parsed = None
+            if not value:
+                errors[field] = "This field is required."
+            elif parsed is None:
+                errors[field] = f"Invalid datetime {value!r}, use ISO 8601."
+            else:
+                if timezone.is_naive(parsed):
+                    parsed = timezone.make_aware(parsed)
+                times[field] = parsed
+        if len(times) == 2 and times["arrival_time"] <= times["departure_time"]:
+            errors["arrival_time"] = "Arrival must be after departure."
+
+        if errors:
+            return None, errors
+        return (route, airplane_id, times["departure_time"], times["arrival_time"]), None
+
+    def resolve_route(self, row, errors):
+        route = str(row.get("route") or "").strip()
+        if route:
+            if route.isdigit() and int(route) in self.routes:
+                return int(route)
+            errors["route"] = f"Unknown route {route!r}."
+            return None
+
+        source = str(row.get("source") or "").strip()
+        destination = str(row.get("destination") or "").strip()
+        if not (source and destination):
+            errors["route"] = "Give a route id or source and destination airports."
+            return None
+        route = self.route_pairs.get((source.lower(), destination.lower()))
+        if route is None:
+            errors["route"] = f"No route from {source!r} to {destination!r}."
+        return route
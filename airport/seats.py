@@ -0,0 +1,238 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import groupby
+
+from django.db import transaction
+
+SEAT_FIELDS = ("seat_map", "seats_taken", "seats_version")
+
+_deferred_releases = ContextVar("deferred_releases", default=None)
+
+
+class SeatUnavailable(Exception):
+    def __init__(self, seats, reason="already occupied"):
+        self.seats = seats
+        self.reason = reason
+        super().__init__(
+            ", ".join(f"Seat {row}-{seat}" for _, row, seat in seats)
+            + f" {'is' if len(seats) == 1 else 'are'} {reason}"
+        )
+
+
+class SeatMap:
+    """Bitmap of taken seats, one bit per seat, row-major."""
+
+    def __init__(self, rows, seats_in_row, data=b""):
+        self.rows = rows
+        self.seats_in_row = seats_in_row
+        size = (rows * seats_in_row + 7) // 8
+        self._bits = bytearray(bytes(data or b"")[:size]).ljust(size, b"\0")
+
+    @classmethod
+    def for_flight(cls, flight):
+        return cls(
+            flight.airplane.rows,
+            flight.airplane.seats_in_row,
+            flight.seat_map,
+        )
+
+    @property
+    def capacity(self):
+        return self.rows * self.seats_in_row
+
+    def _position(self, row, seat):
+        if not (1 <= row <= self.rows and 1 <= seat <= self.seats_in_row):
+            raise ValueError(f"Seat {row}-{seat} is out of range")
+        index = (row - 1) * self.seats_in_row + (seat - 1)
+        return index >> 3, 1 << (index & 7)
+
+    def is_taken(self, row, seat):
+        byte, mask = self._position(row, seat)
+        return bool(self._bits[byte] & mask)
+
+    def take(self, row, seat):
+        byte, mask = self._position(row, seat)
+        self._bits[byte] |= mask
+
+    def release(self, row, seat):
+        byte, mask = self._position(row, seat)
+        self._bits[byte] &= ~mask
+
+    def count(self):
+        return int.from_bytes(self._bits, "little").bit_count()
+
+    def taken(self):
+        for byte, value in enumerate(self._bits):
+            while value:
+                low = value & -value
+                index = (byte << 3) + low.bit_length() - 1
+                row, seat = divmod(index, self.seats_in_row)
+                yield row + 1, seat + 1
+                value ^= low
+
+    def _bitstring(self):
+        bits = "".join(f"{value:08b}"[::-1] for value in self._bits)
+        return bits[:self.capacity]
+
+    def as_rows(self):
+        """One string per row, ``"1"`` for a taken seat and ``"0"`` for a free one."""
+        bits = self._bitstring()
+        return [
+            bits[start:start + self.seats_in_row]
+            for start in range(0, self.capacity, self.seats_in_row)
+        ]
+
+    def as_runs(self):
+        """Run-length form of the row-major seat list: ``[[taken, length], ...]``."""
+        return [
+            [int(bit), len(list(run))]
+            for bit, run in groupby(self._bitstring())
+        ]
+
+    def to_bytes(self):
+        return bytes(self._bits)
+
+
+def _store(flight, seat_map):
+    flight.seat_map = seat_map.to_bytes()
+    flight.seats_taken = seat_map.count()
+    flight.seats_version += 1
+
+
+def _update_seats(tickets, take):
+    from airport.models import Flight
+    from airport.occupancy import count_tickets, occupancy_key
+
+    tickets = list(tickets)
+    if not tickets:
+        return {}
+
+    with transaction.atomic(savepoint=False):
+        flights = (
+            Flight.objects.select_for_update(of=("self",))
+            .select_related("airplane")
+            .only(
+                "route",
+                "departure_time",
+                "seat_map",
+                "seats_taken",
+                "seats_version",
+                "airplane__rows",
+                "airplane__seats_in_row",
+                "airplane__airplane_type",
+            )
+            .filter(pk__in={ticket.flight_id for ticket in tickets})
+            .order_by("pk")
+        )
+        flights = {flight.pk: flight for flight in flights}
+        seat_maps = {pk: SeatMap.for_flight(flight) for pk, flight in flights.items()}
+
+        taken = []
+        for ticket in tickets:
+            seat_map = seat_maps.get(ticket.flight_id)
+            if seat_map is None:
+                continue
+            try:
+                if take:
+                    if seat_map.is_taken(ticket.row, ticket.seat):
+                        taken.append((ticket.flight_id, ticket.row, ticket.seat))
+                    seat_map.take(ticket.row, ticket.seat)
+                else:
+                    seat_map.release(ticket.row, ticket.seat)
+            except ValueError:
+                continue
+        if taken:
+            raise SeatUnavailable(taken)
+
+        deltas = Counter()
+        for pk, flight in flights.items():
+            before = flight.seats_taken
+            _store(flight, seat_maps[pk])
+            deltas[occupancy_key(flight)] += flight.seats_taken - before
+        Flight.objects.bulk_update(flights.values(), SEAT_FIELDS)
+        count_tickets(deltas)
+
+    # Keep flight instances already attached to the tickets in step with the
+    # stored seat map, so callers holding them do not read stale counts.
+    descriptor = type(tickets[0]).flight
+    for ticket in tickets:
+        flight = flights.get(ticket.flight_id)
+        if flight is not None and descriptor.is_cached(ticket):
+            for field in SEAT_FIELDS:
+                setattr(ticket.flight, field, getattr(flight, field))
+    return flights
+
+
+def take_seats(tickets):
+    """Mark the seats of ``tickets`` as taken on their flights' seat maps.
+
+    The flights stay locked until the surrounding transaction ends. Raises
+    SeatUnavailable if any of the seats is already taken. Returns the locked
+    flights by id.
+    """
+    return _update_seats(tickets, take=True)
+
+
+def release_seats(tickets):
+    """Mark the seats of ``tickets`` as free on their flights' seat maps."""
+    pending = _deferred_releases.get()
+    if pending is not None:
+        pending.extend(tickets)
+        return
+    _update_seats(tickets, take=False)
+
+
+@contextmanager
+def deferred_release():
+    """Collect the release_seats() calls made inside (one per deleted ticket
+    when an order or flight is deleted) into a single update at the end."""
+    pending = []
+    token = _deferred_releases.set(pending)
+    try:
+        yield
+    finally:
+        _deferred_releases.reset(token)
+    release_seats(pending)
+
+
+def build_seat_maps(flights):
+    """Return ``{flight_id: SeatMap}`` built from the Ticket table."""
+    from airport.models import Ticket
+
+    flights = list(flights)
+    seat_maps = {
+        flight.pk: SeatMap(flight.airplane.rows, flight.airplane.seats_in_row)
+        for flight in flights
+    }
+    tickets = Ticket.objects.for_flights(flights).values_list("flight_id", "row", "seat")
+    for flight_id, row, seat in tickets.iterator(chunk_size=5000):
+        try:
+            seat_maps[flight_id].take(row, seat)
+        except ValueError:
+            continue
+    return seat_maps
+
+
+def rebuild_seat_maps(flights):
+    """Rewrite the stored seat maps of ``flights``, which have their airplane
+    loaded, and their ticket counts; return the flights that changed."""
+    from airport.models import Flight
+    from airport.occupancy import count_tickets, occupancy_key
+
+    flights = {flight.pk: flight for flight in flights}
+    changed = []
+    deltas = Counter()
+    for flight_id, seat_map in build_seat_maps(flights.values()).items():
+        flight = flights[flight_id]
+        if (
+            bytes(flight.seat_map or b"") != seat_map.to_bytes()
+            or flight.seats_taken != seat_map.count()
+        ):
+            before = flight.seats_taken
+            _store(flight, seat_map)
+            deltas[occupancy_key(flight)] += flight.seats_taken - before
+            changed.append(flight)
+    Flight.objects.bulk_update(changed, SEAT_FIELDS)
+    count_tickets(deltas)
+    return changed
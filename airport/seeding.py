@@ -0,0 +1,394 @@
+import math
+import random
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import JSONField, Max
+from django.utils import timezone
+
+from airport.caching import touch_models
+from airport.connections import invalidate_connection_index
+from airport.documents import flight_snapshot
+from airport.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Crew,
+    Flight,
+    Order,
+    OrderDocument,
+    Route,
+    Ticket,
+)
+from airport.occupancy import rebuild_occupancy
+from airport.partitions import ensure_partitions
+from airport.seats import SeatMap
+
+# city, latitude, longitude
+CITIES = (
+    ("Amsterdam", 52.31, 4.76), ("Athens", 37.94, 23.94), ("Bangkok", 13.69, 100.75),
+    ("Barcelona", 41.30, 2.08), ("Beijing", 40.08, 116.58), ("Berlin", 52.36, 13.50),
+    ("Boston", 42.36, -71.01), ("Brussels", 50.90, 4.48), ("Budapest", 47.44, 19.26),
+    ("Cairo", 30.12, 31.41), ("Chicago", 41.97, -87.91), ("Copenhagen", 55.62, 12.65),
+    ("Delhi", 28.56, 77.10), ("Dubai", 25.25, 55.36), ("Dublin", 53.42, -6.27),
+    ("Frankfurt", 50.03, 8.57), ("Geneva", 46.24, 6.11), ("Hamburg", 53.63, 9.99),
+    ("Helsinki", 60.32, 24.96), ("Hong Kong", 22.31, 113.92), ("Istanbul", 41.26, 28.74),
+    ("Kyiv", 50.34, 30.89), ("Lisbon", 38.77, -9.13), ("London", 51.47, -0.45),
+    ("Los Angeles", 33.94, -118.41), ("Madrid", 40.47, -3.56), ("Miami", 25.80, -80.29),
+    ("Milan", 45.63, 8.72), ("Montreal", 45.47, -73.74), ("Mumbai", 19.09, 72.87),
+    ("Munich", 48.35, 11.79), ("New York", 40.64, -73.78), ("Oslo", 60.19, 11.10),
+    ("Paris", 49.01, 2.55), ("Prague", 50.10, 14.26), ("Riga", 56.92, 23.97),
+    ("Rome", 41.80, 12.25), ("San Francisco", 37.62, -122.38), ("Seoul", 37.46, 126.44),
+    ("Singapore", 1.36, 103.99), ("Stockholm", 59.65, 17.92), ("Sydney", -33.95, 151.18),
+    ("Tokyo", 35.77, 140.39), ("Toronto", 43.68, -79.63), ("Vienna", 48.11, 16.57),
+    ("Vilnius", 54.63, 25.29), ("Warsaw", 52.17, 20.97), ("Zurich", 47.46, 8.55),
+)
+AIRPORT_SUFFIXES = ("International", "City", "Central", "North", "South", "Regional")
+# name, rows, seats in row, range in km
+AIRPLANE_TYPES = (
+    ("Embraer E190", 25, 4, 4500),
+    ("Airbus A220", 25, 5, 6300),
+    ("Airbus A320", 30, 6, 6100),
+    ("Boeing 737", 32, 6, 6500),
+    ("Airbus A321", 36, 6, 7400),
+    ("Boeing 787", 40, 9, 14000),
+    ("Airbus A350", 42, 9, 15000),
+)
+FIRST_NAMES = ("Anna", "Ben", "Chloe", "David", "Emma", "Felix", "Grace", "Hugo", "Iris", "Jonas")
+LAST_NAMES = (
+    "Adams", "Brown", "Clark", "Davis", "Evans", "Fischer", "Garcia", "Hill", "Ivanov", "Jones"
+)
+SEED_PASSWORD = "seed-password"
+CRUISE_SPEED = 800  # km/h
+
+
+def _distance(source, destination):
+    """Great-circle distance in km between two (latitude, longitude) points."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (*source, *destination))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return round(2 * 6371 * math.asin(math.sqrt(a)))
+
+
+def _next_id(model):
+    return (model.objects.aggregate(Max("pk"))["pk__max"] or 0) + 1
+
+
+class BulkCreateWriter:
+    """Inserts rows with ``bulk_create``; works on every database."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+
+    def write(self, model, fields, rows):
+        model.objects.bulk_create(
+            (model(**dict(zip(fields, row))) for row in rows),
+            batch_size=self.batch_size,
+        )
+
+
+class CopyWriter:
+    """Streams rows into PostgreSQL with ``COPY ... FROM STDIN``."""
+
+    def write(self, model, fields, rows):
+        from psycopg.types.json import Jsonb
+
+        json_columns = [
+            position for position, field in enumerate(fields)
+            if isinstance(model._meta.get_field(field), JSONField)
+        ]
+        columns = ", ".join(
+            connection.ops.quote_name(model._meta.get_field(field).column)
+            for field in fields
+        )
+        table = connection.ops.quote_name(model._meta.db_table)
+        with connection.cursor() as cursor:
+            with cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+                for row in rows:
+                    if json_columns:
+                        row = list(row)
+                        for position in json_columns:
+                            row[position] = Jsonb(row[position])
+                    copy.write_row(row)
+
+
+def seed_airport(
+    *,
+    airports=50,
+    airplanes=40,
+    routes=300,
+    flights=1000,
+    orders=500,
+    tickets_per_order=3,
+    users=50,
+    crews=30,
+    seed=0,
+    start=None,
+    days=30,
+    batch_size=5000,
+    use_copy=None,
+    progress=None,
+):
+    """Fill the database with a deterministic synthetic schedule and bookings.
+
+    Airports, airplane types, airplanes, routes, crews and users that already
+    exist (by name, by airport pair, by email) are reused, so seeding again
+    only adds flights and orders. Flights, orders and tickets get explicit
+    primary keys and are written with ``COPY`` on PostgreSQL (``use_copy``)
+    or ``bulk_create`` elsewhere; run it while nothing else writes to those
+    tables. Signals do not run: seat maps and order documents are computed
+    here, and the occupancy statistics are rebuilt and the caches signals
+    would invalidate are invalidated at the end. Users get the password
+    ``SEED_PASSWORD``.
+
+    ``progress(label, done, total)`` is called after every batch.
+    """
+    rng = random.Random(seed)
+    progress = progress or (lambda label, done, total: None)
+    if start is None:
+        start = timezone.make_aware(datetime.combine(timezone.now().date(), time.min))
+    if use_copy is None:
+        use_copy = connection.vendor == "postgresql"
+    writer = CopyWriter() if use_copy else BulkCreateWriter(batch_size)
+
+    airport_objects, positions = _seed_airports(airports)
+    progress("airports", airports, airports)
+    airplane_objects = _seed_airplanes(rng, airplanes)
+    progress("airplanes", airplanes, airplanes)
+    route_objects = _seed_routes(rng, airport_objects, positions, routes)
+    progress("routes", len(route_objects), len(route_objects))
+
+    # Names are drawn for every crew so reruns consume the same random numbers.
+    crew_names = [(rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)) for _ in range(crews)]
+    crew_objects = list(Crew.objects.order_by("pk")[:crews])
+    crew_objects += Crew.objects.bulk_create(
+        Crew(first_name=first_name, last_name=last_name)
+        for first_name, last_name in crew_names[len(crew_objects):]
+    )
+    progress("crews", crews, crews)
+
+    User = get_user_model()
+    emails = [f"seed{seed}-{number}@example.com" for number in range(users)]
+    existing = User.objects.in_bulk(emails, field_name="email")
+    password = make_password(SEED_PASSWORD)
+    User.objects.bulk_create(
+        User(email=email, password=password) for email in emails if email not in existing
+    )
+    user_ids = list(
+        User.objects.filter(email__in=emails).order_by("pk").values_list("pk", flat=True)
+    )
+    progress("users", users, users)
+
+    # Airplanes per route: the smallest types that can fly the distance.
+    fleet = {}
+    for route in route_objects:
+        able = [a for a in airplane_objects if a.range >= route.distance]
+        fleet[route.pk] = able or [max(airplane_objects, key=lambda a: a.range)]
+
+    ensure_partitions(start, start + timedelta(days=days))
+    ids = {model: _next_id(model) for model in (Flight, Order, Ticket)}
+    counts = {"flights": 0, "orders": 0, "tickets": 0}
+    booked_at = timezone.now()
+    minutes = days * 24 * 60
+    while counts["flights"] < flights:
+        size = min(batch_size, flights - counts["flights"])
+        with transaction.atomic():
+            _seed_flights(
+                rng, writer, size, flights, orders, tickets_per_order, route_objects,
+                fleet, crew_objects, user_ids, start, minutes, booked_at, ids, counts,
+            )
+        progress("flights", counts["flights"], flights)
+
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [Flight, Order, Ticket]):
+            cursor.execute(sql)
+    rebuild_occupancy(batch_size)
+    invalidate_connection_index()
+    touch_models(Airport, Airplane, AirplaneType, Route, Crew)
+
+    return {
+        "airports": airports,
+        "airplanes": airplanes,
+        "routes": len(route_objects),
+        "crews": crews,
+        "users": users,
+        **counts,
+    }
+
+
+def _seed_airports(count):
+    names = [
+        (f"{city} {suffix}", city, (latitude, longitude))
+        for suffix in AIRPORT_SUFFIXES
+        for city, latitude, longitude in CITIES
+    ]
+    names += [
+        (f"Airport {number}", "Nowhere", (0.0, number / 100))
+        for number in range(len(names), count)
+    ]
+    names = names[:count]
+    existing = Airport.objects.in_bulk([name for name, _, _ in names], field_name="name")
+    Airport.objects.bulk_create(
+        Airport(name=name, closest_big_city=city)
+        for name, city, _ in names if name not in existing
+    )
+    airports = Airport.objects.in_bulk([name for name, _, _ in names], field_name="name")
+    return (
+        [airports[name] for name, _, _ in names],
+        {airports[name].pk: position for name, _, position in names},
+    )
+
+
+def _seed_airplanes(rng, count):
+    types = AirplaneType.objects.in_bulk([name for name, *_ in AIRPLANE_TYPES], field_name="name")
+    AirplaneType.objects.bulk_create(
+        AirplaneType(name=name) for name, *_ in AIRPLANE_TYPES if name not in types
+    )
+    types = AirplaneType.objects.in_bulk([name for name, *_ in AIRPLANE_TYPES], field_name="name")
+
+    # Mostly narrow-bodies, like a real fleet.
+    weights = (3, 3, 5, 5, 3, 2, 1)
+    picks = rng.choices(AIRPLANE_TYPES, weights, k=count)
+    fleet = [
+        (f"{name} #{number + 1}", name, rows, seats_in_row, range_km)
+        for number, (name, rows, seats_in_row, range_km) in enumerate(picks)
+    ]
+    existing = Airplane.objects.in_bulk([name for name, *_ in fleet], field_name="name")
+    Airplane.objects.bulk_create(
+        Airplane(name=name, rows=rows, seats_in_row=seats_in_row, airplane_type=types[model])
+        for name, model, rows, seats_in_row, _ in fleet if name not in existing
+    )
+    airplanes = Airplane.objects.select_related("airplane_type").in_bulk(
+        [name for name, *_ in fleet], field_name="name"
+    )
+    for name, _, _, _, range_km in fleet:
+        airplanes[name].range = range_km
+    return [airplanes[name] for name, *_ in fleet]
+
+
+def _seed_routes(rng, airports, positions, count):
+    """Hub and spoke: every airport connects to two hubs, hubs to each other,
+    and the rest of ``count`` are random pairs."""
+    count = min(count, len(airports) * (len(airports) - 1))
+    hubs = rng.sample(airports, max(2, min(len(airports), len(airports) // 10)))
+
+    pairs = {}
+    candidates = [(a, b) for a in hubs for b in hubs if a != b]
+    for airport in airports:
+        for hub in rng.sample(hubs, min(2, len(hubs))):
+            if hub != airport:
+                candidates += [(airport, hub), (hub, airport)]
+    for source, destination in candidates:
+        if len(pairs) < count:
+            pairs.setdefault((source.pk, destination.pk), None)
+    while len(pairs) < count:
+        source, destination = rng.sample(airports, 2)
+        pairs.setdefault((source.pk, destination.pk), None)
+
+    existing = {
+        (route.source_id, route.destination_id): route
+        for route in Route.objects.filter(source__in=airports, destination__in=airports)
+    }
+    Route.objects.bulk_create(
+        Route(
+            source_id=source,
+            destination_id=destination,
+            distance=max(100, _distance(positions[source], positions[destination])),
+        )
+        for source, destination in pairs if (source, destination) not in existing
+    )
+    existing = {
+        (route.source_id, route.destination_id): route
+        for route in Route.objects.select_related("source", "destination").filter(
+            source__in=airports, destination__in=airports
+        )
+    }
+    return [existing[pair] for pair in pairs]
+
+
+def _seed_flights(
+    rng, writer, size, flights, orders, tickets_per_order, routes, fleet, crews,
+    user_ids, start, minutes, booked_at, ids, counts,
+):
+    """Write ``size`` flights with their crews, orders, tickets and order
+    documents."""
+    flight_rows, member_rows, order_rows, ticket_rows, document_rows = [], [], [], [], []
+    flight_id, order_id, ticket_id = ids[Flight], ids[Order], ids[Ticket]
+
+    for _ in range(size):
+        route = rng.choice(routes)
+        airplane = rng.choice(fleet[route.pk])
+        departure_time = start + timedelta(minutes=rng.randrange(minutes // 5) * 5)
+        arrival_time = departure_time + timedelta(
+            minutes=30 + route.distance * 60 // CRUISE_SPEED
+        )
+
+        # Spread the orders evenly over the flights, never past capacity.
+        order_count = orders // flights + (rng.random() < orders % flights / flights)
+        seat_map = SeatMap(airplane.rows, airplane.seats_in_row)
+        sizes = [rng.randint(1, tickets_per_order) for _ in range(order_count)]
+        free = rng.sample(range(seat_map.capacity), min(sum(sizes), seat_map.capacity))
+        snapshot = flight_snapshot(Flight(
+            pk=flight_id,
+            route=route,
+            airplane=airplane,
+            departure_time=departure_time,
+            arrival_time=arrival_time,
+        ))
+        for order_size in sizes:
+            seats, free = free[:order_size], free[order_size:]
+            if not seats:
+                break
+            order_rows.append((order_id, booked_at, rng.choice(user_ids)))
+            document = []
+            for position in seats:
+                row, seat = divmod(position, airplane.seats_in_row)
+                seat_map.take(row + 1, seat + 1)
+                ticket_rows.append(
+                    (ticket_id, row + 1, seat + 1, flight_id, order_id, departure_time)
+                )
+                document.append(
+                    {"id": ticket_id, "row": row + 1, "seat": seat + 1, "flight": snapshot}
+                )
+                ticket_id += 1
+            document_rows.append((order_id, document, booked_at))
+            order_id += 1
+
+        flight_rows.append((
+            flight_id,
+            route.pk,
+            airplane.pk,
+            departure_time,
+            arrival_time,
+            seat_map.to_bytes(),
+            seat_map.count(),
+            0,
+        ))
+        member_rows += [
+            (flight_id, crew.pk)
+            for crew in rng.sample(crews, min(len(crews), rng.randint(2, 4)))
+        ]
+        flight_id += 1
+
+    writer.write(
+        Flight,
+        ("id", "route_id", "airplane_id", "departure_time", "arrival_time",
+         "seat_map", "seats_taken", "seats_version"),
+        flight_rows,
+    )
+    writer.write(Flight.members.through, ("flight_id", "crew_id"), member_rows)
+    writer.write(Order, ("id", "created_at", "user_id"), order_rows)
+    writer.write(
+        Ticket, ("id", "row", "seat", "flight_id", "order_id", "departure_time"), ticket_rows
+    )
+    writer.write(OrderDocument, ("order_id", "tickets", "updated_at"), document_rows)
+
+    ids[Flight], ids[Order], ids[Ticket] = flight_id, order_id, ticket_id
+    counts["flights"] += len(flight_rows)
+    counts["orders"] += len(order_rows)
+    counts["tickets"] += len(ticket_rows)
@@ -1,6 +1,9 @@
+from datetime import timedelta
+
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 from django.db import transaction
+from django.utils import timezone
 
 from airport.models import (
     Airport,
@@ -11,7 +14,14 @@ from airport.models import (
     Order,
     Ticket,
     Crew,
+    SeatHold,
+    BookingRequest,
 )
+from airport.documents import write_order_document
+from airport.occupancy import OCCUPANCY_GROUPS
+from airport.reservations import reserve_seats
+from airport.schedule_import import FORMATS, guess_format
+from airport.seats import SeatUnavailable, deferred_release
 
 
 class CrewSerializer(serializers.ModelSerializer):
@@ -147,6 +157,8 @@ class FlightSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(int)
     def get_available_seats(self, obj) -> int:
+        if hasattr(obj, "available_seats_count"):
+            return obj.available_seats_count
         return obj.available_seats
 
 class FlightListSerializer(FlightSerializer):
@@ -174,6 +186,8 @@ class FlightListSerializer(FlightSerializer):
 
     @extend_schema_field(int)
     def get_taken_seats(self, obj) -> int:
+        if hasattr(obj, "taken_seats_count"):
+            return obj.taken_seats_count
         return obj.taken_seats_list
 
 
@@ -209,10 +223,46 @@ class FlightRetrieveSerializer(FlightListSerializer):
         return obj.taken_seats_detail
 
 
+class TicketFlightField(serializers.PrimaryKeyRelatedField):
+    """Flight lookup that reuses flights preloaded into ``context["flights"]``."""
+
+    def to_internal_value(self, data):
+        flights = self.context.get("flights")
+        if flights is None:
+            return super().to_internal_value(data)
+
+        try:
+            flight = flights.get(int(data))
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if flight is None:
+            self.fail("does_not_exist", pk_value=data)
+        return flight
+
+
+def validate_seat_range(airplane, row, seat):
+    """Raise ValidationError unless seat ``row``-``seat`` exists on ``airplane``."""
+    errors = {}
+
+    if seat < 1 or seat > airplane.seats_in_row:
+        errors["seat"] = f"The seat number {seat} is out of range (1 - {airplane.seats_in_row})"
+
+    if row < 1 or row > airplane.rows:
+        errors["row"] = f"The row number {row} is out of range (1 - {airplane.rows})"
+
+    if errors:
+        raise serializers.ValidationError(errors)
+
+
 class TicketSerializer(serializers.ModelSerializer):
+    flight = TicketFlightField(queryset=Flight.objects.select_related("airplane"))
+
     class Meta:
         model = Ticket
         fields = ("id", "row", "seat", "flight")
+        # Seat uniqueness is checked against the flight's seat map in
+        # validate() and enforced under lock by reserve_seats().
+        validators = []
 
     def validate(self, attrs):
         flight = attrs["flight"]
@@ -220,19 +270,11 @@ class TicketSerializer(serializers.ModelSerializer):
         row = attrs["row"]
         airplane = flight.airplane
 
-        errors = {}
-
-        if Ticket.objects.filter(flight=flight, row=row, seat=seat).exists():
-            errors["taken_seats"] = f"Seat {row}-{seat} is already occupied on this flight"
-
-        if seat < 1 or seat > airplane.seats_in_row:
-            errors["seat"] = f"The seat number {seat} is out of range (1 - {airplane.seats_in_row})"
-
-        if row < 1 or row > airplane.rows:
-            errors["row"] = f"The row number {row} is out of range (1 - {airplane.rows})"
-
-        if errors:
-            raise serializers.ValidationError(errors)
+        validate_seat_range(airplane, row, seat)
+        if not flight.is_seat_free(row, seat):
+            raise serializers.ValidationError(
+                {"taken_seats": f"Seat {row}-{seat} is already occupied on this flight"}
+            )
 
         return attrs
 
@@ -253,14 +295,214 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ("id", "created_at", "user", "tickets")
         read_only_fields = ("user",)
 
+    def to_internal_value(self, data):
+        # Load every referenced flight (with its seat map) in one query, so
+        # the nested ticket serializers validate without touching the DB.
+        tickets = data.get("tickets") if hasattr(data, "get") else None
+        if isinstance(tickets, list):
+            flight_ids = set()
+            for ticket in tickets:
+                try:
+                    flight_ids.add(int(ticket["flight"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+            # The route and airplane type are for the order document.
+            self.context["flights"] = Flight.objects.select_related(
+                "airplane__airplane_type", "route__source", "route__destination"
+            ).in_bulk(flight_ids)
+        return super().to_internal_value(data)
+
+    def validate_tickets(self, tickets):
+        seen = set()
+        for ticket in tickets:
+            key = (ticket["flight"].pk, ticket["row"], ticket["seat"])
+            if key in seen:
+                raise serializers.ValidationError(
+                    f"Seat {ticket['row']}-{ticket['seat']} is requested more "
+                    f"than once for flight {ticket['flight'].pk}"
+                )
+            seen.add(key)
+        return tickets
+
     def create(self, validated_data):
         with transaction.atomic():
             tickets_data = validated_data.pop("tickets")
             order = Order.objects.create(**validated_data)
-            for ticket_data in tickets_data:
-                Ticket.objects.create(order=order, **ticket_data)
+            try:
+                tickets = reserve_seats(
+                    order.user,
+                    (Ticket(order=order, **ticket_data) for ticket_data in tickets_data)
+                )
+            except SeatUnavailable as error:
+                raise serializers.ValidationError({"taken_seats": str(error)})
+            write_order_document(order, tickets)
             return order
 
+    def update(self, instance, validated_data):
+        """Replace the order's tickets (and document) with those given."""
+        tickets_data = validated_data.pop("tickets", None)
+        if tickets_data is None:
+            return instance
+        with transaction.atomic():
+            with deferred_release():
+                instance.tickets.all().delete()
+            try:
+                tickets = reserve_seats(
+                    instance.user,
+                    (Ticket(order=instance, **ticket_data) for ticket_data in tickets_data)
+                )
+            except SeatUnavailable as error:
+                raise serializers.ValidationError({"taken_seats": str(error)})
+            # Deleting the old tickets has dropped the document.
+            write_order_document(instance, tickets)
+            return instance
+
+
+class BookingRequestSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BookingRequest
+        fields = ("id", "status", "tickets", "order", "errors", "created_at", "processed_at")
+        read_only_fields = fields
+
+
+class ScheduleImportSerializer(serializers.Serializer):
+    file = serializers.FileField(help_text="CSV or JSON Lines schedule")
+    file_format = serializers.ChoiceField(
+        choices=FORMATS,
+        required=False,
+        help_text="Defaults to the file's extension (.csv, .jsonl or .ndjson)",
+    )
+    dry_run = serializers.BooleanField(
+        default=False, help_text="Validate without inserting anything"
+    )
+
+    def validate(self, attrs):
+        attrs.setdefault("file_format", guess_format(attrs["file"].name))
+        if attrs["file_format"] is None:
+            raise serializers.ValidationError(
+                {"file_format": "Cannot tell the format from the file name, give it."}
+            )
+        return attrs
+
+
+class ExportSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False, help_text="First booking date")
+    end = serializers.DateField(required=False, help_text="Last booking date, inclusive")
+
+    def validate(self, attrs):
+        if "start" in attrs and "end" in attrs and attrs["end"] < attrs["start"]:
+            raise serializers.ValidationError({"end": "Must not be before start."})
+        return attrs
+
+
+class OccupancyQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False, help_text="First departure day")
+    end = serializers.DateField(required=False, help_text="Last departure day, inclusive")
+    route = serializers.IntegerField(required=False)
+    airplane_type = serializers.IntegerField(required=False)
+    group_by = serializers.MultipleChoiceField(
+        choices=OCCUPANCY_GROUPS,
+        required=False,
+        help_text="Dimensions to break the totals down by, all of them by default",
+    )
+
+    def validate(self, attrs):
+        if "start" in attrs and "end" in attrs and attrs["end"] < attrs["start"]:
+            raise serializers.ValidationError({"end": "Must not be before start."})
+        # A query string without group_by reads as an empty list.
+        attrs["group_by"] = attrs.get("group_by") or set(OCCUPANCY_GROUPS)
+        return attrs
+
+
+class OccupancySerializer(serializers.Serializer):
+    route = serializers.IntegerField(required=False)
+    airplane_type = serializers.IntegerField(required=False)
+    day = serializers.DateField(required=False)
+    flights = serializers.IntegerField()
+    seats = serializers.IntegerField()
+    tickets = serializers.IntegerField()
+    load_factor = serializers.FloatField(allow_null=True, help_text="Tickets per seat")
+
+
+class CalendarQuerySerializer(serializers.Serializer):
+    MAX_DAYS = 92
+
+    start = serializers.DateField(required=False, help_text="First day, today by default")
+    end = serializers.DateField(
+        required=False, help_text="Last day, inclusive; 30 days after start by default"
+    )
+
+    def validate(self, attrs):
+        attrs.setdefault("start", timezone.localdate())
+        attrs.setdefault("end", attrs["start"] + timedelta(days=30))
+        if attrs["end"] < attrs["start"]:
+            raise serializers.ValidationError({"end": "Must not be before start."})
+        if (attrs["end"] - attrs["start"]).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({"end": f"At most {self.MAX_DAYS} days at a time."})
+        return attrs
+
+
+class CalendarDaySerializer(serializers.Serializer):
+    day = serializers.DateField()
+    flights = serializers.IntegerField()
+    first_departure = serializers.DateTimeField(allow_null=True)
+    free_seats = serializers.IntegerField(help_text="Over all of the day's flights")
+    max_free_seats = serializers.IntegerField(help_text="On the day's emptiest flight")
+
+
+class SeatSerializer(serializers.Serializer):
+    row = serializers.IntegerField(min_value=1)
+    seat = serializers.IntegerField(min_value=1)
+
+
+class SeatHoldRequestSerializer(serializers.Serializer):
+    seats = SeatSerializer(many=True, allow_empty=False)
+
+
+class SeatHoldSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SeatHold
+        fields = ("id", "flight", "row", "seat", "expires_at")
+
+
+class ConnectionSearchSerializer(serializers.Serializer):
+    source = serializers.CharField()
+    destination = serializers.CharField()
+    date = serializers.DateField()
+    max_legs = serializers.IntegerField(min_value=1, max_value=4, default=3)
+    min_connection = serializers.IntegerField(
+        min_value=0, default=60, help_text="Minimum connection time, minutes"
+    )
+    order_by = serializers.ChoiceField(
+        choices=("duration", "distance"), default="duration"
+    )
+
+
+class ConnectionLegSerializer(serializers.Serializer):
+    flight = serializers.IntegerField()
+    route = serializers.IntegerField()
+    departure = serializers.SerializerMethodField()
+    arrival = serializers.SerializerMethodField()
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    distance = serializers.IntegerField()
+
+    @extend_schema_field(str)
+    def get_departure(self, obj) -> str:
+        return self.context["airports"][obj.source]
+
+    @extend_schema_field(str)
+    def get_arrival(self, obj) -> str:
+        return self.context["airports"][obj.destination]
+
+
+class ItinerarySerializer(serializers.Serializer):
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    duration = serializers.IntegerField(help_text="Total travel time, minutes")
+    distance = serializers.IntegerField()
+    legs = ConnectionLegSerializer(many=True)
+
 
 class OrderListSerializer(OrderSerializer):
     user = serializers.CharField(source="user.email")
@@ -0,0 +1,174 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from airport.caching import touch_models
+from airport.connections import invalidate_connection_index
+from airport.documents import (
+    drop_documents_for,
+    drop_documents_for_flight_delete,
+    drop_order_documents,
+)
+from airport.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Crew,
+    Flight,
+    Route,
+    Ticket,
+)
+from airport.occupancy import departure_day, refresh_flight_occupancy, refresh_occupancy
+from airport.partitions import retained_since
+from airport.query_budget import install_query_counter
+from airport.seats import rebuild_seat_maps, release_seats, take_seats
+
+
+@receiver(pre_save, sender=Ticket)
+def remember_ticket_seat(sender, instance, **kwargs):
+    instance._previous_seat = None
+    if instance.pk is not None:
+        instance._previous_seat = (
+            Ticket.objects.filter(pk=instance.pk)
+            .values_list("flight_id", "row", "seat")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Ticket)
+def update_seat_map_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_seat", None)
+    current = (instance.flight_id, instance.row, instance.seat)
+
+    if previous is not None and previous != current:
+        flight_id, row, seat = previous
+        release_seats([Ticket(flight_id=flight_id, row=row, seat=seat)])
+    if previous != current:
+        take_seats([instance])
+
+
+@receiver(post_delete, sender=Ticket)
+def update_seat_map_on_delete(sender, instance, **kwargs):
+    release_seats([instance])
+
+
+@receiver(post_save, sender=Airplane)
+def rebuild_seat_maps_on_airplane_change(sender, instance, created, **kwargs):
+    if not created:
+        flights = Flight.objects.filter(airplane=instance)
+        # Older flights may have had their tickets archived.
+        if (since := retained_since()) is not None:
+            flights = flights.filter(departure_time__gte=since)
+        rebuild_seat_maps(flights.select_related("airplane"))
+        # Capacity and airplane type are part of the occupancy statistics.
+        refresh_flight_occupancy(flights)
+
+
+@receiver(pre_save, sender=Flight)
+def remember_flight_departure(sender, instance, **kwargs):
+    instance._previous_departure = None
+    instance._previous_airplane_id = None
+    if instance.pk is not None:
+        previous = (
+            Flight.objects.filter(pk=instance.pk)
+            .values_list("route_id", "departure_time", "airplane_id")
+            .first()
+        )
+        if previous is not None:
+            instance._previous_departure = previous[:2]
+            instance._previous_airplane_id = previous[2]
+
+
+@receiver(post_save, sender=Flight)
+def refresh_occupancy_on_flight_save(sender, instance, **kwargs):
+    departures = [(instance.route_id, instance.departure_time)]
+    previous = getattr(instance, "_previous_departure", None)
+    if previous is not None:
+        departures.append(previous)
+    days = [departure_day(departure_time) for _, departure_time in departures]
+    refresh_occupancy({route_id for route_id, _ in departures}, min(days), max(days))
+
+
+@receiver(post_save, sender=Flight)
+def move_tickets_on_departure_change(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_departure", None)
+    if previous is not None and previous[1] != instance.departure_time:
+        # Filtered by the old departure too, to read only its partition.
+        Ticket.objects.filter(flight=instance, departure_time=previous[1]).update(
+            departure_time=instance.departure_time
+        )
+
+
+@receiver(post_save, sender=Flight)
+def rebuild_seat_map_on_airplane_change(sender, instance, **kwargs):
+    # After move_tickets_on_departure_change, so the tickets are found under
+    # the flight's new departure.
+    previous = getattr(instance, "_previous_airplane_id", None)
+    if previous is None or previous == instance.airplane_id:
+        return
+    if (since := retained_since()) is not None and instance.departure_time < since:
+        return
+    # The stored seat map is laid out for the old airplane's rows.
+    rebuild_seat_maps([instance])
+
+
+@receiver(post_delete, sender=Flight)
+def refresh_occupancy_on_flight_delete(sender, instance, **kwargs):
+    day = departure_day(instance.departure_time)
+    refresh_occupancy([instance.route_id], day, day)
+
+
+@receiver(post_save, sender=Airport)
+@receiver(post_delete, sender=Airport)
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+@receiver(post_save, sender=Flight)
+@receiver(post_delete, sender=Flight)
+def invalidate_connections(sender, **kwargs):
+    invalidate_connection_index()
+
+
+@receiver(post_save, sender=Airport)
+@receiver(post_delete, sender=Airport)
+@receiver(post_save, sender=Airplane)
+@receiver(post_delete, sender=Airplane)
+@receiver(post_save, sender=AirplaneType)
+@receiver(post_delete, sender=AirplaneType)
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+@receiver(post_save, sender=Crew)
+@receiver(post_delete, sender=Crew)
+def expire_cached_responses(sender, **kwargs):
+    touch_models(sender)
+
+
+@receiver(post_save, sender=Ticket)
+def drop_order_document_on_ticket_save(sender, instance, **kwargs):
+    drop_order_documents([instance.order_id])
+
+
+@receiver(post_delete, sender=Ticket)
+def drop_order_document_on_ticket_delete(sender, instance, origin=None, **kwargs):
+    # Tickets deleted along with their order or flight are handled there.
+    if origin is None or isinstance(origin, Ticket) or getattr(origin, "model", None) is Ticket:
+        drop_order_documents([instance.order_id])
+
+
+@receiver(post_save, sender=Airport)
+@receiver(post_save, sender=Airplane)
+@receiver(post_save, sender=AirplaneType)
+@receiver(post_save, sender=Route)
+@receiver(post_save, sender=Flight)
+def drop_order_documents_on_change(sender, instance, created, **kwargs):
+    if not created:
+        drop_documents_for(instance)
+
+
+@receiver(pre_delete, sender=Flight)
+def drop_order_documents_on_flight_delete(sender, instance, **kwargs):
+    drop_documents_for_flight_delete(instance)
+
+
+@receiver(connection_created)
+def count_queries_on_connect(sender, connection, **kwargs):
+    install_query_counter(connection)
@@ -0,0 +1,437 @@
+import json
+import tempfile
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils.timezone import now, timedelta
+
+from airport.bookings import enqueue_booking
+from airport.documents import build_order_documents
+from airport.partitions import plan_partitions
+from airport.models import (
+    Airport, Airplane, AirplaneType, BookingRequest, Route, Flight, IdempotencyKey,
+    Order, OrderDocument, RouteOccupancy, SeatHold, Ticket
+)
+
+User = get_user_model()
+
+
+class RebuildSeatMapsCommandTests(TestCase):
+    def setUp(self):
+        airplane_type = AirplaneType.objects.create(name="Airbus")
+        airplane = Airplane.objects.create(
+            name="A320", rows=5, seats_in_row=4, airplane_type=airplane_type
+        )
+        source = Airport.objects.create(name="X", closest_big_city="CityX")
+        dest = Airport.objects.create(name="Y", closest_big_city="CityY")
+        route = Route.objects.create(source=source, destination=dest, distance=800)
+        self.flight = Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time=now(),
+            arrival_time=now() + timedelta(hours=2)
+        )
+        user = User.objects.create_user(email="test@test.com", password="testpass")
+        order = Order.objects.create(user=user)
+        Ticket.objects.create(flight=self.flight, order=order, row=1, seat=2)
+        Ticket.objects.create(flight=self.flight, order=order, row=3, seat=4)
+
+    def test_check_reports_stale_seat_maps(self):
+        Flight.objects.update(seat_map=b"", seats_taken=0)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_seat_maps", "--check", stdout=StringIO())
+
+    def test_rebuild_restores_seat_maps(self):
+        Flight.objects.update(seat_map=b"", seats_taken=0)
+        out = StringIO()
+        call_command("rebuild_seat_maps", stdout=out)
+        self.assertIn("Rebuilt 1 seat map(s)", out.getvalue())
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.seats_taken, 2)
+        self.assertEqual(
+            self.flight.taken_seats_detail,
+            [{"row": 1, "seat": 2}, {"row": 3, "seat": 4}]
+        )
+        call_command("rebuild_seat_maps", "--check", stdout=StringIO())
+
+
+class RebuildOccupancyCommandTests(TestCase):
+    def setUp(self):
+        self.airplane_type = AirplaneType.objects.create(name="Airbus")
+        self.airplane = Airplane.objects.create(
+            name="A320", rows=5, seats_in_row=4, airplane_type=self.airplane_type
+        )
+        source = Airport.objects.create(name="X", closest_big_city="CityX")
+        dest = Airport.objects.create(name="Y", closest_big_city="CityY")
+        self.route = Route.objects.create(source=source, destination=dest, distance=800)
+        self.flights = [
+            Flight.objects.create(
+                route=self.route,
+                airplane=self.airplane,
+                departure_time=f"2030-01-01T{hour}:00:00Z",
+                arrival_time=f"2030-01-01T{hour + 2}:00:00Z",
+            )
+            for hour in (10, 14)
+        ]
+        user = User.objects.create_user(email="test@test.com", password="testpass")
+        self.order = Order.objects.create(user=user)
+        for flight in self.flights:
+            Ticket.objects.create(flight=flight, order=self.order, row=1, seat=1)
+        Ticket.objects.create(flight=self.flights[0], order=self.order, row=1, seat=2)
+
+    def stats(self):
+        return list(
+            RouteOccupancy.objects.order_by("day", "airplane_type").values_list(
+                "day", "airplane_type__name", "flights", "seats", "tickets"
+            )
+        )
+
+    def assertUpToDate(self):
+        out = StringIO()
+        call_command("rebuild_occupancy", "--check", stdout=out)
+        self.assertIn("up to date", out.getvalue())
+
+    def test_statistics_follow_bookings_and_schedule_changes(self):
+        day = date(2030, 1, 1)
+        self.assertEqual(self.stats(), [(day, "Airbus", 2, 40, 3)])
+
+        Ticket.objects.filter(flight=self.flights[0], seat=2).get().delete()
+        self.order.delete()
+        self.assertEqual(self.stats(), [(day, "Airbus", 2, 40, 0)])
+
+        order = Order.objects.create(user=self.order.user)
+        Ticket.objects.create(flight=self.flights[1], order=order, row=2, seat=2)
+        self.flights[1].departure_time = "2030-01-02T10:00:00Z"
+        self.flights[1].save()
+        self.assertEqual(
+            self.stats(),
+            [(day, "Airbus", 1, 20, 0), (date(2030, 1, 2), "Airbus", 1, 20, 1)],
+        )
+
+        self.airplane.airplane_type = AirplaneType.objects.create(name="Boeing")
+        self.airplane.rows = 10
+        self.airplane.save()
+        self.assertEqual(
+            self.stats(),
+            [(day, "Boeing", 1, 40, 0), (date(2030, 1, 2), "Boeing", 1, 40, 1)],
+        )
+
+        self.flights[0].delete()
+        self.assertEqual(self.stats(), [(date(2030, 1, 2), "Boeing", 1, 40, 1)])
+        self.assertUpToDate()
+
+    def test_check_reports_and_rebuild_fixes_stale_statistics(self):
+        RouteOccupancy.objects.update(tickets=0)
+        with self.assertRaisesMessage(CommandError, "1 occupancy row(s) out of date"):
+            call_command("rebuild_occupancy", "--check", stdout=StringIO())
+
+        out = StringIO()
+        call_command("rebuild_occupancy", stdout=out)
+        self.assertIn("Rebuilt 1 occupancy row(s)", out.getvalue())
+        self.assertEqual(self.stats(), [(date(2030, 1, 1), "Airbus", 2, 40, 3)])
+        self.assertUpToDate()
+
+    def test_bookings_recreate_missing_rows(self):
+        RouteOccupancy.objects.all().delete()
+        Ticket.objects.create(flight=self.flights[1], order=self.order, row=3, seat=3)
+        self.assertEqual(self.stats(), [(date(2030, 1, 1), "Airbus", 2, 40, 4)])
+
+
+class ProcessBookingsCommandTests(TestCase):
+    def setUp(self):
+        airplane_type = AirplaneType.objects.create(name="Airbus")
+        airplane = Airplane.objects.create(
+            name="A320", rows=5, seats_in_row=4, airplane_type=airplane_type
+        )
+        source = Airport.objects.create(name="X", closest_big_city="CityX")
+        dest = Airport.objects.create(name="Y", closest_big_city="CityY")
+        route = Route.objects.create(source=source, destination=dest, distance=800)
+        self.flights = [
+            Flight.objects.create(
+                route=route, airplane=airplane, departure_time=now(), arrival_time=now()
+            )
+            for _ in range(2)
+        ]
+        self.users = [
+            User.objects.create_user(email=f"user{number}@test.com", password="testpass")
+            for number in range(3)
+        ]
+
+    def enqueue(self, user, *seats):
+        return enqueue_booking(
+            user, [{"flight": flight, "row": row, "seat": seat} for flight, row, seat in seats]
+        )
+
+    def test_books_in_arrival_order_and_rejects_taken_seats(self):
+        first, second = self.flights
+        bookings = [
+            self.enqueue(self.users[0], (first, 1, 1), (second, 1, 1)),
+            self.enqueue(self.users[1], (second, 2, 2)),
+            self.enqueue(self.users[2], (first, 1, 1)),
+        ]
+        out = StringIO()
+        call_command("process_bookings", "--once", "--batch-size=10", stdout=out)
+        self.assertIn("Confirmed 2 and rejected 1 booking(s)", out.getvalue())
+
+        for booking in bookings:
+            booking.refresh_from_db()
+            self.assertIsNotNone(booking.processed_at)
+        self.assertEqual(
+            [booking.status for booking in bookings],
+            [BookingRequest.CONFIRMED, BookingRequest.CONFIRMED, BookingRequest.REJECTED],
+        )
+        self.assertIn("taken_seats", bookings[2].errors)
+        self.assertEqual(
+            sorted(bookings[0].order.tickets.values_list("flight_id", "row", "seat")),
+            [(first.pk, 1, 1), (second.pk, 1, 1)],
+        )
+        self.assertEqual(OrderDocument.objects.count(), 2)
+        for flight in self.flights:
+            flight.refresh_from_db()
+        self.assertEqual([flight.seats_taken for flight in self.flights], [1, 2])
+
+    def test_rejects_seats_removed_from_the_airplane(self):
+        first, second = self.flights
+        bookings = [
+            self.enqueue(self.users[0], (first, 5, 1)),
+            self.enqueue(self.users[1], (first, 1, 1)),
+        ]
+        airplane = Airplane.objects.get()
+        airplane.rows = 2
+        airplane.save()
+
+        call_command("process_bookings", "--once", "--batch-size=10", stdout=StringIO())
+        for booking in bookings:
+            booking.refresh_from_db()
+        self.assertEqual(
+            [booking.status for booking in bookings],
+            [BookingRequest.REJECTED, BookingRequest.CONFIRMED],
+        )
+        self.assertIn("row", bookings[0].errors)
+        self.assertIsNone(bookings[0].order)
+        self.assertEqual(Ticket.objects.get().row, 1)
+
+    def test_rejects_orders_for_deleted_flights(self):
+        booking = self.enqueue(self.users[0], (self.flights[1], 1, 1))
+        self.flights[1].delete()
+        call_command("process_bookings", "--once", stdout=StringIO())
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, BookingRequest.REJECTED)
+        self.assertFalse(Order.objects.exists())
+
+
+class PurgeExpiredCommandTests(TestCase):
+    def test_purges_only_expired_holds_and_keys(self):
+        airplane_type = AirplaneType.objects.create(name="Airbus")
+        airplane = Airplane.objects.create(
+            name="A320", rows=5, seats_in_row=4, airplane_type=airplane_type
+        )
+        source = Airport.objects.create(name="X", closest_big_city="CityX")
+        dest = Airport.objects.create(name="Y", closest_big_city="CityY")
+        route = Route.objects.create(source=source, destination=dest, distance=800)
+        flight = Flight.objects.create(
+            route=route, airplane=airplane, departure_time=now(), arrival_time=now()
+        )
+        user = User.objects.create_user(email="test@test.com", password="testpass")
+        SeatHold.objects.create(
+            flight=flight, user=user, row=1, seat=1, expires_at=now() - timedelta(minutes=1)
+        )
+        SeatHold.objects.create(
+            flight=flight, user=user, row=1, seat=2, expires_at=now() + timedelta(minutes=5)
+        )
+
+        for key, expires_at in (
+            ("old", now() - timedelta(minutes=1)),
+            ("new", now() + timedelta(hours=1)),
+        ):
+            IdempotencyKey.objects.create(
+                user=user, key=key, fingerprint="", expires_at=expires_at
+            )
+
+        call_command("purge_expired", stdout=StringIO())
+        self.assertEqual(list(SeatHold.objects.values_list("seat", flat=True)), [2])
+        self.assertEqual(list(IdempotencyKey.objects.values_list("key", flat=True)), ["new"])
+
+
+class ManagePartitionsCommandTests(TestCase):
+    def test_plans_future_and_expired_partitions(self):
+        attached = [date(2030, 1, 1), date(2030, 5, 1), date(2030, 6, 1)]
+        create, detach = plan_partitions(
+            attached, date(2030, 6, 15), months_ahead=2, retain_months=4
+        )
+        self.assertEqual(create, [date(2030, 7, 1), date(2030, 8, 1)])
+        self.assertEqual(detach, [date(2030, 1, 1)])
+        self.assertEqual(plan_partitions(attached, date(2030, 12, 1), 1)[0], [
+            date(2030, 12, 1), date(2031, 1, 1),
+        ])
+        self.assertEqual(plan_partitions(attached, date(2030, 6, 1), 0)[1], [])
+
+    def test_requires_partitioned_table(self):
+        with self.assertRaisesMessage(CommandError, "not partitioned"):
+            call_command("manage_partitions", stdout=StringIO())
+
+
+class BenchApiCommandTests(TestCase):
+    def bench(self, *args):
+        out = StringIO()
+        call_command(
+            "bench_api", "--existing-db", "--concurrency=1", "--requests=3",
+            "--warmup=0", "--flights=5", "--orders=5", *args, stdout=out,
+        )
+        return json.loads(out.getvalue())
+
+    def test_reports_every_scenario(self):
+        report = self.bench()
+        self.assertEqual(report["dataset"]["flights"], 5)
+        # Three booked directly, three through the queue.
+        self.assertEqual(Order.objects.count(), report["dataset"]["orders"] + 6)
+        queue = report["scenarios"]["orders-queued"]["queue"]
+        self.assertEqual((queue["booked"], queue["confirmed"], queue["in_order"]), (3, 3, 1.0))
+        for scenario, result in report["scenarios"].items():
+            self.assertEqual(result["requests"], 3, scenario)
+            self.assertEqual(result["errors"], 0, scenario)
+            self.assertLessEqual(
+                result["latency_ms"]["p50"], result["latency_ms"]["p99"]
+            )
+        self.assertEqual(report["scenarios"]["flights-list"]["queries"]["max"], 1)
+
+    def test_compare_fails_on_more_queries(self):
+        report = self.bench("--scenario=flights-list")
+        report["scenarios"]["flights-list"]["queries"]["mean"] = 0
+        # Only the query count is compared; latency varies from run to run.
+        report["scenarios"]["flights-list"]["latency_ms"]["p95"] = float("inf")
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as baseline:
+            json.dump(report, baseline)
+            baseline.flush()
+            with self.assertRaisesMessage(CommandError, "1 regression(s)"):
+                call_command(
+                    "bench_api", "--existing-db", "--no-seed", "--concurrency=1",
+                    "--requests=3", "--warmup=0", "--scenario=flights-list",
+                    "--email=seed0-0@example.com", "--password=seed-password",
+                    f"--compare={baseline.name}", stdout=StringIO(), stderr=StringIO(),
+                )
+
+
+class SeedAirportCommandTests(TestCase):
+    def seed(self, *args):
+        call_command(
+            "seed_airport", "--airports=6", "--airplanes=4", "--routes=10",
+            "--flights=30", "--orders=200", "--users=5", "--crews=4",
+            "--days=7", "--batch-size=8", *args, stdout=StringIO(),
+        )
+
+    def test_seeds_consistent_data(self):
+        self.seed()
+        self.assertEqual(Airport.objects.count(), 6)
+        self.assertEqual(Route.objects.count(), 10)
+        self.assertEqual(Flight.objects.count(), 30)
+        self.assertGreater(Order.objects.count(), 0)
+        for flight in Flight.objects.all():
+            self.assertEqual(flight.seats_taken, flight.tickets.count())
+            self.assertGreater(flight.arrival_time, flight.departure_time)
+        out = StringIO()
+        call_command("rebuild_seat_maps", "--check", stdout=out)
+        self.assertIn("up to date", out.getvalue())
+        call_command("rebuild_occupancy", "--check", stdout=StringIO())
+
+        documents = dict(OrderDocument.objects.values_list("order_id", "tickets"))
+        self.assertEqual(len(documents), Order.objects.count())
+        self.assertEqual(build_order_documents(list(documents)), documents)
+
+    def test_seeding_again_reuses_reference_data(self):
+        self.seed()
+        tickets = Ticket.objects.count()
+        self.seed()
+        self.assertEqual(Airport.objects.count(), 6)
+        self.assertEqual(Airplane.objects.count(), 4)
+        self.assertEqual(Route.objects.count(), 10)
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Flight.objects.count(), 60)
+        self.assertEqual(Ticket.objects.count(), tickets * 2)
+
+        flight = Flight.objects.get(pk=Flight.objects.create(
+            route=Route.objects.first(),
+            airplane=Airplane.objects.first(),
+            departure_time=now(),
+            arrival_time=now() + timedelta(hours=1),
+        ).pk)
+        self.assertEqual(flight.pk, Flight.objects.exclude(pk=flight.pk).latest("pk").pk + 1)
+
+    def test_rejects_a_single_airport(self):
+        with self.assertRaisesMessage(CommandError, "--airports must be at least 2"):
+            self.seed("--airports=1")
+
+
+class ImportScheduleCommandTests(TestCase):
+    def setUp(self):
+        airplane_type = AirplaneType.objects.create(name="Airbus")
+        self.airplane = Airplane.objects.create(
+            name="A320", rows=5, seats_in_row=4, airplane_type=airplane_type
+        )
+        source = Airport.objects.create(name="Kyiv", closest_big_city="Kyiv")
+        dest = Airport.objects.create(name="Lviv", closest_big_city="Lviv")
+        self.route = Route.objects.create(source=source, destination=dest, distance=500)
+
+    def import_schedule(self, content, suffix, *args):
+        with tempfile.NamedTemporaryFile("w", suffix=suffix) as schedule:
+            schedule.write(content)
+            schedule.flush()
+            out, err = StringIO(), StringIO()
+            try:
+                call_command(
+                    "import_schedule", schedule.name, "--chunk-size=2", *args,
+                    stdout=out, stderr=err,
+                )
+            finally:
+                self.output, self.errors = out.getvalue(), err.getvalue()
+
+    def test_imports_valid_rows_and_reports_the_rest(self):
+        content = (
+            "route,source,destination,airplane,departure_time,arrival_time\n"
+            f"{self.route.pk},,,A320,2030-01-01T10:00:00Z,2030-01-01T12:00:00Z\n"
+            f",kyiv,LVIV,{self.airplane.pk},2030-01-02T10:00:00Z,2030-01-02T12:00:00Z\n"
+            f"{self.route.pk},,,B737,2030-01-03T10:00:00Z,2030-01-03T12:00:00Z\n"
+            ",Kyiv,Odesa,A320,2030-01-03T10:00:00Z,2030-01-03T12:00:00Z\n"
+            f"{self.route.pk},,,A320,tomorrow,2030-01-03T12:00:00Z\n"
+            f"{self.route.pk},,,A320,2030-01-04T12:00:00Z,2030-01-04T10:00:00Z\n"
+            f"{self.route.pk},,,A320,2030-01-01T10:00:00Z,2030-01-01T12:00:00Z\n"
+        )
+        with self.assertRaisesMessage(CommandError, "5 row(s) rejected"):
+            self.import_schedule(content, ".csv")
+
+        self.assertEqual(Flight.objects.count(), 2)
+        self.assertIn("Imported 2 flight(s)", self.output)
+        self.assertIn("Chunk 4: 7 rows read", self.output)
+        self.assertIn("Line 4: airplane: Unknown airplane 'B737'.", self.errors)
+        self.assertIn("Line 5: route: No route from 'Kyiv' to 'Odesa'.", self.errors)
+        self.assertIn("Line 6: departure_time: Invalid datetime 'tomorrow'", self.errors)
+        self.assertIn("Line 7: arrival_time: Arrival must be after departure.", self.errors)
+        self.assertIn("Line 8: row: This flight is already scheduled.", self.errors)
+
+        flight = Flight.objects.get(departure_time="2030-01-02T10:00:00Z")
+        self.assertEqual((flight.route, flight.airplane), (self.route, self.airplane))
+        self.assertEqual(flight.seats_taken, 0)
+        self.assertEqual(flight.available_seats, 20)
+        self.assertEqual(RouteOccupancy.objects.filter(route=self.route).count(), 2)
+        call_command("rebuild_occupancy", "--check", stdout=StringIO())
+
+    def test_json_lines_dry_run(self):
+        content = (
+            f'{{"route": {self.route.pk}, "airplane": "a320", '
+            '"departure_time": "2030-01-01T10:00", "arrival_time": "2030-01-01T12:00"}\n'
+            "\n"
+            "not json\n"
+        )
+        with self.assertRaisesMessage(CommandError, "1 row(s) rejected"):
+            self.import_schedule(content, ".jsonl", "--dry-run")
+        self.assertIn("Would import 1 flight(s)", self.output)
+        self.assertIn("Line 3: row: Invalid JSON", self.errors)
+        self.assertFalse(Flight.objects.exists())
+
+        self.import_schedule(content.split("\n")[0], ".txt", "--format=jsonl")
+        self.assertEqual(Flight.objects.count(), 1)
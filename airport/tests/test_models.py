@@ -1,9 +1,12 @@
+from unittest import mock
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from airport.models import (
     Airport, Airplane, AirplaneType, Route,
-    Flight, Order, Ticket, Crew
+    Flight, Order, Ticket, Crew, RouteOccupancy
 )
+from airport.reservations import reserve_seats
 from django.utils.timezone import now, timedelta
 
 User = get_user_model()
@@ -70,4 +73,109 @@ class ModelTests(TestCase):
     def test_crew_full_name(self):
         crew = Crew.objects.create(first_name="Alice", last_name="Smith")
         self.assertEqual(crew.full_name, "Alice Smith")
-        self.assertEqual(str(crew), "Alice Smith")
\ No newline at end of file
+        self.assertEqual(str(crew), "Alice Smith")
+
+
+class SeatMapTests(TestCase):
+    def setUp(self):
+        airplane_type = AirplaneType.objects.create(name="Airbus")
+        self.airplane = Airplane.objects.create(
+            name="A320", rows=5, seats_in_row=4, airplane_type=airplane_type
+        )
+        source = Airport.objects.create(name="X", closest_big_city="CityX")
+        dest = Airport.objects.create(name="Y", closest_big_city="CityY")
+        route = Route.objects.create(source=source, destination=dest, distance=800)
+        self.flight = Flight.objects.create(
+            route=route,
+            airplane=self.airplane,
+            departure_time=now(),
+            arrival_time=now() + timedelta(hours=2)
+        )
+        user = User.objects.create_user(email="test@test.com", password="testpass")
+        self.order = Order.objects.create(user=user)
+
+    def test_ticket_create_and_delete_update_seat_map(self):
+        ticket = Ticket.objects.create(flight=self.flight, order=self.order, row=2, seat=3)
+        self.flight.refresh_from_db()
+        self.assertFalse(self.flight.is_seat_free(2, 3))
+        self.assertTrue(self.flight.is_seat_free(3, 2))
+        self.assertEqual(self.flight.seats_taken, 1)
+
+        ticket.delete()
+        self.flight.refresh_from_db()
+        self.assertTrue(self.flight.is_seat_free(2, 3))
+        self.assertEqual(self.flight.available_seats, 20)
+
+    def test_ticket_move_updates_seat_map(self):
+        ticket = Ticket.objects.create(flight=self.flight, order=self.order, row=1, seat=1)
+        ticket.seat = 4
+        ticket.save()
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.taken_seats_detail, [{"row": 1, "seat": 4}])
+
+    def test_ticket_follows_flight_departure(self):
+        ticket = Ticket.objects.create(flight=self.flight, order=self.order, row=1, seat=1)
+        self.assertEqual(ticket.departure_time, self.flight.departure_time)
+
+        self.flight.departure_time += timedelta(days=40)
+        self.flight.save()
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.departure_time, self.flight.departure_time)
+        self.assertEqual(list(Ticket.objects.for_flights([self.flight])), [ticket])
+        self.assertFalse(Ticket.objects.for_flights([]).exists())
+
+    def test_flight_properties_do_not_query_tickets(self):
+        Ticket.objects.create(flight=self.flight, order=self.order, row=5, seat=4)
+        flight = Flight.objects.select_related("airplane").get(pk=self.flight.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(flight.available_seats, 19)
+            self.assertEqual(flight.taken_seats_list, 1)
+            self.assertEqual(flight.taken_seats_detail, [{"row": 5, "seat": 4}])
+            self.assertFalse(flight.is_seat_free(5, 4))
+
+    def test_airplane_resize_rebuilds_seat_map(self):
+        Ticket.objects.create(flight=self.flight, order=self.order, row=2, seat=1)
+        self.airplane.seats_in_row = 6
+        self.airplane.save()
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.taken_seats_detail, [{"row": 2, "seat": 1}])
+
+    def test_airplane_change_rebuilds_seat_map(self):
+        Ticket.objects.create(flight=self.flight, order=self.order, row=2, seat=3)
+        self.flight.refresh_from_db()
+        version = self.flight.seats_version
+        wider = Airplane.objects.create(
+            name="A330", rows=10, seats_in_row=6, airplane_type=self.airplane.airplane_type
+        )
+        self.flight.airplane = wider
+        self.flight.save()
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.taken_seats_detail, [{"row": 2, "seat": 3}])
+        self.assertEqual(self.flight.seats_taken, 1)
+        self.assertGreater(self.flight.seats_version, version)
+
+    def test_airplane_resize_keeps_archived_flights(self):
+        Ticket.objects.create(flight=self.flight, order=self.order, row=2, seat=1)
+        # As if the flight's partition had been archived.
+        Ticket.objects.all()._raw_delete(Ticket.objects.db)
+        after_departure = self.flight.departure_time + timedelta(days=1)
+        with mock.patch("airport.signals.retained_since", return_value=after_departure):
+            self.airplane.seats_in_row = 6
+            self.airplane.save()
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.seats_taken, 1)
+        self.assertEqual(RouteOccupancy.objects.get().tickets, 1)
+
+    def test_reserved_tickets_take_the_locked_flights_departure(self):
+        loaded = Flight.objects.get(pk=self.flight.pk)
+        Flight.objects.filter(pk=self.flight.pk).update(
+            departure_time=self.flight.departure_time + timedelta(days=40)
+        )
+        ticket, = reserve_seats(
+            self.order.user, [Ticket(flight=loaded, order=self.order, row=1, seat=1)]
+        )
+        self.flight.refresh_from_db()
+        self.assertEqual(ticket.departure_time, self.flight.departure_time)
+        self.assertEqual(list(Ticket.objects.for_flights([self.flight])), [ticket])
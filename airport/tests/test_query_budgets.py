@@ -0,0 +1,283 @@
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from airport import query_budget
+from airport.models import (
+    BookingRequest,
+    Airport,
+    AirplaneType,
+    Airplane,
+    Route,
+    Crew,
+    Flight,
+    Order,
+    Ticket,
+)
+from airport.query_budget import (
+    QueryBudgetMiddleware,
+    QueryBudgetTestMixin,
+    get_query_budget,
+    iter_routes,
+)
+from airport.schedule_import import ScheduleImporter
+from airport.views import FlightViewSet
+
+User = get_user_model()
+
+URLCONFS = ("airport.urls", "user.urls")
+# DRF's browsable API root does not touch the database.
+EXEMPT = {"airport:api-root"}
+# djangorestframework-simplejwt 5.5.0 rotates refresh tokens through the
+# token_blacklist app, which is not installed, so refreshing fails.
+UNCHECKED = {("user:token_refresh", "post")}
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="user@example.com", password="testpass123")
+        self.admin = User.objects.create_superuser(email="admin@example.com", password="adminpass123")
+
+        self.airports = airports = [
+            Airport.objects.create(name=f"Airport {number}", closest_big_city=f"City {number}")
+            for number in range(4)
+        ]
+        self.airport = airports[3]
+        self.airplane_type = AirplaneType.objects.create(name="Boeing 737")
+        self.spare_airplane_type = AirplaneType.objects.create(name="Spare")
+        self.busy_airplane = airplane = Airplane.objects.create(
+            name="Airplane", rows=10, seats_in_row=6, airplane_type=self.airplane_type
+        )
+        self.airplane = Airplane.objects.create(
+            name="Spare airplane", rows=10, seats_in_row=6, airplane_type=self.airplane_type
+        )
+        self.routes = routes = [
+            Route.objects.create(source=airports[0], destination=airports[1], distance=500),
+            Route.objects.create(source=airports[1], destination=airports[2], distance=700),
+        ]
+        self.route = Route.objects.create(
+            source=airports[2], destination=airports[0], distance=900
+        )
+        crews = [Crew.objects.create(first_name=f"Crew {n}", last_name="Doe") for n in range(3)]
+        self.crew = crews[2]
+
+        flights = []
+        for day, route in enumerate(routes * 2, start=1):
+            flight = Flight.objects.create(
+                route=route,
+                airplane=airplane,
+                departure_time=f"2030-01-0{day}T10:00:00Z",
+                arrival_time=f"2030-01-0{day}T12:00:00Z",
+            )
+            flight.members.add(*crews[:2])
+            flights.append(flight)
+        self.flight = flights[0]
+        self.spare_flight = flights[3]
+
+        for user in (self.user, self.user, self.admin):
+            order = Order.objects.create(user=user)
+            for seat, flight in enumerate(flights[:3], start=1):
+                Ticket.objects.create(order=order, flight=flight, row=order.pk, seat=seat)
+        self.order = Order.objects.filter(user=self.user).first()
+        self.booking = BookingRequest.objects.create(
+            user=self.user,
+            flight=self.flight,
+            tickets=[{"flight": self.flight.pk, "row": 7, "seat": 1}],
+        )
+        self.spare_order = Order.objects.filter(user=self.user).last()
+
+        self.tokens = {
+            user: str(RefreshToken.for_user(user).access_token)
+            for user in (self.user, self.admin)
+        }
+
+    def requests(self):
+        """``(url name, args, method, data, user)`` covering every route."""
+        crud = [
+            ("airport:port", self.airport, {"name": "New", "closest_big_city": "City"}),
+            ("airport:airplanes-type", self.spare_airplane_type, {"name": "New"}),
+            (
+                "airport:airplanes",
+                self.airplane,
+                {"name": "New", "rows": 5, "seats_in_row": 4, "airplane_type": self.airplane_type.name},
+            ),
+            (
+                "airport:routes",
+                self.route,
+                {"source": self.airports[1].pk, "destination": self.airports[0].pk, "distance": 10},
+            ),
+            ("airport:crews", self.crew, {"first_name": "New", "last_name": "Crew"}),
+            (
+                "airport:flights",
+                self.spare_flight,
+                {
+                    "route": self.routes[1].pk,
+                    "airplane": self.busy_airplane.pk,
+                    "departure_time": "2030-02-01T10:00:00Z",
+                    "arrival_time": "2030-02-01T12:00:00Z",
+                },
+            ),
+        ]
+        requests = []
+        for name, obj, data in crud:
+            renamed = {**data, "name": "Renamed"} if "name" in data else data
+            requests += [
+                (f"{name}-list", [], "get", None, self.admin),
+                (f"{name}-list", [], "post", data, self.admin),
+                (f"{name}-detail", [obj.pk], "get", None, self.admin),
+                (f"{name}-detail", [obj.pk], "put", renamed, self.admin),
+                (f"{name}-detail", [obj.pk], "patch", renamed, self.admin),
+                (f"{name}-detail", [obj.pk], "delete", None, self.admin),
+            ]
+
+        seats = {"seats": [{"row": 9, "seat": 1}, {"row": 9, "seat": 2}]}
+        ticket = {"tickets": [{"flight": self.flight.pk, "row": 8, "seat": 1}]}
+        # The order is updated after the POST above has booked seat 8-1.
+        other_ticket = {"tickets": [{"flight": self.flight.pk, "row": 8, "seat": 2}]}
+        schedule = SimpleUploadedFile(
+            "schedule.csv",
+            f"route,airplane,departure_time,arrival_time\n"
+            f"{self.routes[0].pk},Airplane,2030-03-01T10:00Z,2030-03-01T12:00Z\n".encode(),
+        )
+        connections = "?" + urlencode(
+            {"source": "Airport 0", "destination": "Airport 2", "date": "2030-01-01"}
+        )
+        return requests + [
+            ("airport:flights-list", [], "get", "?count=true", self.user),
+            ("airport:flights-seatmap", [self.flight.pk], "get", None, self.user),
+            ("airport:flights-connections", [], "get", connections, self.user),
+            ("airport:flights-holds", [self.flight.pk], "post", seats, self.user),
+            ("airport:flights-holds", [self.flight.pk], "delete", seats, self.user),
+            ("airport:flights-import", [], "post", {"file": schedule}, self.admin),
+            ("airport:async-flights-list", [], "get", "?count=true", self.user),
+            ("airport:async-flights-detail", [self.flight.pk], "get", None, self.user),
+            ("airport:async-flights-seatmap", [self.flight.pk], "get", None, self.user),
+            ("airport:exports-orders", [], "get", "?format=csv", self.admin),
+            ("airport:exports-tickets", [], "get", "?format=jsonl&start=2020-01-01", self.admin),
+            ("airport:stats-occupancy", [], "get", "?group_by=route&start=2030-01-01", self.admin),
+            (
+                "airport:routes-calendar",
+                [self.routes[0].pk],
+                "get",
+                "?start=2029-12-15&end=2030-02-10",
+                self.user,
+            ),
+            ("airport:orders-list", [], "get", "?count=true", self.user),
+            ("airport:bookings-list", [], "get", None, self.user),
+            ("airport:bookings-detail", [self.booking.pk], "get", None, self.user),
+            ("airport:orders-list", [], "post", ticket, self.user),
+            ("airport:orders-detail", [self.order.pk], "get", None, self.user),
+            ("airport:orders-detail", [self.order.pk], "put", other_ticket, self.user),
+            ("airport:orders-detail", [self.order.pk], "patch", {}, self.user),
+            ("airport:orders-detail", [self.spare_order.pk], "delete", None, self.user),
+            (
+                "user:register", [], "post",
+                {"email": "new@example.com", "password": "newpass123"}, None,
+            ),
+            (
+                "user:token_obtain_pair", [], "post",
+                {"email": "user@example.com", "password": "testpass123"}, None,
+            ),
+            ("user:token_verify", [], "post", {"token": self.tokens[self.user]}, None),
+            ("user:me", [], "get", None, self.user),
+            ("user:me", [], "put", {"email": "user@example.com", "password": "pass12345"}, self.user),
+            ("user:me", [], "patch", {"email": "user@example.com"}, self.user),
+        ]
+
+    def test_every_route_declares_a_budget(self):
+        for urlconf in URLCONFS:
+            for name, view_func, method in iter_routes(urlconf):
+                if name not in EXEMPT:
+                    self.assertIsNotNone(
+                        get_query_budget(view_func, method), f"{method} {name}"
+                    )
+
+    def test_every_route_is_checked(self):
+        checked = {(name, method) for name, _, method, _, _ in self.requests()}
+        for urlconf in URLCONFS:
+            for name, _, method in iter_routes(urlconf):
+                if name not in EXEMPT and (name, method) not in UNCHECKED:
+                    self.assertIn((name, method), checked)
+
+    def test_routes_stay_within_budget(self):
+        for name, args, method, data, user in self.requests():
+            with self.subTest(name=name, method=method):
+                if user is None:
+                    self.client.credentials()
+                else:
+                    self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens[user]}")
+                path = reverse(name, args=args)
+                if isinstance(data, str):
+                    response = self.assertWithinQueryBudget(method, path + data)
+                else:
+                    uploads = data and any(hasattr(value, "read") for value in data.values())
+                    response = self.assertWithinQueryBudget(
+                        method, path, data=data, format="multipart" if uploads else "json"
+                    )
+                self.assertLess(response.status_code, 300, getattr(response, "data", None))
+
+    def test_middleware_counts_requests_over_budget(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens[self.user]}")
+        url = reverse("airport:flights-list")
+        view = "airport.views.FlightViewSet.list"
+
+        self.client.get(url)
+        self.assertEqual(query_budget.overruns[view], 0)
+
+        with (
+            mock.patch.dict(FlightViewSet.query_budgets, {"list": 0}),
+            self.assertLogs("airport.query_budget", "WARNING") as logs,
+        ):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(query_budget.overruns[view], 1)
+        self.assertIn("over the budget of 0", logs.output[0])
+        query_budget.overruns.clear()
+
+    def test_schedule_import_budget_grows_with_its_chunks(self):
+        class OneRowChunks(ScheduleImporter):
+            def __init__(self, **kwargs):
+                super().__init__(chunk_size=1, **kwargs)
+
+        rows = "".join(
+            f"{self.routes[0].pk},Airplane,2030-03-0{day}T10:00Z,2030-03-0{day}T12:00Z\n"
+            for day in range(1, 4)
+        )
+        schedule = SimpleUploadedFile(
+            "schedule.csv", f"route,airplane,departure_time,arrival_time\n{rows}".encode()
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens[self.admin]}")
+        with mock.patch("airport.views.ScheduleImporter", OneRowChunks):
+            response = self.assertWithinQueryBudget(
+                "post", reverse("airport:flights-import"), data={"file": schedule}
+            )
+        self.assertEqual(response.data["chunks"], 3)
+        self.assertEqual(query_budget.overruns["airport.views.FlightViewSet.import_schedule"], 0)
+
+    async def test_middleware_counts_queries_of_async_views(self):
+        async def get_response(request):
+            return HttpResponse(str([flight.pk async for flight in Flight.objects.all()]))
+
+        middleware = QueryBudgetMiddleware(get_response)
+        request = RequestFactory().get(reverse("airport:async-flights-list"))
+        request.resolver_match = resolve(request.path)
+        view = "airport.async_views.flight_list.get"
+
+        with (
+            mock.patch.dict(request.resolver_match.func.query_budgets, {"get": 0}),
+            self.assertLogs("airport.query_budget", "WARNING") as logs,
+        ):
+            await middleware(request)
+        self.assertEqual(query_budget.overruns[view], 1)
+        self.assertIn("ran 1 queries, over the budget of 0", logs.output[0])
+        query_budget.overruns.clear()
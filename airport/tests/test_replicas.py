@@ -0,0 +1,136 @@
+import json
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import now, timedelta
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport.models import Airplane, AirplaneType, Airport, Flight, Route
+from airport.checks import check_replica_pin_cache
+from airport.replicas import ReplicaMiddleware, ReplicaRouter, reading_from
+
+User = get_user_model()
+
+
+class ReplicaRouterTests(TransactionTestCase):
+    def test_routes_reads_to_the_current_alias(self):
+        replica_router = ReplicaRouter()
+        self.assertIsNone(replica_router.db_for_read(Flight))
+        with reading_from("replica_1"):
+            self.assertEqual(replica_router.db_for_read(Flight), "replica_1")
+            self.assertEqual(replica_router.db_for_write(Flight), DEFAULT_DB_ALIAS)
+            with transaction.atomic():
+                self.assertIsNone(replica_router.db_for_read(Flight))
+        self.assertIsNone(replica_router.db_for_read(Flight))
+        self.assertFalse(replica_router.allow_migrate("replica_1", "airport"))
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1"])
+class ReplicaMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaMiddleware(
+            lambda request: router.db_for_read(Flight)
+        )
+
+    def request(self, method, user_id=None, **headers):
+        if user_id is not None:
+            token = AccessToken()
+            token["user_id"] = user_id
+            headers["Authorization"] = f"Bearer {token}"
+        return self.middleware(getattr(self.factory, method)("/", headers=headers))
+
+    def test_reads_go_to_replicas_and_writes_to_the_primary(self):
+        self.assertEqual(self.request("get"), "replica_1")
+        self.assertEqual(self.request("head", user_id=1), "replica_1")
+        self.assertEqual(self.request("post", user_id=1), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.request("get", Authorization="Bearer garbage"), "replica_1")
+
+    def test_writers_read_from_the_primary_for_a_while(self):
+        self.request("post", user_id=1)
+        self.assertEqual(self.request("get", user_id=1), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.request("get", user_id=2), "replica_1")
+        self.assertEqual(self.request("get"), "replica_1")
+        cache.clear()
+        self.assertEqual(self.request("get", user_id=1), "replica_1")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_everything_goes_to_the_primary_without_replicas(self):
+        self.assertEqual(self.request("get"), DEFAULT_DB_ALIAS)
+
+    async def test_async_requests(self):
+        async def get_response(request):
+            return router.db_for_read(Flight)
+
+        middleware = ReplicaMiddleware(get_response)
+        token = AccessToken()
+        token["user_id"] = 1
+        headers = {"Authorization": f"Bearer {token}"}
+        self.assertEqual(await middleware(self.factory.get("/", headers=headers)), "replica_1")
+        self.assertEqual(await middleware(self.factory.post("/", headers=headers)), DEFAULT_DB_ALIAS)
+        self.assertEqual(await middleware(self.factory.get("/", headers=headers)), DEFAULT_DB_ALIAS)
+
+    def test_replicas_need_a_shared_cache(self):
+        for backend, errors in (("locmem.LocMemCache", ["airport.E001"]), ("redis.RedisCache", [])):
+            caches = {"default": {"BACKEND": f"django.core.cache.backends.{backend}"}}
+            with override_settings(CACHES=caches):
+                self.assertEqual([error.id for error in check_replica_pin_cache(None)], errors)
+
+
+@skipUnless(settings.DATABASE_REPLICAS, "set POSTGRES_REPLICA_HOSTS to test with replicas")
+class ReplicaRoutingTests(TransactionTestCase):
+    """End to end, with replicas mirroring the test database."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        cache.clear()
+        airplane_type = AirplaneType.objects.create(name="Airbus")
+        airplane = Airplane.objects.create(
+            name="A320", rows=5, seats_in_row=4, airplane_type=airplane_type
+        )
+        source = Airport.objects.create(name="X", closest_big_city="CityX")
+        dest = Airport.objects.create(name="Y", closest_big_city="CityY")
+        route = Route.objects.create(source=source, destination=dest, distance=800)
+        self.flight = Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time=now() + timedelta(days=1),
+            arrival_time=now() + timedelta(days=1, hours=2),
+        )
+        self.user = User.objects.create_user(email="user@test.com", password="testpass")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def queries(self, method, url, data=None):
+        """Queries ``method url`` ran on the primary and on the replicas."""
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary:
+            with CaptureQueriesContext(connections[settings.DATABASE_REPLICAS[0]]) as replica:
+                response = self.client.generic(
+                    method.upper(), url, data and json.dumps(data), "application/json"
+                )
+        self.assertLess(response.status_code, 300, response.content)
+        return len(primary), len(replica)
+
+    @override_settings(DATABASE_REPLICAS=settings.DATABASE_REPLICAS[:1])
+    def test_new_orders_are_read_from_the_primary(self):
+        primary, replica = self.queries("get", reverse("airport:flights-list"))
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+        order = {"tickets": [{"flight": self.flight.pk, "row": 1, "seat": 1}]}
+        primary, replica = self.queries("post", reverse("airport:orders-list"), order)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+        primary, replica = self.queries("get", reverse("airport:orders-list"))
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
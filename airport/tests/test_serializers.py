@@ -1,7 +1,11 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.utils.timezone import now, timedelta
+from rest_framework.renderers import JSONRenderer
+
 from airport.models import *
+from airport.renderers import ORJSONRenderer
+from airport.rows import FLIGHT_LIST_ROW, FLIGHT_RETRIEVE_ROW, ROUTE_DETAIL_ROW, ROUTE_LIST_ROW
 from airport.serializers import *
 
 User = get_user_model()
@@ -85,4 +89,87 @@ class SerializerTestCase(TestCase):
         crew = Crew.objects.create(first_name="John", last_name="Doe")
         serializer = CrewSerializer(instance=crew)
         self.assertEqual(serializer.data["first_name"], "John")
-        self.assertEqual(serializer.data["last_name"], "Doe")
\ No newline at end of file
+        self.assertEqual(serializer.data["last_name"], "Doe")
+
+    def test_order_serializer_rejects_duplicate_seats(self):
+        data = {
+            "tickets": [
+                {"row": 2, "seat": 3, "flight": self.flight.id},
+                {"row": 2, "seat": 3, "flight": self.flight.id},
+            ]
+        }
+        serializer = OrderSerializer(data=data)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("tickets", serializer.errors)
+
+    def test_order_serializer_query_count_does_not_grow_with_tickets(self):
+        def create_order(seats):
+            data = {
+                "tickets": [
+                    {"row": row, "seat": seat, "flight": self.flight.id}
+                    for row, seat in seats
+                ]
+            }
+            serializer = OrderSerializer(data=data)
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            serializer.save(user=self.user)
+
+        # The last query writes the order document.
+        with self.assertNumQueries(10):
+            create_order([(1, 1)])
+        with self.assertNumQueries(10):
+            create_order([(row, seat) for row in range(2, 6) for seat in range(1, 5)])
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.available_seats, 3)
+        self.assertEqual(Ticket.objects.count(), 17)
+
+
+class RowMapperTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(email="test@test.com", password="testpass")
+        airport1 = Airport.objects.create(name="Київ Boryspil ", closest_big_city="Київ")
+        airport2 = Airport.objects.create(name='Ölands "Borg"', closest_big_city="C2")
+        airplane_type = AirplaneType.objects.create(name="TypeX")
+        airplane = Airplane.objects.create(
+            name="Plane1", rows=5, seats_in_row=4, airplane_type=airplane_type
+        )
+        self.route = Route.objects.create(source=airport1, destination=airport2, distance=500)
+        self.flight = Flight.objects.create(
+            route=self.route,
+            airplane=airplane,
+            departure_time=now().replace(microsecond=123456),
+            arrival_time=now().replace(microsecond=0) + timedelta(hours=2),
+        )
+        self.flight.members.add(
+            Crew.objects.create(first_name="John", last_name="Doe"),
+            Crew.objects.create(first_name="Jane", last_name="Roe"),
+        )
+        order = Order.objects.create(user=user)
+        Ticket.objects.create(row=2, seat=3, flight=self.flight, order=order)
+        Ticket.objects.create(row=5, seat=1, flight=self.flight, order=order)
+
+    def assertSameBytes(self, serializer_data, rows):
+        self.assertEqual(JSONRenderer().render(serializer_data), ORJSONRenderer().render(rows))
+
+    def test_flight_rows_match_serializers(self):
+        flights = Flight.objects.with_availability()
+        self.assertSameBytes(
+            FlightListSerializer(flights, many=True).data,
+            FLIGHT_LIST_ROW.map(flights.values(*FLIGHT_LIST_ROW.columns)),
+        )
+        self.assertSameBytes(
+            FlightRetrieveSerializer(flights.get()).data,
+            FLIGHT_RETRIEVE_ROW(flights.values(*FLIGHT_RETRIEVE_ROW.columns).get()),
+        )
+
+    def test_route_rows_match_serializers(self):
+        routes = Route.objects.all()
+        self.assertSameBytes(
+            RouteListSerializer(routes, many=True).data,
+            ROUTE_LIST_ROW.map(routes.values(*ROUTE_LIST_ROW.columns)),
+        )
+        self.assertSameBytes(
+            RouteDetailSerializer(self.route).data,
+            ROUTE_DETAIL_ROW(routes.values(*ROUTE_DETAIL_ROW.columns).get()),
+        )
@@ -41,4 +41,4 @@ class TestUrls(APITestCase):
 
     def test_url_patterns_count(self):
         from airport.urls import router
-        self.assertEqual(len(router.registry), 7)
\ No newline at end of file
+        self.assertEqual(len(router.registry), 8)
\ No newline at end of file
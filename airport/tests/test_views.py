@@ -1,24 +1,46 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from airport.models import (
+    BookingRequest,
     Airport,
     AirplaneType,
     Airplane,
     Route,
     Crew,
     Flight,
+    IdempotencyKey,
     Order,
+    OrderDocument,
+    SeatHold,
     Ticket
 )
+from airport import availability
+from airport.caching import cache_is_shared
+from airport.query_budget import QueryBudgetTestMixin
+from airport.serializers import OrderListSerializer, OrderRetrieveSerializer
+from airport.views import OrderViewSet
 
 User = get_user_model()
 
 
-class AirportAPITests(APITestCase):
+class AirportAPITests(QueryBudgetTestMixin, APITestCase):
     def setUp(self):
         self.client = APIClient()
         self.user = User.objects.create_user(
@@ -339,6 +361,96 @@ class AirportAPITests(APITestCase):
         self.assertEqual(Order.objects.count(), 2)
         self.assertEqual(Ticket.objects.count(), 2)
 
+    def test_order_update_replaces_tickets(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        url = reverse("airport:orders-detail", args=[self.order.id])
+        data = {"tickets": [{"row": 3, "seat": 4, "flight": self.flight.id}]}
+        response = self.client.put(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(self.order.tickets.values_list("row", "seat")), [(3, 4)]
+        )
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.seats_taken, 1)
+
+        response = self.client.get(url)
+        self.assertEqual(
+            [(ticket["row"], ticket["seat"]) for ticket in response.data["tickets"]], [(3, 4)]
+        )
+
+    def test_order_create_with_idempotency_key_replays_the_first_response(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        url = reverse("airport:orders-list")
+        data = {"tickets": [{"row": 2, "seat": 2, "flight": self.flight.id}]}
+
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.post(url, data, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertLessEqual(len(queries), OrderViewSet.query_budgets["create"])
+
+        with self.assertNumQueries(1):
+            replay = self.client.post(url, data, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+        self.assertEqual(replay.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 2)
+
+        other = {"tickets": [{"row": 3, "seat": 3, "flight": self.flight.id}]}
+        response = self.client.post(url, other, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        # Keys are per user.
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.admin_token}')
+        response = self.client.post(url, other, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 3)
+
+        # Failures are not stored, so the key can be retried.
+        response = self.client.post(url, other, format="json", HTTP_IDEMPOTENCY_KEY="taken")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.filter(key="taken").exists())
+
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        response = self.client.post(url, other, format="json", HTTP_IDEMPOTENCY_KEY="abc")
+        # Ran again: the seat has been sold to the admin since.
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("tickets", response.json())
+
+    @override_settings(BOOKING_QUEUE=True)
+    def test_queued_order_create(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        data = {"tickets": [{"row": 2, "seat": 2, "flight": self.flight.id}]}
+        response = self.client.post(
+            reverse("airport:orders-list"), data, format="json", HTTP_IDEMPOTENCY_KEY="queued"
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.json()["status"], "pending")
+        self.assertEqual(response["Location"], response.json()["url"])
+        self.assertEqual(Order.objects.count(), 1)
+
+        replay = self.client.post(
+            reverse("airport:orders-list"), data, format="json", HTTP_IDEMPOTENCY_KEY="queued"
+        )
+        self.assertEqual(replay.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertEqual(replay["Location"], response["Location"])
+        self.assertEqual(BookingRequest.objects.count(), 1)
+
+        invalid = {"tickets": [{"row": 99, "seat": 2, "flight": self.flight.id}]}
+        response = self.client.post(reverse("airport:orders-list"), invalid, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        url = reverse("airport:bookings-detail", args=[BookingRequest.objects.get().pk])
+        self.assertEqual(len(self.client.get(reverse("airport:bookings-list")).json()["results"]), 1)
+        call_command("process_bookings", "--once", stdout=io.StringIO())
+        booking = self.client.get(url).json()
+        self.assertEqual(booking["status"], "confirmed")
+        self.assertEqual(Order.objects.get(pk=booking["order"]).tickets.get().seat, 2)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.admin_token}')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
     def test_order_list_unauthenticated(self):
         url = reverse("airport:orders-list")
         response = self.client.get(url)
@@ -353,4 +465,653 @@ class AirportAPITests(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {new_user_token}')
         url = reverse("airport:orders-detail", args=[self.order.id])
         response = self.client.get(url)
-        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_flight_list_query_count_is_constant(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        url = reverse("airport:flights-list")
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+        for day in range(2, 6):
+            flight = Flight.objects.create(
+                route=self.route,
+                airplane=self.airplane,
+                departure_time=f"2023-01-0{day}T10:00:00Z",
+                arrival_time=f"2023-01-0{day}T12:00:00Z"
+            )
+            for seat in range(1, 7):
+                Ticket.objects.create(row=2, seat=seat, flight=flight, order=self.order)
+
+        # The user is cached by now, so only the page is queried.
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        data = response.data["results"]
+        self.assertEqual(len(data), 5)
+        self.assertEqual(sorted(flight["taken_seats"] for flight in data), [1, 6, 6, 6, 6])
+        self.assertEqual(sorted(flight["available_seats"] for flight in data), [54, 54, 54, 54, 59])
+
+    def test_flight_detail_reports_this_flights_seats(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        url = reverse("airport:flights-detail", args=[self.flight.id])
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.data["available_seats"], 59)
+        self.assertEqual(response.data["taken_seats"], [{"row": 1, "seat": 1}])
+
+    def test_flight_seatmap_encodings(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        Ticket.objects.create(row=1, seat=2, flight=self.flight, order=self.order)
+        url = reverse("airport:flights-seatmap", args=[self.flight.id])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["taken_seats"],
+            [{"row": 1, "seat": 1}, {"row": 1, "seat": 2}]
+        )
+
+        response = self.client.get(url, {"encoding": "rows"})
+        self.assertEqual(response.data["taken_seats"][0], "110000")
+        self.assertEqual(len(response.data["taken_seats"]), 10)
+
+        response = self.client.get(url, {"encoding": "runs"})
+        self.assertEqual(response.data["taken_seats"], [[1, 2], [0, 58]])
+
+        response = self.client.get(url, {"encoding": "bogus"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_flight_seatmap_etag(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        url = reverse("airport:flights-seatmap", args=[self.flight.id])
+
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Ticket.objects.create(row=3, seat=3, flight=self.flight, order=self.order)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_order_create_rejects_taken_seat(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        url = reverse("airport:orders-list")
+        data = {"tickets": [{"row": 1, "seat": 1, "flight": self.flight.id}]}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_seat_hold_blocks_other_customers(self):
+        url = reverse("airport:flights-holds", args=[self.flight.id])
+        seats = {"seats": [{"row": 2, "seat": 2}]}
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.admin_token}')
+        response = self.client.post(url, seats, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data[0]["row"], 2)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        response = self.client.post(url, seats, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        order = {"tickets": [{"row": 2, "seat": 2, "flight": self.flight.id}]}
+        response = self.client.post(reverse("airport:orders-list"), order, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("taken_seats", response.data)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.admin_token}')
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        response = self.client.post(reverse("airport:orders-list"), order, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_order_confirms_own_seat_hold(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        url = reverse("airport:flights-holds", args=[self.flight.id])
+        self.client.post(url, {"seats": [{"row": 3, "seat": 1}]}, format="json")
+        self.assertEqual(SeatHold.objects.count(), 1)
+
+        order = {"tickets": [{"row": 3, "seat": 1, "flight": self.flight.id}]}
+        response = self.client.post(reverse("airport:orders-list"), order, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(SeatHold.objects.count(), 0)
+
+    def test_flight_search(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        airport3 = Airport.objects.create(name="Test Airport 3", closest_big_city="Test City 3")
+        other_route = Route.objects.create(source=self.airport2, destination=airport3, distance=300)
+        later = Flight.objects.create(
+            route=other_route,
+            airplane=self.airplane,
+            departure_time="2023-01-03T08:00:00Z",
+            arrival_time="2023-01-03T09:00:00Z"
+        )
+        url = reverse("airport:flights-list")
+
+        def ids(params):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+            return [flight["id"] for flight in response.data["results"]]
+
+        self.assertEqual(ids({"source": self.airport1.id}), [self.flight.id])
+        self.assertEqual(ids({"source": "test airport 2", "destination": airport3.id}), [later.id])
+        self.assertEqual(ids({"date": "2023-01-03"}), [later.id])
+        self.assertEqual(ids({"departure_after": "2023-01-02", "departure_before": "2023-01-04"}), [later.id])
+        self.assertEqual(ids({"min_seats": 60}), [later.id])
+        self.assertEqual(ids({}), [self.flight.id, later.id])
+
+        response = self.client.get(url, {"date": "01.03.2023", "min_seats": "many"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("date", response.data)
+        self.assertIn("min_seats", response.data)
+
+    def test_flight_connections(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        url = reverse("airport:flights-connections")
+        params = {"source": self.airport1.id, "destination": "test airport 2", "date": "2023-01-01"}
+        # Flights that have departed are not searched.
+        self.assertEqual(self.client.get(url, params).data, [])
+
+        self.flight.departure_time = datetime(2030, 1, 1, 10, tzinfo=dt_timezone.utc)
+        self.flight.arrival_time = datetime(2030, 1, 1, 12, tzinfo=dt_timezone.utc)
+        self.flight.save()
+        airport3 = Airport.objects.create(name="Test Airport 3", closest_big_city="Test City 3")
+        onward = Route.objects.create(source=self.airport2, destination=airport3, distance=300)
+        direct = Route.objects.create(source=self.airport1, destination=airport3, distance=900)
+        too_tight = Flight.objects.create(
+            route=onward,
+            airplane=self.airplane,
+            departure_time="2030-01-01T12:30:00Z",
+            arrival_time="2030-01-01T13:30:00Z"
+        )
+        connecting = Flight.objects.create(
+            route=onward,
+            airplane=self.airplane,
+            departure_time="2030-01-01T14:00:00Z",
+            arrival_time="2030-01-01T15:00:00Z"
+        )
+        params = {"source": self.airport1.id, "destination": "test airport 3", "date": "2030-01-01"}
+
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        itinerary = response.data[0]
+        self.assertEqual(
+            [leg["flight"] for leg in itinerary["legs"]],
+            [self.flight.id, connecting.id]
+        )
+        self.assertEqual(itinerary["duration"], 300)
+        self.assertEqual(itinerary["distance"], 800)
+        self.assertEqual(itinerary["legs"][1]["departure"], "Test Airport 2")
+
+        response = self.client.get(url, {**params, "min_connection": 15})
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0]["legs"][1]["flight"], too_tight.id)
+
+        nonstop = Flight.objects.create(
+            route=direct,
+            airplane=self.airplane,
+            departure_time="2030-01-01T18:00:00Z",
+            arrival_time="2030-01-01T20:00:00Z"
+        )
+        response = self.client.get(url, {**params, "order_by": "distance"})
+        self.assertEqual(response.data[0]["legs"][0]["flight"], self.flight.id)
+        response = self.client.get(url, params)
+        self.assertEqual([leg["flight"] for leg in response.data[0]["legs"]], [nonstop.id])
+
+        self.assertNotIn("Search-Truncated", response)
+        with mock.patch("airport.connections.MAX_PATHS", 1):
+            response = self.client.get(url, params)
+        self.assertEqual(response.data, [])
+        self.assertEqual(response["Search-Truncated"], "true")
+
+        response = self.client.get(url, {**params, "source": "Nowhere"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Losing the version from the cache must not let an older index pass
+        # for the current one.
+        cache.clear()
+        Airport.objects.create(name="P", closest_big_city="City P")
+        self.client.get(url, params)
+        cache.clear()
+        Airport.objects.create(name="Q", closest_big_city="City Q")
+        response = self.client.get(url, {**params, "source": "Q"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_flight_cursor_pagination(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        for day in range(2, 9):
+            Flight.objects.create(
+                route=self.route,
+                airplane=self.airplane,
+                departure_time=f"2023-01-0{day}T10:00:00Z",
+                arrival_time=f"2023-01-0{day}T12:00:00Z"
+            )
+        url = reverse("airport:flights-list")
+
+        response = self.client.get(url, {"page_size": 3})
+        self.assertNotIn("count", response.data)
+        seen = [flight["id"] for flight in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            seen += [flight["id"] for flight in response.data["results"]]
+
+        expected = list(
+            Flight.objects.order_by("departure_time", "id").values_list("id", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+        # Flights sharing a departure time are told apart by id, and the
+        # previous links lead back through the same pages.
+        for _ in range(4):
+            Flight.objects.create(
+                route=self.route,
+                airplane=self.airplane,
+                departure_time="2023-01-05T10:00:00Z",
+                arrival_time="2023-01-05T12:00:00Z"
+            )
+        expected = list(
+            Flight.objects.order_by("departure_time", "id").values_list("id", flat=True)
+        )
+        pages = [self.client.get(url, {"page_size": 2}).data]
+        with CaptureQueriesContext(connection) as queries:
+            while pages[-1]["next"]:
+                pages.append(self.client.get(pages[-1]["next"]).data)
+        self.assertFalse([query for query in queries if "OFFSET" in query["sql"]])
+        self.assertEqual(
+            [flight["id"] for page in pages for flight in page["results"]], expected
+        )
+        back = [pages[-1]]
+        while back[-1]["previous"]:
+            back.append(self.client.get(back[-1]["previous"]).data)
+        self.assertEqual(
+            [[flight["id"] for flight in page["results"]] for page in reversed(back)],
+            [[flight["id"] for flight in page["results"]] for page in pages],
+        )
+        response = self.client.get(url, {"cursor": "cD1ub25zZW5zZQ=="})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(url, {"count": "true"})
+        self.assertEqual(response.data["count"], 12)
+        self.assertEqual(len(response.data["results"]), 5)
+
+    def test_async_flight_endpoints_match_sync(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        Flight.objects.create(
+            route=self.route,
+            airplane=self.airplane,
+            departure_time="2023-01-02T10:00:00Z",
+            arrival_time="2023-01-02T12:00:00Z"
+        )
+        pages = [
+            ("airport:flights-list", "airport:async-flights-list", [], {"page_size": 1}),
+            (
+                "airport:flights-list",
+                "airport:async-flights-list",
+                [],
+                {"page_size": 1, "count": "true"},
+            ),
+            ("airport:flights-list", "airport:async-flights-list", [], {"date": "2023-01-02"}),
+            ("airport:flights-detail", "airport:async-flights-detail", [self.flight.id], {}),
+            (
+                "airport:flights-seatmap",
+                "airport:async-flights-seatmap",
+                [self.flight.id],
+                {"encoding": "runs"},
+            ),
+        ]
+        for sync_name, async_name, args, params in pages:
+            expected = self.client.get(reverse(sync_name, args=args), params)
+            response = self.client.get(reverse(async_name, args=args), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            # Same body, except that page links point at the async URLs.
+            self.assertEqual(
+                response.content.replace(b"/async/flights/", b"/flights/"),
+                expected.content,
+            )
+
+        url = reverse("airport:async-flights-seatmap", args=[self.flight.id])
+        response = self.client.get(
+            url, {"encoding": "runs"}, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(url, {"encoding": "bits"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("encoding", response.json())
+
+        response = self.client.get(reverse("airport:async-flights-detail", args=[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.credentials()
+        response = self.client.get(reverse("airport:async-flights-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", response)
+
+    def test_order_list_newest_first(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        newer = Order.objects.create(user=self.user)
+        response = self.client.get(reverse("airport:orders-list"))
+        self.assertEqual(
+            [order["id"] for order in response.data["results"]],
+            [newer.id, self.order.id]
+        )
+
+    def test_orders_are_served_from_documents(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        list_url = reverse("airport:orders-list")
+        response = self.client.post(
+            list_url,
+            {"tickets": [
+                {"row": 3, "seat": 2, "flight": self.flight.id},
+                {"row": 3, "seat": 1, "flight": self.flight.id},
+            ]},
+            format="json",
+        )
+        created = Order.objects.get(pk=response.data["id"])
+        self.assertTrue(OrderDocument.objects.filter(order=created).exists())
+
+        def check_matches_serializers():
+            # Same keys in the same order as the serializers render.
+            orders = Order.objects.order_by("-created_at", "-id")
+            response = self.client.get(list_url)
+            self.assertEqual(
+                json.dumps(response.json()["results"]),
+                json.dumps(OrderListSerializer(orders, many=True).data),
+            )
+            for order in orders:
+                response = self.client.get(reverse("airport:orders-detail", args=[order.id]))
+                self.assertEqual(
+                    json.dumps(response.json()), json.dumps(OrderRetrieveSerializer(order).data)
+                )
+
+        check_matches_serializers()
+        with self.assertNumQueries(1):
+            self.client.get(list_url)
+        with self.assertNumQueries(2):
+            self.client.get(reverse("airport:orders-detail", args=[created.id]))
+
+        # Editing what a document shows drops it until the next read.
+        with (
+            mock.patch("airport.documents.DROP_BATCH_SIZE", 1),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            self.airport1.name = "Renamed Airport"
+            self.airport1.save()
+            # Dropped once the rename commits.
+            self.assertEqual(OrderDocument.objects.count(), 2)
+        self.assertFalse(OrderDocument.objects.exists())
+        check_matches_serializers()
+        self.assertEqual(OrderDocument.objects.count(), 2)
+
+        Ticket.objects.create(row=5, seat=5, flight=self.flight, order=self.order)
+        check_matches_serializers()
+        Ticket.objects.filter(row=5).delete()
+        check_matches_serializers()
+        self.assertEqual(OrderDocument.objects.count(), 2)
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0)
+    def test_flight_schedule_import(self):
+        url = reverse("airport:flights-import")
+        lines = [
+            json.dumps({
+                "source": "Test Airport 1",
+                "destination": "Test Airport 2",
+                "airplane": "Test Airplane",
+                "departure_time": f"2030-05-{day:02}T08:00:00Z",
+                "arrival_time": f"2030-05-{day:02}T09:30:00Z",
+            })
+            for day in range(1, 29)
+        ]
+        lines.append(json.dumps({"route": 0, "airplane": "Test Airplane"}))
+
+        def upload(name="schedule.jsonl", **data):
+            return self.client.post(
+                url,
+                {"file": SimpleUploadedFile(name, "\n".join(lines).encode()), **data},
+                format="multipart",
+            )
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        self.assertEqual(upload().status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.admin_token}')
+        response = upload("schedule.txt")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("file_format", response.data)
+
+        response = upload()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {key: response.data[key] for key in ("rows", "created", "rejected", "chunks")},
+            {"rows": 29, "created": 28, "rejected": 1, "chunks": 1},
+        )
+        self.assertEqual(response.data["errors"][0]["line"], 29)
+        self.assertEqual(
+            set(response.data["errors"][0]["errors"]),
+            {"route", "departure_time", "arrival_time"},
+        )
+        self.assertEqual(Flight.objects.filter(route=self.route).count(), 29)
+
+        # The connection search sees the new flights.
+        response = self.client.get(
+            reverse("airport:flights-connections"),
+            {"source": "Test Airport 1", "destination": "Test Airport 2", "date": "2030-05-03"},
+        )
+        self.assertEqual(len(response.data), 1)
+
+        response = upload(dry_run="true")
+        self.assertEqual(response.data["created"], 0)
+        self.assertEqual(response.data["rejected"], 29)
+
+    def test_booking_exports(self):
+        Ticket.objects.create(row=1, seat=2, flight=self.flight, order=self.order)
+        Order.objects.filter(pk=self.order.pk).update(created_at="2030-01-15T09:00:00Z")
+        other = Order.objects.create(user=self.admin)
+        Order.objects.filter(pk=other.pk).update(created_at="2030-01-16T09:00:00Z")
+        url = reverse("airport:exports-tickets")
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        self.assertEqual(
+            self.client.get(url, {"format": "csv"}).status_code, status.HTTP_403_FORBIDDEN
+        )
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.admin_token}')
+        response = self.client.get(url, {"format": "csv", "start": "2030-01-15"})
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn('filename="tickets.csv"', response["Content-Disposition"])
+        rows = list(csv.DictReader(io.StringIO(response.getvalue().decode())))
+        self.assertEqual(
+            [row["ticket"] for row in rows], [str(self.ticket.id), str(self.ticket.id + 1)]
+        )
+        self.assertEqual(rows[0]["user"], "testuser@example.com")
+        self.assertEqual(rows[0]["booked_at"], "2030-01-15T09:00:00Z")
+        self.assertEqual(rows[0]["departure"], "Test Airport 1")
+        self.assertEqual(rows[0]["departure_time"], "2023-01-01T10:00:00Z")
+        self.assertEqual(rows[0]["airplane_type"], "Boeing 737")
+
+        response = self.client.get(url, {"format": "csv", "end": "2030-01-14"})
+        self.assertEqual(response.getvalue().decode().count("\n"), 1)
+
+        response = self.client.get(
+            reverse("airport:exports-orders"), {"format": "jsonl", "start": "2030-01-01"}
+        )
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        orders = [json.loads(line) for line in response.getvalue().splitlines()]
+        self.assertEqual(orders, [
+            {
+                "order": self.order.id,
+                "booked_at": "2030-01-15T09:00:00Z",
+                "user": "testuser@example.com",
+                "tickets": 2,
+                "first_departure_time": "2023-01-01T10:00:00Z",
+            },
+            {
+                "order": other.id,
+                "booked_at": "2030-01-16T09:00:00Z",
+                "user": "admin@example.com",
+                "tickets": 0,
+                "first_departure_time": None,
+            },
+        ])
+
+        response = self.client.get(
+            url, {"format": "jsonl", "start": "2030-01-15", "end": "2030-01-01"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("end", response.json())
+
+    async def test_booking_exports_stream_asynchronously_under_asgi(self):
+        response = await self.async_client.get(
+            reverse("airport:exports-tickets"),
+            {"format": "jsonl"},
+            headers={"Authorization": f"Bearer {self.admin_token}"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        lines = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(json.loads(b"".join(lines))["ticket"], self.ticket.id)
+
+    def test_route_calendar(self):
+        cache.clear()
+        Flight.objects.create(
+            route=self.route,
+            airplane=Airplane.objects.create(
+                name="Small", rows=2, seats_in_row=2, airplane_type=self.airplane_type
+            ),
+            departure_time="2023-01-01T07:30:00Z",
+            arrival_time="2023-01-01T09:30:00Z",
+        )
+        url = reverse("airport:routes-calendar", args=[self.route.id])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+
+        response = self.assertWithinQueryBudget("get", f"{url}?start=2022-12-31&end=2023-01-02")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [
+            {
+                "day": "2022-12-31",
+                "flights": 0,
+                "first_departure": None,
+                "free_seats": 0,
+                "max_free_seats": 0,
+            },
+            {
+                "day": "2023-01-01",
+                "flights": 2,
+                "first_departure": "2023-01-01T07:30:00Z",
+                "free_seats": 59 + 4,
+                "max_free_seats": 59,
+            },
+            {
+                "day": "2023-01-02",
+                "flights": 0,
+                "first_departure": None,
+                "free_seats": 0,
+                "max_free_seats": 0,
+            },
+        ])
+
+        # Both months are cached now; a booking drops January's.
+        with self.assertNumQueries(1):
+            self.client.get(url, {"start": "2022-12-31", "end": "2023-01-02"})
+        data = {"tickets": [{"row": 5, "seat": 5, "flight": self.flight.id}]}
+        self.client.post(reverse("airport:orders-list"), data, format="json")
+        response = self.client.get(url, {"start": "2023-01-01", "end": "2023-01-01"})
+        self.assertEqual(response.json()[0]["free_seats"], 58 + 4)
+
+        # Months dropped all at once stay dropped when the generation is evicted.
+        Flight.objects.filter(pk=self.flight.pk).update(seats_taken=3)
+        availability.touch_calendars()
+        cache.delete(availability._GENERATION_KEY)
+        response = self.client.get(url, {"start": "2023-01-01", "end": "2023-01-01"})
+        self.assertEqual(response.json()[0]["free_seats"], 57 + 4)
+
+        response = self.client.get(url, {"start": "2023-01-01", "end": "2023-06-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        missing = reverse("airport:routes-calendar", args=[self.route.id + 100])
+        self.assertEqual(self.client.get(missing).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_occupancy_stats(self):
+        Ticket.objects.create(row=1, seat=2, flight=self.flight, order=self.order)
+        other_type = AirplaneType.objects.create(name="Airbus A320")
+        Flight.objects.create(
+            route=self.route,
+            airplane=Airplane.objects.create(
+                name="Other", rows=5, seats_in_row=4, airplane_type=other_type
+            ),
+            departure_time="2023-01-02T10:00:00Z",
+            arrival_time="2023-01-02T12:00:00Z",
+        )
+        url = reverse("airport:stats-occupancy")
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.admin_token}')
+        response = self.client.get(url)
+        self.assertEqual(response.json(), [
+            {
+                "route": self.route.id,
+                "airplane_type": self.airplane_type.id,
+                "day": "2023-01-01",
+                "flights": 1,
+                "seats": 60,
+                "tickets": 2,
+                "load_factor": 0.0333,
+            },
+            {
+                "route": self.route.id,
+                "airplane_type": other_type.id,
+                "day": "2023-01-02",
+                "flights": 1,
+                "seats": 20,
+                "tickets": 0,
+                "load_factor": 0.0,
+            },
+        ])
+
+        response = self.client.get(url, {"group_by": "route"})
+        self.assertEqual(response.json(), [
+            {"route": self.route.id, "flights": 2, "seats": 80, "tickets": 2, "load_factor": 0.025},
+        ])
+
+        response = self.client.get(
+            url, {"group_by": ["airplane_type", "day"], "start": "2023-01-02"}
+        )
+        self.assertEqual(
+            [(row["airplane_type"], row["day"]) for row in response.json()],
+            [(other_type.id, "2023-01-02")],
+        )
+
+        response = self.client.get(url, {"start": "2023-01-02", "end": "2023-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reference_data_cache_and_revalidation(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        url = reverse("airport:routes-list")
+
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertEqual(cached.data, response.data)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.airport1.name = "Renamed Airport"
+        self.airport1.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["source_airport"], "Renamed Airport")
+
+        for backend, shared in (("locmem.LocMemCache", False), ("redis.RedisCache", True)):
+            caches = {"default": {"BACKEND": f"django.core.cache.backends.{backend}"}}
+            with override_settings(CACHES=caches):
+                self.assertEqual(cache_is_shared(), shared)
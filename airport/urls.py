@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework import routers
 
+from airport import async_views
 from airport.views import (
     AirportViewSet,
     AirplaneViewSet,
@@ -8,7 +9,11 @@ from airport.views import (
     RouteViewSet,
     FlightViewSet,
     OrderViewSet,
+    BookingRequestViewSet,
     CrewViewSet,
+    OccupancyView,
+    OrderExportView,
+    TicketExportView,
 )
 
 router = routers.DefaultRouter()
@@ -18,10 +23,25 @@ router.register("airplanes-type", AirPlaneTypeViewSet, basename="airplanes-type"
 router.register("routes", RouteViewSet, basename="routes")
 router.register("flights", FlightViewSet, basename="flights")
 router.register("orders", OrderViewSet, basename="orders")
+router.register("bookings", BookingRequestViewSet, basename="bookings")
 router.register("crews", CrewViewSet, basename="crews")
 
 urlpatterns = [
-    path("", include(router.urls))
+    path("", include(router.urls)),
+    path("async/flights/", async_views.flight_list, name="async-flights-list"),
+    path(
+        "async/flights/<int:pk>/",
+        async_views.flight_detail,
+        name="async-flights-detail",
+    ),
+    path(
+        "async/flights/<int:pk>/seatmap/",
+        async_views.flight_seatmap,
+        name="async-flights-seatmap",
+    ),
+    path("exports/orders/", OrderExportView.as_view(), name="exports-orders"),
+    path("exports/tickets/", TicketExportView.as_view(), name="exports-tickets"),
+    path("stats/occupancy/", OccupancyView.as_view(), name="stats-occupancy"),
 ]
 
 app_name = "airport"
\ No newline at end of file
@@ -1,10 +1,41 @@
-from rest_framework import viewsets
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework.permissions import IsAuthenticated
+from datetime import datetime, time, timedelta
 
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.views import APIView
+
+from airport.availability import route_calendar
+from airport.bookings import QueuedCreateMixin
+from airport.caching import CachedResponseMixin
+from airport.connections import get_connection_index
+from airport.documents import flight_availability, order_documents, render_order
+from airport.exports import (
+    ORDER_EXPORT_ROW,
+    TICKET_EXPORT_ROW,
+    order_export_queryset,
+    stream_export,
+    ticket_export_queryset,
+)
+from airport.filters import FLIGHT_FILTER_PARAMETERS, filter_flights
+from airport.idempotency import IdempotentCreateMixin
+from airport.occupancy import occupancy_stats
+from airport.pagination import FlightCursorPagination, OrderCursorPagination
 from airport.permissions import IsAdminOrIfAuthenticatedReadOnly
+from airport.renderers import CSVRenderer, JSONLinesRenderer, ORJSONRenderer
 
 from airport.models import (
+    BookingRequest,
     Airport,
     Airplane,
     AirplaneType,
@@ -24,31 +55,94 @@ from airport.serializers import (
     RouteListSerializer,
     RouteDetailSerializer,
     OrderListSerializer, OrderRetrieveSerializer, FlightListSerializer,
+    BookingRequestSerializer,
     FlightRetrieveSerializer,
+    ScheduleImportSerializer,
+    SeatHoldRequestSerializer,
+    SeatHoldSerializer,
+    ConnectionSearchSerializer,
+    ExportSerializer,
+    ItinerarySerializer,
+    OccupancyQuerySerializer,
+    OccupancySerializer,
+    CalendarQuerySerializer,
+    CalendarDaySerializer,
 )
+from airport.reservations import hold_seats, release_holds
+from airport.schedule_import import ScheduleImporter, read_rows
+from airport.rows import (
+    FLIGHT_LIST_ROW,
+    FLIGHT_RETRIEVE_ROW,
+    ROUTE_DETAIL_ROW,
+    ROUTE_LIST_ROW,
+    RowResponseMixin,
+)
+from airport.seats import SeatUnavailable, deferred_release
+from user.authentication import CachedJWTAuthentication
 
 
-class AirportViewSet(viewsets.ModelViewSet):
+class AirportViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Airport.objects.all()
     serializer_class = AirportSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    cache_models = (Airport,)
+    query_budgets = {
+        "list": 3,
+        "create": 3,
+        "retrieve": 2,
+        "update": 4,
+        "partial_update": 4,
+        "destroy": 5,
+    }
 
 
-class AirplaneViewSet(viewsets.ModelViewSet):
+class AirplaneViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Airplane.objects.select_related("airplane_type")
     serializer_class = AirplaneSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    cache_models = (Airplane, AirplaneType)
+    # Resizing an airplane rebuilds the seat maps and the occupancy
+    # statistics of its flights.
+    query_budgets = {
+        "list": 3,
+        "create": 4,
+        "retrieve": 2,
+        "update": 11,
+        "partial_update": 11,
+        "destroy": 4,
+    }
 
 
-class AirPlaneTypeViewSet(viewsets.ModelViewSet):
+class AirPlaneTypeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = AirplaneType.objects.all()
     serializer_class = AirplaneTypeSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    cache_models = (AirplaneType,)
+    query_budgets = {
+        "list": 3,
+        "create": 3,
+        "retrieve": 2,
+        "update": 4,
+        "partial_update": 4,
+        "destroy": 4,
+    }
 
 
-class RouteViewSet(viewsets.ModelViewSet):
+class RouteViewSet(CachedResponseMixin, RowResponseMixin, viewsets.ModelViewSet):
     queryset = Route.objects.select_related("source", "destination")
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    cache_models = (Route, Airport)
+    list_rows = ROUTE_LIST_ROW
+    retrieve_rows = ROUTE_DETAIL_ROW
+    query_budgets = {
+        "list": 3,
+        "create": 4,
+        "retrieve": 2,
+        "update": 5,
+        "partial_update": 5,
+        "destroy": 4,
+        "calendar": 3,
+    }
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -58,16 +152,114 @@ class RouteViewSet(viewsets.ModelViewSet):
 
         return RouteSerializer
 
+    @extend_schema(
+        parameters=[CalendarQuerySerializer], responses=CalendarDaySerializer(many=True)
+    )
+    @action(detail=True, methods=["get"], pagination_class=None)
+    def calendar(self, request, pk=None):
+        """Flights, earliest departure and free seats on the route per day,
+        from ``start`` to ``end``."""
+        params = CalendarQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        route = self.get_object()
+        days = route_calendar(route.pk, **params.validated_data)
+        return Response(CalendarDaySerializer(days, many=True).data)
+
+
+SEAT_MAP_ENCODINGS = {
+    "seats": lambda seat_map: [
+        {"row": row, "seat": seat} for row, seat in seat_map.taken()
+    ],
+    "rows": lambda seat_map: seat_map.as_rows(),
+    "runs": lambda seat_map: seat_map.as_runs(),
+}
+
+
+def seat_map_encoding(request):
+    """The seat map encoding ``request`` asks for (``?encoding=``)."""
+    encoding = request.query_params.get("encoding", "seats")
+    if encoding not in SEAT_MAP_ENCODINGS:
+        raise ValidationError(
+            {"encoding": f"Choose one of: {', '.join(SEAT_MAP_ENCODINGS)}"}
+        )
+    return encoding
 
-class FlightViewSet(viewsets.ModelViewSet):
+
+def seat_map_response(request, flight, encoding, response_class):
+    """The seat map of ``flight``, or 304 if the client's copy (``ETag``) is
+    current; ``response_class(data, status=...)`` builds the response."""
+    etag = quote_etag(f"{flight.pk}-{flight.seats_version}-{encoding}")
+
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = response_class(None, status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        seat_map = flight.seats
+        response = response_class({
+            "flight": flight.pk,
+            "version": flight.seats_version,
+            "rows": seat_map.rows,
+            "seats_in_row": seat_map.seats_in_row,
+            "encoding": encoding,
+            "taken_seats": SEAT_MAP_ENCODINGS[encoding](seat_map),
+        })
+
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@extend_schema_view(list=extend_schema(parameters=FLIGHT_FILTER_PARAMETERS))
+class FlightViewSet(RowResponseMixin, viewsets.ModelViewSet):
     queryset = Flight.objects.select_related(
         "route__source",
         "route__destination",
         "airplane",
         "airplane__airplane_type"
-    ).prefetch_related("members", "tickets")
+    )
     serializer_class = FlightSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    pagination_class = FlightCursorPagination
+    list_rows = FLIGHT_LIST_ROW
+    retrieve_rows = FLIGHT_RETRIEVE_ROW
+    # Saving or deleting a flight recomputes the occupancy statistics of its
+    # route and day; moving its departure moves its tickets too.
+    query_budgets = {
+        "list": 3,
+        "create": 8,
+        "retrieve": 3,
+        "update": 11,
+        "partial_update": 11,
+        "destroy": 10,
+        "seatmap": 2,
+        "connections": 4,
+        "holds": 9,
+        # For one chunk; get_query_budget raises it for bigger files.
+        "import_schedule": 10,
+    }
+    # Chunks the schedule import of this request went through.
+    import_chunks = 1
+
+    def get_query_budget(self, request):
+        budget = self.query_budgets.get(self.action)
+        if self.action == "import_schedule":
+            # Every chunk after the first runs its own queries.
+            budget += ScheduleImporter.queries_per_chunk * max(self.import_chunks - 1, 0)
+        return budget
+
+    def get_queryset(self):
+        queryset = self.queryset
+        if self.action in ("seatmap", "holds"):
+            return Flight.objects.select_related("airplane").only(
+                "seat_map",
+                "seats_version",
+                "airplane__rows",
+                "airplane__seats_in_row",
+            )
+        if self.action in ("list", "retrieve"):
+            queryset = queryset.with_availability()
+        if self.action == "list":
+            queryset = filter_flights(queryset, self.request.query_params)
+        return queryset
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -76,13 +268,168 @@ class FlightViewSet(viewsets.ModelViewSet):
             return FlightRetrieveSerializer
         return FlightSerializer
 
-class OrderViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        with transaction.atomic(savepoint=False), deferred_release():
+            instance.delete()
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "encoding",
+                OpenApiTypes.STR,
+                enum=["seats", "rows", "runs"],
+                description=(
+                    "seats: list of taken {row, seat}; "
+                    "rows: one bitstring per row; "
+                    "runs: run-length [taken, length] pairs in row-major order"
+                ),
+            )
+        ],
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(detail=True, methods=["get"])
+    def seatmap(self, request, pk=None):
+        encoding = seat_map_encoding(request)
+        return seat_map_response(request, self.get_object(), encoding, Response)
+
+    @extend_schema(
+        parameters=[ConnectionSearchSerializer],
+        responses=ItinerarySerializer(many=True),
+    )
+    @action(detail=False, methods=["get"], pagination_class=None)
+    def connections(self, request):
+        """Itineraries of up to ``max_legs`` flights between two airports,
+        departing on ``date`` and ranked by duration or distance. A
+        ``Search-Truncated: true`` header marks results cut short by the
+        search's path limit."""
+        params = ConnectionSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        params = params.validated_data
+
+        index = get_connection_index()
+        errors = {}
+        airports = {}
+        for name in ("source", "destination"):
+            airports[name] = index.resolve_airport(params[name])
+            if airports[name] is None:
+                errors[name] = f"Unknown airport {params[name]!r}."
+        if errors:
+            raise ValidationError(errors)
+
+        start = timezone.make_aware(datetime.combine(params["date"], time.min))
+        itineraries, truncated = index.search(
+            airports["source"],
+            airports["destination"],
+            start,
+            start + timedelta(days=1) - timedelta.resolution,
+            max_legs=params["max_legs"],
+            min_connection=timedelta(minutes=params["min_connection"]),
+            order_by=params["order_by"],
+        )
+        serializer = ItinerarySerializer(
+            itineraries, many=True, context={"airports": index.airports}
+        )
+        response = Response(serializer.data)
+        if truncated:
+            # The search gave up early; better itineraries may exist.
+            response["Search-Truncated"] = "true"
+        return response
+
+    @extend_schema(
+        request=SeatHoldRequestSerializer,
+        responses={201: SeatHoldSerializer(many=True), 204: None},
+    )
+    @action(
+        detail=True,
+        methods=["post", "delete"],
+        permission_classes=(IsAuthenticated,),
+    )
+    def holds(self, request, pk=None):
+        flight = self.get_object()
+
+        if request.method == "DELETE":
+            seats = None
+            if request.data:
+                serializer = SeatHoldRequestSerializer(data=request.data)
+                serializer.is_valid(raise_exception=True)
+                seats = [
+                    (seat["row"], seat["seat"])
+                    for seat in serializer.validated_data["seats"]
+                ]
+            release_holds(request.user, flight.pk, seats)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        serializer = SeatHoldRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        seats = [
+            (seat["row"], seat["seat"])
+            for seat in serializer.validated_data["seats"]
+        ]
+        try:
+            holds = hold_seats(request.user, flight.pk, seats)
+        except ValueError as error:
+            raise ValidationError({"seats": str(error)})
+        except SeatUnavailable as error:
+            raise ValidationError({"taken_seats": str(error)})
+        return Response(
+            SeatHoldSerializer(holds, many=True).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @extend_schema(
+        request={"multipart/form-data": ScheduleImportSerializer},
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        url_name="import",
+        parser_classes=(MultiPartParser,),
+    )
+    def import_schedule(self, request):
+        """Bulk-create flights from a CSV or JSON Lines schedule and report
+        the rows that were rejected, by line number."""
+        serializer = ScheduleImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        importer = ScheduleImporter(dry_run=params["dry_run"])
+        report = importer.run(read_rows(params["file"], params["file_format"]))
+        self.import_chunks = report["chunks"]
+        return Response(report)
+
+
+@extend_schema_view(create=extend_schema(parameters=[
+    OpenApiParameter(
+        "Idempotency-Key",
+        str,
+        OpenApiParameter.HEADER,
+        description="Retries with the same key get the first response back",
+    ),
+]))
+class OrderViewSet(IdempotentCreateMixin, QueuedCreateMixin, viewsets.ModelViewSet):
     queryset = Order.objects.select_related(
         "user"
     ).prefetch_related("tickets")
     serializer_class = OrderSerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = OrderCursorPagination
+    # Booking a seat the user holds also deletes the hold; an Idempotency-Key
+    # adds five (lookup, savepoint, insert, update, release); reading an
+    # order whose document was dropped rebuilds it (three queries: lock,
+    # tickets, write). Updating the tickets deletes the old ones one by one
+    # (each locking the order and dropping the document) before booking the
+    # new ones.
+    query_budgets = {
+        "list": 6,
+        "create": 17,
+        "retrieve": 6,
+        "update": 23,
+        "partial_update": 23,
+        "destroy": 10,
+    }
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -94,11 +441,130 @@ class OrderViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return self.queryset.filter(user=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        # Served from the order documents: one query per page.
+        queryset = Order.objects.filter(user=request.user).values(
+            "id", "created_at", "document__tickets"
+        )
+        page = self.paginate_queryset(queryset)
+        documents = order_documents(page)
+        return self.get_paginated_response([
+            render_order(row, request.user.email, documents[row["id"]]) for row in page
+        ])
+
+    def retrieve(self, request, *args, **kwargs):
+        row = get_object_or_404(
+            Order.objects.filter(user=request.user).values(
+                "id", "created_at", "document__tickets"
+            ),
+            pk=kwargs["pk"],
+        )
+        tickets = order_documents([row])[row["id"]]
+        availability = flight_availability({ticket["flight"]["id"] for ticket in tickets})
+        return Response(render_order(row, request.user.email, tickets, availability))
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        with transaction.atomic(savepoint=False), deferred_release():
+            instance.delete()
+
+
+class BookingRequestViewSet(viewsets.ReadOnlyModelViewSet):
+    """Orders queued by ``orders/`` and whether they have been booked yet."""
+
+    serializer_class = BookingRequestSerializer
+    authentication_classes = (CachedJWTAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    query_budgets = {"list": 3, "retrieve": 2}
+
+    def get_queryset(self):
+        return BookingRequest.objects.filter(user=self.request.user).order_by("-id")
+
 
-class CrewViewSet(viewsets.ModelViewSet):
+class CrewViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Crew.objects.all()
     serializer_class = CrewSerializer
-    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
\ No newline at end of file
+    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    cache_models = (Crew,)
+    query_budgets = {
+        "list": 3,
+        "create": 2,
+        "retrieve": 2,
+        "update": 3,
+        "partial_update": 3,
+        "destroy": 4,
+    }
+
+
+class ExportView(APIView):
+    """Abstract base of the exports, which stream ``rows`` of
+    ``export_queryset(start, end)`` as CSV (``?format=csv``) or JSON Lines
+    (``?format=jsonl``) and set those three attributes."""
+
+    permission_classes = (IsAdminUser,)
+    renderer_classes = (CSVRenderer, JSONLinesRenderer)
+    query_budgets = {"get": 2}
+    export_queryset = None
+    rows = None
+    filename = None
+
+    @extend_schema(parameters=[ExportSerializer], responses={200: OpenApiTypes.STR})
+    def get(self, request):
+        params = ExportSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end = params.validated_data.get("start"), params.validated_data.get("end")
+        if start is not None:
+            start = timezone.make_aware(datetime.combine(start, time.min))
+        if end is not None:
+            end = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+
+        return stream_export(
+            request._request,
+            self.export_queryset(start, end),
+            self.rows,
+            request.accepted_renderer.format,
+            self.filename,
+        )
+
+    def handle_exception(self, exc):
+        # Errors are JSON whatever format the export was asked for.
+        self.request.accepted_renderer = ORJSONRenderer()
+        self.request.accepted_media_type = ORJSONRenderer.media_type
+        return super().handle_exception(exc)
+
+
+class TicketExportView(ExportView):
+    """Every ticket of the orders booked in the date range, with its order
+    and flight."""
+
+    export_queryset = staticmethod(ticket_export_queryset)
+    rows = TICKET_EXPORT_ROW
+    filename = "tickets"
+
+
+class OrderExportView(ExportView):
+    """Orders booked in the date range, with their ticket counts."""
+
+    export_queryset = staticmethod(order_export_queryset)
+    rows = ORDER_EXPORT_ROW
+    filename = "orders"
+
+
+class OccupancyView(APIView):
+    """Flights, seats, tickets sold and load factors per route, airplane type
+    and departure day, or summed over the dimensions not in ``group_by``.
+
+    Read from the occupancy statistics, not from the tickets.
+    """
+
+    permission_classes = (IsAdminUser,)
+    query_budgets = {"get": 2}
+
+    @extend_schema(parameters=[OccupancyQuerySerializer], responses=OccupancySerializer(many=True))
+    def get(self, request):
+        params = OccupancyQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        rows = occupancy_stats(**params.validated_data)
+        return Response(OccupancySerializer(rows, many=True).data)
@@ -54,10 +54,12 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
+    "airport.query_budget.QueryBudgetMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "airport.replicas.ReplicaMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -97,9 +99,42 @@ DATABASES = {
         "PASSWORD": os.environ["POSTGRES_PASSWORD"],
         "HOST": os.environ["POSTGRES_HOST"],
         "PORT": os.environ["POSTGRES_PORT"],
+        # Keep connections open between requests instead of reconnecting
+        # every time; a stale one is detected before it is reused.
+        "CONN_MAX_AGE": int(os.getenv("POSTGRES_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Read replicas of the default database, on the same port with the same
+# credentials; GET requests read from them (see airport.replicas). In tests
+# they mirror the default database.
+REPLICA_HOSTS = [
+    host.strip() for host in os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",") if host.strip()
+]
+DATABASE_REPLICAS = []
+for number, host in enumerate(REPLICA_HOSTS, start=1):
+    DATABASES[f"replica_{number}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{number}")
+DATABASE_ROUTERS = ["airport.replicas.ReplicaRouter"]
+# How long a client's reads stay on the primary after it writes, so it sees
+# its own changes while the replicas catch up.
+REPLICA_PIN_TTL = timedelta(seconds=int(os.getenv("REPLICA_PIN_SECONDS", 5)))
+
+# Pins are kept in the cache, so replicas need one shared between processes
+# (checked at startup). Without REDIS_URL each process has a LocMemCache.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -146,7 +181,11 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'user.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'airport.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
@@ -157,4 +196,17 @@ SIMPLE_JWT = {
    "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
    "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
    "ROTATE_REFRESH_TOKENS": True
-}
\ No newline at end of file
+}
+# Users resolved from JWTs are cached per process; saving a user evicts it
+# locally, other processes see the change after the TTL.
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_USER_CACHE_TTL = timedelta(seconds=60)
+# How long a seat picked in the seat map stays reserved for the customer
+# before it is released back to sale.
+SEAT_HOLD_TTL = timedelta(minutes=10)
+# How long the response to an order placed with an Idempotency-Key header
+# is replayed to retries with the same key.
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+# Queue every order for the process_bookings workers and answer 202, as
+# clients can ask for with "Prefer: respond-async"; for sale launches.
+BOOKING_QUEUE = os.getenv("BOOKING_QUEUE", "False") == "True"
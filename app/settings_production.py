@@ -0,0 +1,50 @@
+"""
+Production settings: ``DJANGO_SETTINGS_MODULE=app.settings_production``.
+
+Same as ``app.settings`` without the development tools, with a psycopg
+connection pool per worker process instead of persistent connections, and
+with a Redis cache shared by the workers. Served by gunicorn, see
+``gunicorn.conf.py``.
+"""
+import os
+
+from app.settings import *  # noqa: F401,F403
+from app.settings import DATABASES, INSTALLED_APPS, MIDDLEWARE
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "localhost,127.0.0.1").split(",")
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS if app not in ("debug_toolbar", "django_extensions")
+]
+
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware != "debug_toolbar.middleware.DebugToolbarMiddleware"
+]
+
+# https://docs.djangoproject.com/en/5.1/ref/databases/#connection-pool
+# The pool owns connection lifetimes, so CONN_MAX_AGE must be 0;
+# CONN_HEALTH_CHECKS makes it check a connection before handing it out.
+# The primary and each read replica get a pool of their own.
+for database in DATABASES.values():
+    database["CONN_MAX_AGE"] = 0
+    database["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("POSTGRES_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.getenv("POSTGRES_POOL_MAX_SIZE", 10)),
+            "timeout": int(os.getenv("POSTGRES_POOL_TIMEOUT", 10)),
+            "max_idle": 300,
+        },
+    }
+
+# Cached responses and their versions, the connection index version, replica
+# pins and calendar months have to be seen by every worker; the default
+# LocMemCache would give each process a copy of its own.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL", "redis://redis:6379/0"),
+    }
+}
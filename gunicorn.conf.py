@@ -0,0 +1,47 @@
+# gunicorn settings for production, picked up from the working directory:
+#
+#   DJANGO_SETTINGS_MODULE=app.settings_production gunicorn
+#
+# Uvicorn workers serve the ASGI app, so the async endpoints do not hold a
+# thread per request while the sync views run in Django's thread pool.
+import gc
+import multiprocessing
+import os
+
+wsgi_app = "app.asgi:application"
+worker_class = "uvicorn_worker.UvicornWorker"
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+keepalive = 5
+max_requests = 10000
+max_requests_jitter = 1000
+accesslog = "-"
+
+# Import Django and the project once in the master and fork the workers
+# from it. The collector stays off while loading so it does not leave
+# freed holes in the pages the workers share; gc.freeze() then moves
+# everything loaded so far out of the workers' collections, so those
+# pages are not copied on write when a worker runs gc.
+preload_app = True
+gc.disable()
+
+
+def on_starting(server):
+    # Runs after the app is preloaded. Workers with caches of their own would
+    # keep serving responses other workers have invalidated.
+    from airport.caching import cache_is_shared
+
+    if server.cfg.workers > 1 and not cache_is_shared():
+        raise RuntimeError(
+            f"{server.cfg.workers} workers need a cache shared between processes;"
+            " set CACHES (app.settings_production uses Redis) or GUNICORN_WORKERS=1."
+        )
+
+
+def when_ready(server):
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
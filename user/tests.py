@@ -1,3 +1,74 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from user.authentication import UserCache, user_cache
+
+User = get_user_model()
+
+
+class UserCacheTests(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = UserCache(max_size=2, ttl=60)
+        cache.set("1", "one")
+        cache.set("2", "two")
+        cache.get("1")
+        cache.set("3", "three")
+        self.assertEqual(cache.get("1"), "one")
+        self.assertIsNone(cache.get("2"))
+        self.assertEqual(len(cache), 2)
+
+    def test_entries_expire(self):
+        cache = UserCache(max_size=2, ttl=60)
+        with mock.patch("user.authentication.time.monotonic", return_value=100):
+            cache.set("1", "one")
+        with mock.patch("user.authentication.time.monotonic", return_value=159):
+            self.assertEqual(cache.get("1"), "one")
+        with mock.patch("user.authentication.time.monotonic", return_value=160):
+            self.assertIsNone(cache.get("1"))
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(email="user@example.com", password="testpass123")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+        self.url = reverse("user:me")
+
+    def test_authenticated_requests_skip_the_user_query(self):
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["email"], "user@example.com")
+
+    def test_saving_the_user_evicts_it(self):
+        self.client.get(self.url)
+        response = self.client.patch(self.url, {"email": "new@example.com"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.url).data["email"], "new@example.com")
+
+        self.user.refresh_from_db()
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_users_are_rejected(self):
+        self.client.get(self.url)
+        self.user.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
-# Create your tests here.
+    def test_requests_get_their_own_copy(self):
+        self.client.get(self.url)
+        cached = user_cache.get(str(self.user.pk))
+        response = self.client.get(self.url)
+        self.assertIsNot(response.wsgi_request.user, cached)
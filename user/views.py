@@ -1,18 +1,33 @@
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt import views as jwt_views
 
+from user.authentication import CachedJWTAuthentication
 from user.serializers import UserSerializer
 
 
 class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer
+    query_budgets = {"post": 2}
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    query_budgets = {"get": 1, "put": 4, "patch": 4}
 
     def get_object(self):
         return self.request.user
+
+
+class TokenObtainPairView(jwt_views.TokenObtainPairView):
+    query_budgets = {"post": 1}
+
+
+class TokenRefreshView(jwt_views.TokenRefreshView):
+    query_budgets = {"post": 3}
+
+
+class TokenVerifyView(jwt_views.TokenVerifyView):
+    query_budgets = {"post": 0}